@@ -0,0 +1,134 @@
+"""
+Compare the execution backends (pandas, Polars, DuckDB) for speed and exact parity.
+
+For every scale the reference is the eager pandas pipeline (prepare_inputs,
+every ANALYSIS_TASKS analysis and compute_metrics). Each available backend
+then builds the aggregate cube from the Parquet files, and its metrics and
+result tables must equal the reference exactly (values, order, labels).
+Backends whose package is not installed are skipped. Exits non-zero on any
+mismatch.
+
+Usage:
+    python benchmarks/bench_backends.py --scales 100000 1000000 --backends pandas polars duckdb
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from cs_analysis.backends import BACKENDS, get_backend  # noqa: E402
+from cs_analysis.metrics import compute_metrics  # noqa: E402
+from cs_analysis.report import prepare_inputs  # noqa: E402
+from cs_analysis.scheduler import ANALYSIS_TASKS, run_tasks  # noqa: E402
+from generate_data import generate  # noqa: E402
+
+
+def reference(orders_path, errands_path, date_range=None, countries=None):
+    """
+    Metrics and results of the eager pandas pipeline, and its wall time.
+    """
+    start = time.perf_counter()
+    orders_df, merged_df, errands_df = prepare_inputs(orders_path, errands_path, date_range, countries)
+    results = run_tasks(ANALYSIS_TASKS, {"orders": orders_df, "merged": merged_df, "errands": errands_df}, workers=1)
+    metrics_result = compute_metrics(orders_df["Contacts"].to_numpy())
+    return metrics_result, results, time.perf_counter() - start
+
+
+def differences(expected, actual, name=""):
+    """
+    Names (and first lines of the assertion) of the results that differ; values, order and labels must match.
+    """
+    if isinstance(expected, dict):
+        return [diff for key in expected for diff in differences(expected[key], actual.get(key), f"{name}.{key}")]
+    if hasattr(expected, "to_frame") and not isinstance(expected, (pd.Series, pd.DataFrame)):
+        expected, actual = expected.to_frame(), actual.to_frame()
+    check = pd.testing.assert_frame_equal if isinstance(expected, pd.DataFrame) else pd.testing.assert_series_equal
+    try:
+        check(expected, actual, check_dtype=False, check_names=False, check_index_type=False, check_categorical=False,
+              **({"check_column_type": False} if check is pd.testing.assert_frame_equal else {}))
+    except (AssertionError, AttributeError, TypeError) as exc:
+        return [f"{name.lstrip('.')}: {str(exc).strip().splitlines()[0]}"]
+    return []
+
+
+def bench_backend(name, orders_path, errands_path, expected, date_range=None, countries=None):
+    """
+    Build the cube with one backend and check it against the reference.
+
+    Returns:
+        dict: Wall time and the differing results (empty when identical).
+    """
+    backend = get_backend(name)
+    start = time.perf_counter()
+    cube = backend.cube(orders_path, errands_path, date_range, countries)
+    metrics_result, results = cube.metrics(), cube.results()
+    wall = time.perf_counter() - start
+
+    expected_metrics, expected_results = expected
+    diffs = differences(expected_results, results)
+    if metrics_result.to_dict() != expected_metrics.to_dict():
+        diffs.append("metrics")
+    return {"wall_s": round(wall, 4), "differences": diffs}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[100_000], help="Numbers of orders")
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--data-dir", default=None, help="Keep generated data here (reused when present)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--start", default=None, help="First Order_created_at date to include")
+    parser.add_argument("--end", default=None, help="First Order_created_at date to exclude")
+    parser.add_argument("--country", action="append", dest="countries", help="Site_country to keep (repeatable)")
+    parser.add_argument("--output", default=None, help="Also write the timings as JSON")
+    args = parser.parse_args()
+
+    date_range = (args.start, args.end) if args.start or args.end else None
+    runs, failed = [], False
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            data_dir = os.path.join(args.data_dir or tmp, f"orders-{scale}-seed-{args.seed}")
+            orders_path = os.path.join(data_dir, "orders.parquet")
+            errands_path = os.path.join(data_dir, "errands.parquet")
+            if not os.path.exists(errands_path):
+                generate(data_dir, scale, seed=args.seed)
+
+            expected_metrics, expected_results, baseline = reference(
+                orders_path, errands_path, date_range, args.countries
+            )
+            print(f"{scale:>11} orders  {'reference':<8} {baseline:8.3f}s")
+            run = {"orders": scale, "reference_s": round(baseline, 4), "backends": {}}
+            for name in args.backends:
+                try:
+                    timing = bench_backend(
+                        name, orders_path, errands_path, (expected_metrics, expected_results),
+                        date_range, args.countries,
+                    )
+                except ImportError as exc:
+                    print(f"{'':>11}         {name:<8} skipped ({exc})")
+                    continue
+                run["backends"][name] = timing
+                status = "parity ok" if not timing["differences"] else "MISMATCH"
+                speedup = baseline / timing["wall_s"]
+                print(f"{'':>11}         {name:<8} {timing['wall_s']:8.3f}s  x{speedup:5.2f}  {status}")
+                for diff in timing["differences"]:
+                    print(f"{'':>22}{diff}")
+                failed |= bool(timing["differences"])
+            runs.append(run)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"runs": runs}, file, indent=2)
+        print(f"wrote {args.output}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
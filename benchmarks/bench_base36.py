@@ -0,0 +1,93 @@
+"""
+Benchmark the vectorized base-36 decoder against the per-row apply path.
+
+Usage:
+    python benchmarks/bench_base36.py --rows 1000000 --invalid 0.01
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cs_analysis.base36 import decode_base36, decode_base36_column  # noqa: E402
+
+
+def make_order_numbers(rows, invalid_share, seed=0):
+    """
+    Build a Series of base-36 order numbers with a share of invalid values.
+
+    Parameters:
+        rows (int): Number of values to generate.
+        invalid_share (float): Fraction of values replaced with invalid strings.
+        seed (int): Random seed.
+
+    Returns:
+        pd.Series: Base-36 encoded order numbers.
+    """
+    rng = np.random.default_rng(seed)
+    ids = rng.integers(36 ** 5, 36 ** 7, size=rows)
+    alphabet = np.array(list("0123456789abcdefghijklmnopqrstuvwxyz"))
+
+    # Encode with a fixed number of digits so the benchmark does not depend on int()
+    digits = np.empty((rows, 7), dtype="<U1")
+    remaining = ids.copy()
+    for position in range(6, -1, -1):
+        digits[:, position] = alphabet[remaining % 36]
+        remaining //= 36
+    values = pd.Series(["".join(row).lstrip("0") for row in digits], dtype=object)
+
+    invalid = rng.random(rows) < invalid_share
+    values[invalid] = "#invalid"
+    return values
+
+
+def time_call(func, repeat):
+    """
+    Return the best wall time of several calls to func.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--invalid", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    values = make_order_numbers(args.rows, args.invalid)
+
+    # Current script path: apply per row, then cast to str and strip
+    def apply_path():
+        return values.apply(decode_base36).astype(str).str.strip()
+
+    def vectorized_path():
+        return decode_base36_column(values)
+
+    # Both paths must agree on which values are valid and what they decode to
+    expected = values.apply(decode_base36)
+    result = vectorized_path()
+    assert (result.isna().to_numpy() == expected.isna().to_numpy()).all()
+    assert (result.dropna().to_numpy() == expected.dropna().astype(np.int64).to_numpy()).all()
+
+    apply_time = time_call(apply_path, args.repeat)
+    vectorized_time = time_call(vectorized_path, args.repeat)
+
+    print(f"rows: {args.rows}")
+    print(f"apply + astype(str): {apply_time:.3f}s")
+    print(f"decode_base36_column: {vectorized_time:.3f}s")
+    print(f"speed-up: {apply_time / vectorized_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
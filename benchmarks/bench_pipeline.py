@@ -0,0 +1,223 @@
+"""
+Benchmark every stage of the analysis pipeline on synthetic data and write the timings as JSON.
+
+Each stage (load, decode, join, metrics, every analysis, chart building and
+rendering) records wall and CPU time, resident memory and the process peak.
+Every scale runs in its own process so peak memory is per scale. Pass
+--compare with an earlier result file to see the change per stage.
+
+Usage:
+    python benchmarks/bench_pipeline.py --scales 10000 100000 1000000 --output bench_results.json
+    python benchmarks/bench_pipeline.py --scales 1000000 --compare bench_results.json
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARKS_DIR))
+
+from cs_analysis.base36 import decode_base36_column  # noqa: E402
+from cs_analysis.joins import normalise_order_ids  # noqa: E402
+from cs_analysis.loader import load_errands, load_orders  # noqa: E402
+from cs_analysis.metrics import compute_metrics  # noqa: E402
+from cs_analysis.rendering import render_charts  # noqa: E402
+from cs_analysis.report import build_charts, join_inputs  # noqa: E402
+from cs_analysis.scheduler import ANALYSIS_TASKS, run_tasks  # noqa: E402
+from generate_data import generate  # noqa: E402
+
+# Stages slower than this factor against the --compare baseline are flagged
+REGRESSION_FACTOR = 1.2
+
+
+def _rss_mb():
+    """
+    Current resident set size in MB (Linux), or the peak where /proc is unavailable.
+    """
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:
+        return _max_rss_mb()
+
+
+def _max_rss_mb():
+    """
+    Peak resident set size of the process so far, in MB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
+
+
+class StageTimer:
+    """
+    Collect wall time, CPU time and memory for a sequence of named stages.
+
+    Parameters:
+        trace_memory (bool): Also record the Python/numpy allocation peak per stage
+            with tracemalloc (slower, but exact per stage).
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = []
+        if trace_memory:
+            tracemalloc.start()
+
+    def run(self, name, func, *args, rows=None, **kwargs):
+        """
+        Run func(*args, **kwargs) as one stage and return its result.
+        """
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = func(*args, **kwargs)
+        stage = {
+            "name": name,
+            "wall_s": round(time.perf_counter() - wall, 6),
+            "cpu_s": round(time.process_time() - cpu, 6),
+            "rss_mb": round(_rss_mb(), 1),
+            "max_rss_mb": round(_max_rss_mb(), 1),
+            "arrow_peak_mb": round(pa.default_memory_pool().max_memory() / 2 ** 20, 1),
+        }
+        if self.trace_memory:
+            stage["traced_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        if rows is not None:
+            stage["rows"] = rows
+        self.stages.append(stage)
+        return result
+
+
+def bench_scale(orders_path, errands_path, workers, render_mode, trace_memory):
+    """
+    Run the pipeline stage by stage on one pair of input files.
+
+    Returns:
+        list: One dict per stage.
+    """
+    timer = StageTimer(trace_memory)
+    orders_df = timer.run("load_orders", load_orders, orders_path)
+    errands_df = timer.run("load_errands", load_errands, errands_path)
+    errands_df["Order_id"] = timer.run(
+        "decode_base36", decode_base36_column, errands_df["Order_number"], rows=len(errands_df)
+    )
+    orders_df["Order_id"] = timer.run(
+        "normalise_order_ids", normalise_order_ids, orders_df["Order_id"], rows=len(orders_df)
+    )
+    orders_df, merged_df, join = timer.run("join", join_inputs, orders_df, errands_df)
+    metrics_result = timer.run("metrics", compute_metrics, join.contacts_per_order)
+
+    tables = {"orders": orders_df, "merged": merged_df, "errands": errands_df}
+    results = {}
+    for task in ANALYSIS_TASKS:
+        results.update(timer.run(f"analysis:{task.name}", run_tasks, [task], tables, workers=1))
+    if workers != 1:
+        timer.run("analyses_parallel", run_tasks, ANALYSIS_TASKS, tables, workers=workers)
+
+    charts = timer.run("build_charts", build_charts, metrics_result, results)
+    with tempfile.TemporaryDirectory() as chart_dir:
+        timer.run(f"render:{render_mode}", render_charts, charts, mode=render_mode, output_dir=chart_dir,
+                  workers=workers)
+    return timer.stages
+
+
+def _environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "pyarrow": pa.__version__,
+    }
+
+
+def compare(current, baseline):
+    """
+    Print the wall-time ratio of every stage against a baseline result file.
+    """
+    previous = {
+        (run["orders"], stage["name"]): stage["wall_s"]
+        for run in baseline["runs"] for stage in run["stages"]
+    }
+    for run in current["runs"]:
+        for stage in run["stages"]:
+            before = previous.get((run["orders"], stage["name"]))
+            if not before:
+                continue
+            ratio = stage["wall_s"] / before
+            flag = "  REGRESSION" if ratio > REGRESSION_FACTOR else ""
+            print(f"{run['orders']:>11} {stage['name']:<45} {before:9.3f}s -> {stage['wall_s']:9.3f}s  "
+                  f"x{ratio:.2f}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=[100_000], help="Numbers of orders")
+    parser.add_argument("--data-dir", default=None, help="Keep generated data here (reused when present)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--render", choices=["metrics-only", "draw", "save"], default="draw")
+    parser.add_argument("--trace-memory", action="store_true", help="Per-stage allocation peaks (slower)")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", default=None, help="Earlier result file to compare against")
+    parser.add_argument("--single", nargs=2, metavar=("ORDERS", "ERRANDS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    # Child process: benchmark one pair of files and print the stages as JSON
+    if args.single:
+        stages = bench_scale(*args.single, args.workers, args.render, args.trace_memory)
+        print(json.dumps(stages))
+        return
+
+    result = {"environment": _environment(), "runs": []}
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in args.scales:
+            data_dir = os.path.join(args.data_dir or tmp, f"orders-{scale}-seed-{args.seed}")
+            orders_path = os.path.join(data_dir, "orders.parquet")
+            errands_path = os.path.join(data_dir, "errands.parquet")
+            if not os.path.exists(errands_path):
+                generate(data_dir, scale, seed=args.seed)
+
+            command = [
+                sys.executable, os.path.abspath(__file__), "--single", orders_path, errands_path,
+                "--workers", str(args.workers), "--render", args.render,
+            ] + (["--trace-memory"] if args.trace_memory else [])
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            stages = json.loads(output.strip().splitlines()[-1])
+            result["runs"].append({"orders": scale, "seed": args.seed, "stages": stages})
+
+            total = sum(stage["wall_s"] for stage in stages)
+            peak = max(stage["max_rss_mb"] for stage in stages)
+            print(f"{scale:>11} orders: {total:8.2f}s total, peak RSS {peak:.0f} MB")
+
+    with open(args.output, "w") as file:
+        json.dump(result, file, indent=2)
+    print(f"wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            compare(result, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Generate deterministic synthetic orders.parquet and errands.parquet files.
+
+The same seed and scale always produce the same files. Partners and routes
+follow Zipf distributions, orders have zero, one or several errands, a share of
+the base-36 order numbers is invalid and cancel/change reasons are mostly null.
+Rows are written chunk by chunk, so 10^8 rows need no more memory than 10^6.
+
+Usage:
+    python benchmarks/generate_data.py --orders 1000000 --output-dir data
+"""
+import argparse
+import os
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+COUNTRIES = np.array([
+    "SE", "NO", "DK", "FI", "DE", "GB", "US", "ES", "FR", "IT", "NL", "PL", "PT", "GR", "TR",
+    "AT", "CH", "BE", "IE", "IS", "EE", "LV", "LT", "CZ", "HU", "RO", "BG", "HR", "TH", "AE",
+])
+BRANDS = np.array(["Brand A", "Brand B", "Brand C", "Brand D"])
+CANCEL_REASONS = np.array(["Price", "Change of plans", "Illness", "Schedule change", "Duplicate booking"])
+CHANGE_REASONS = np.array(["Date", "Name", "Destination", "Seat", "Baggage"])
+CHANNELS = np.array(["Email", "Phone", "Chat", "Web form"])
+
+# Invalid order numbers mixed into the errands
+INVALID_ORDER_NUMBERS = np.array(["#invalid", "", "??", "ab-cd", "1.5"], dtype=object)
+
+_ALPHABET = np.frombuffer(b"0123456789abcdefghijklmnopqrstuvwxyz", dtype=np.uint8)
+_PRIME = 2_147_483_647  # 2**31 - 1
+
+
+def order_ids(start, stop):
+    """
+    Unique, shuffled-looking order ids for order positions start..stop (an affine bijection modulo a prime).
+    """
+    positions = np.arange(start, stop, dtype=np.int64)
+    return 1_000_000 + (positions * 48271 + 12345) % _PRIME
+
+
+def encode_base36(values):
+    """
+    Vectorized base-36 encoding of positive int64 values (lower case, no leading zeros).
+    """
+    width = 13
+    digits = np.empty((len(values), width), dtype=np.uint8)
+    remaining = values.copy()
+    for position in range(width - 1, -1, -1):
+        digits[:, position] = _ALPHABET[remaining % 36]
+        remaining //= 36
+    text = np.char.lstrip(digits.view(f"S{width}").ravel(), b"0")
+    return pa.array(text, type=pa.binary()).cast(pa.string())
+
+
+def zipf_choice(rng, labels, size, exponent):
+    """
+    Pick labels with Zipf-distributed ranks (the first label is the most frequent).
+    """
+    ranks = (rng.zipf(exponent, size) - 1) % len(labels)
+    return labels[ranks]
+
+
+def _nullable(rng, labels, size, null_share):
+    values = labels[rng.integers(0, len(labels), size)].astype(object)
+    values[rng.random(size) < null_share] = None
+    return values
+
+
+def make_chunk(seed, chunk, start, stop, partners, errands_per_order, invalid_share):
+    """
+    Orders start..stop and their errands as two pyarrow Tables.
+    """
+    rng = np.random.default_rng([seed, chunk])
+    size = stop - start
+    ids = order_ids(start, stop)
+
+    canceled = (rng.random(size) < 0.12).astype(np.int64)
+    cancel_reason = _nullable(rng, CANCEL_REASONS, size, 0.0)
+    cancel_reason[canceled == 0] = None
+    created = np.datetime64("2023-01-01T00:00:00", "s") + rng.integers(0, 2 * 365 * 86400, size).astype(
+        "timedelta64[s]"
+    )
+    orders = pa.table({
+        "order_id": ids,
+        "order_created_at": created,
+        "brand": zipf_choice(rng, BRANDS, size, 2.0),
+        "partner": zipf_choice(rng, partners, size, 1.3),
+        "site_country": zipf_choice(rng, COUNTRIES, size, 1.6),
+        "origin_country": zipf_choice(rng, COUNTRIES, size, 1.4),
+        "destination_country": zipf_choice(rng, COUNTRIES, size, 1.4),
+        "is_canceled": canceled,
+        "cancel_reason": cancel_reason,
+        "change_reason": _nullable(rng, CHANGE_REASONS, size, 0.85),
+        "order_amount": np.round(rng.gamma(2.0, 150.0, size), 2),
+    })
+
+    # Errands per order: most orders have none, some have several (geometric)
+    counts = rng.geometric(1 / (1 + errands_per_order), size) - 1
+    errand_ids = np.repeat(ids, counts)
+    rng.shuffle(errand_ids)
+    n_errands = len(errand_ids)
+
+    order_numbers = encode_base36(errand_ids).to_numpy(zero_copy_only=False).astype(object)
+    invalid = rng.random(n_errands) < invalid_share
+    order_numbers[invalid] = INVALID_ORDER_NUMBERS[rng.integers(0, len(INVALID_ORDER_NUMBERS), invalid.sum())]
+    order_numbers[invalid & (rng.random(n_errands) < 0.2)] = None
+
+    categories = np.array([f"Category {i:02d}" for i in range(25)])
+    errands = pa.table({
+        "order_number": pa.array(order_numbers, type=pa.string()),
+        "errand_category": zipf_choice(rng, categories, n_errands, 1.5),
+        "errand_channel": zipf_choice(rng, CHANNELS, n_errands, 2.0),
+        "errand_type": zipf_choice(rng, np.array([f"Type {i:02d}" for i in range(15)]), n_errands, 1.7),
+        "errand_action": zipf_choice(rng, np.array([f"Action {i:02d}" for i in range(15)]), n_errands, 1.7),
+    })
+    return orders, errands
+
+
+def generate(output_dir, n_orders, seed=0, n_partners=1000, errands_per_order=0.6, invalid_share=0.01,
+             chunk_rows=1_000_000):
+    """
+    Write orders.parquet and errands.parquet to output_dir.
+
+    Parameters:
+        output_dir (str): Target directory (created if missing).
+        n_orders (int): Number of orders (10**4 to 10**8).
+        seed (int): Random seed; the files depend only on the arguments.
+        n_partners (int): Number of distinct partners.
+        errands_per_order (float): Mean number of errands per order.
+        invalid_share (float): Share of errands with an invalid (or missing) order number.
+        chunk_rows (int): Orders generated and written per chunk (one row group each).
+
+    Returns:
+        tuple: (orders path, errands path)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    partners = np.array(["Partner CO"] + [f"Partner {i:04d}" for i in range(1, n_partners)])
+    orders_path = os.path.join(output_dir, "orders.parquet")
+    errands_path = os.path.join(output_dir, "errands.parquet")
+
+    orders_writer = errands_writer = None
+    try:
+        for chunk, start in enumerate(range(0, n_orders, chunk_rows)):
+            stop = min(start + chunk_rows, n_orders)
+            orders, errands = make_chunk(seed, chunk, start, stop, partners, errands_per_order, invalid_share)
+            if orders_writer is None:
+                orders_writer = pq.ParquetWriter(orders_path, orders.schema)
+                errands_writer = pq.ParquetWriter(errands_path, errands.schema)
+            orders_writer.write_table(orders)
+            errands_writer.write_table(errands)
+    finally:
+        for writer in (orders_writer, errands_writer):
+            if writer is not None:
+                writer.close()
+    return orders_path, errands_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--partners", type=int, default=1000)
+    parser.add_argument("--errands-per-order", type=float, default=0.6)
+    parser.add_argument("--invalid", type=float, default=0.01)
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    orders_path, errands_path = generate(
+        args.output_dir, args.orders, args.seed, args.partners, args.errands_per_order, args.invalid,
+        args.chunk_rows,
+    )
+    print(f"wrote {orders_path} ({pq.ParquetFile(orders_path).metadata.num_rows} rows)")
+    print(f"wrote {errands_path} ({pq.ParquetFile(errands_path).metadata.num_rows} rows)")
+
+
+if __name__ == "__main__":
+    main()
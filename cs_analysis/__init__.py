@@ -0,0 +1,54 @@
+"""
+Customer service analysis: metrics and charts for orders with contacts.
+
+Submodules are imported lazily, so importing the package (or just the metrics
+functions) does not load pandas, pyarrow or any plotting library up front.
+"""
+import importlib
+
+# Public name -> submodule that defines it
+_EXPORTS = {
+    "run": "report",
+    "Report": "report",
+    "load_inputs": "report",
+    "join_inputs": "report",
+    "build_charts": "report",
+    "prepare_inputs": "report",
+    "DatasetCache": "cache",
+    "decode_base36_column": "base36",
+    "OrderIndex": "joins",
+    "join_orders": "joins",
+    "normalise_order_ids": "joins",
+    "load_orders": "loader",
+    "load_errands": "loader",
+    "PartitionedDataset": "dataset",
+    "parse_timestamps": "timestamps",
+    "add_calendar_keys": "timestamps",
+    "compute_metrics": "metrics",
+    "ContactMetrics": "metrics",
+    "MetricsResult": "metrics",
+    "ANALYSIS_TASKS": "scheduler",
+    "run_tasks": "scheduler",
+    "render_charts": "rendering",
+    "ApproximateAggregates": "approximate",
+    "SparseCrosstab": "crosstab",
+    "Tracer": "tracing",
+    "DailyRollups": "rollups",
+    "AggregateCube": "cube",
+    "MetricsService": "service",
+    "get_backend": "backends",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return __all__
@@ -0,0 +1,56 @@
+import argparse
+
+from .backends import BACKENDS
+from .rendering import RENDER_MODES
+from .report import run
+from .segments import SEGMENTS
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m cs_analysis", description="Customer service analysis report.")
+    parser.add_argument("--orders", default="orders.parquet", help="Parquet file or partitioned dataset directory")
+    parser.add_argument("--errands", default="errands.parquet", help="Parquet file or dataset directory")
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--start", default=None, help="First Order_created_at date to include")
+    parser.add_argument("--end", default=None, help="First Order_created_at date to exclude")
+    parser.add_argument("--country", action="append", dest="countries", help="Site_country to keep (repeatable)")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--render", choices=RENDER_MODES, default="metrics-only")
+    parser.add_argument("--cache-dir", default=None, help="Reuse decoded/joined inputs cached in this directory")
+    parser.add_argument(
+        "--segments", nargs="+", choices=SEGMENTS, default=None,
+        help="Write top errand categories for every segment of these segmentations",
+    )
+    parser.add_argument("--rollup-dir", default=None, help="Write the daily rollup store to this directory")
+    parser.add_argument("--cube-dir", default=None, help="Write the aggregate cube to this directory")
+    parser.add_argument("--trace", action="store_true", help="Write per-stage timings to trace.json")
+    parser.add_argument(
+        "--chrome-trace", action="store_true", help="Also write trace.chrome.json (chrome://tracing, Perfetto)"
+    )
+    parser.add_argument(
+        "--backend", choices=list(BACKENDS), default="pandas",
+        help="Engine computing the report (polars and duckdb need their package installed)",
+    )
+    args = parser.parse_args()
+
+    date_range = (args.start, args.end) if args.start or args.end else None
+    run(
+        orders_path=args.orders,
+        errands_path=args.errands,
+        output_dir=args.output_dir,
+        date_range=date_range,
+        countries=args.countries,
+        workers=args.workers,
+        render_mode=args.render,
+        cache_dir=args.cache_dir,
+        segments=args.segments,
+        rollup_dir=args.rollup_dir,
+        cube_dir=args.cube_dir,
+        trace=args.trace,
+        chrome_trace=args.chrome_trace,
+        backend=args.backend,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+
+from .crosstab import SparseCrosstab
+from .keys import group_keys
+from .loader import observed_value_counts
+
+
+# The independent analyses of the report. Every function only reads the frames
+# it is given (see ANALYSIS_TASKS in scheduler.py for the declared inputs) and
+# returns small result tables, so they can run in any order or in parallel.
+#
+# Shared frames:
+#   errands: all errands (with a date or country filter, those of the loaded orders)
+#   orders:  all orders, plus 'Contacts' (errands per order) and 'month'
+#   merged:  errands joined to orders, plus 'month'
+# 'month' is the year and month as one yyyymm number (see
+# timestamps.calendar_keys) and is missing for rows whose Order_created_at
+# could not be parsed; like the original script, the date-based sections skip
+# those rows.
+
+
+def _dated(frame):
+    """
+    Rows with a valid order date.
+    """
+    return frame[frame["month"].notna()]
+
+
+# Interaction-rate dimensions: result name -> columns grouped by
+INTERACTION_DIMENSIONS = {
+    "partner": ["Partner"],
+    "origin": ["Origin_country"],
+    "destination": ["Destination_country"],
+    "route": ["Origin_country", "Destination_country"],
+}
+
+
+def interaction_rates(orders, dimensions=None):
+    """
+    Interaction rates (distinct contacted orders / distinct orders, in percent) for several dimensions at once.
+
+    Like a per-group nunique, a dated Order_id counts once in every group it
+    appears in; an order is contacted when it has at least one errand
+    ('Contacts' > 0), so the merged frame is not needed. Every dimension is then
+    two bincounts over integer group keys; a multi-column dimension such as the
+    route gets a (origin, destination) MultiIndex, labelled with join_labels()
+    only where shown.
+
+    Parameters:
+        orders (pd.DataFrame): Orders with Order_id, Contacts, month and the dimension columns.
+        dimensions (dict): Result name -> columns to group by; INTERACTION_DIMENSIONS if omitted.
+
+    Returns:
+        dict: Result name -> pd.Series of rates, highest first (ties by label).
+    """
+    if dimensions is None:
+        dimensions = INTERACTION_DIMENSIONS
+
+    # Dated orders; when every Order_id occurs once, each of them counts in its group
+    order_ids = orders["Order_id"].where(orders["month"].notna())
+    dated = order_ids.notna().to_numpy()
+    repeated = order_ids[dated].duplicated().any()
+    has_contacts = orders["Contacts"].to_numpy() > 0
+
+    rates = {}
+    for name, columns in dimensions.items():
+        keys = group_keys(orders, columns)
+        counted = dated
+        if repeated:
+            # First row of every (Order_id, group) pair
+            pairs = pd.DataFrame({"Order_id": order_ids.to_numpy(), "key": keys.codes})
+            counted = dated & ~pairs.duplicated().to_numpy()
+        contacted = counted & has_contacts
+        total = keys.counts(counted)
+        hits = keys.counts(contacted)
+        present = np.flatnonzero(total > 0)
+        rates[name] = sort_descending(pd.Series(hits[present] / total[present] * 100, index=keys.index(present)))
+    return rates
+
+
+def errand_categories(errands, top_n=10):
+    """
+    Most frequent errand categories.
+    """
+    return observed_value_counts(errands["Errand_category"]).head(top_n)
+
+
+def errand_channels(errands):
+    """
+    Errands per communication channel.
+    """
+    return observed_value_counts(errands["Errand_channel"])
+
+
+def errand_types(errands, top_n=10):
+    """
+    Most frequent errand types.
+    """
+    return observed_value_counts(errands["Errand_type"]).head(top_n)
+
+
+def errand_actions(errands, top_n=10):
+    """
+    Most frequent errand actions.
+    """
+    return observed_value_counts(errands["Errand_action"]).head(top_n)
+
+
+def brand_contacts(merged):
+    """
+    Customer contacts per brand.
+    """
+    return observed_value_counts(merged["Brand"])
+
+
+def brand_categories(merged, brand="Brand A"):
+    """
+    Errand categories of the contacts for one brand.
+    """
+    return observed_value_counts(merged.loc[merged["Brand"] == brand, "Errand_category"])
+
+
+def countries_without_contacts(orders):
+    """
+    Orders without any customer contact per site country.
+    """
+    return observed_value_counts(orders.loc[orders["Contacts"] == 0, "Site_country"])
+
+
+def countries_with_contacts(merged):
+    """
+    Customer contacts per site country.
+    """
+    return observed_value_counts(merged["Site_country"])
+
+
+def monthly_contact_rate(orders, merged):
+    """
+    Contacts per 100 orders for every month (of every year, keyed yyyymm).
+    """
+    monthly_orders = _dated(orders).groupby("month").size()
+    monthly_contacts = _dated(merged).groupby("month").size()
+    return (monthly_contacts / monthly_orders).fillna(0) * 100
+
+
+def partner_categories(merged):
+    """
+    Share of each errand category in the contacts of every partner, as a sparse
+    partner x category crosstab (use .row(partner) for one partner).
+    """
+    dated = merged["month"].notna().to_numpy()
+    return SparseCrosstab.from_frame(merged, ["Partner"], ["Errand_category"], mask=dated).normalize_rows()
+
+
+def country_categories(orders, merged, top_n=10):
+    """
+    Contacts per origin country for the top errand categories, limited to the
+    countries with the highest origin interaction rates.
+    """
+    rates = interaction_rates(orders, {"origin": ["Origin_country"]})["origin"]
+    top_countries = rates.head(top_n).index.tolist()
+
+    selected = (
+        merged["month"].notna()
+        & (merged["Origin_country"].isin(top_countries) | merged["Destination_country"].isin(top_countries))
+    ).to_numpy()
+    by_country = SparseCrosstab.from_frame(merged, ["Origin_country"], ["Errand_category"], mask=selected)
+    return top_columns_table(by_country, top_n)
+
+
+def top_columns_table(crosstab, top_n=10):
+    """
+    Dense table of the top_n columns by total, laid out like groupby(...).size().unstack()[top]:
+    rows sorted by label and tied column totals broken by label.
+    """
+    column_sums = crosstab.column_sums()
+    column_sums = column_sums[column_sums > 0]
+    column_sums = column_sums.iloc[np.argsort(column_sums.index.astype(str), kind="stable")]
+    table = crosstab.to_frame(columns=column_sums.nlargest(top_n).index, fill_value=0)
+    return table.iloc[np.argsort(table.index.astype(str), kind="stable")]
+
+
+def sort_descending(series):
+    """
+    Sort highest first with ties in label order, so every execution path (in memory,
+    streaming, cube) returns tied groups in the same order.
+    """
+    index = series.index
+    labels = [index.get_level_values(level).astype(str).to_numpy() for level in range(index.nlevels)]
+    return series.iloc[np.lexsort(labels[::-1] + [-series.to_numpy()])]
+
+
+def cancellations_by_origin(orders):
+    """
+    Cancelled orders per origin country, highest first (ties by country).
+    """
+    canceled = _dated(orders)
+    canceled = canceled[canceled["Is_canceled"] == 1]
+    return sort_descending(observed_value_counts(canceled["Origin_country"]))
+
+
+def cancel_reasons(orders):
+    """
+    Orders per cancellation reason.
+    """
+    return observed_value_counts(_dated(orders)["Cancel_reason"])
+
+
+def change_reasons(orders):
+    """
+    Orders per booking change reason.
+    """
+    return observed_value_counts(_dated(orders)["Change_reason"])
+
@@ -0,0 +1,235 @@
+"""
+Approximate mode: top-k tables and interaction rates from mergeable sketches.
+
+Top errand categories, types, actions and contacted countries come from
+SpaceSaving sketches (with lower/upper count bounds); distinct orders and
+distinct contacted orders per partner, origin, destination and route come from
+HyperLogLog sketches (~1.6% standard error at the default precision). Because
+HyperLogLog ignores repeats, sketches of different days or workers can be
+merged even when an order is contacted on several days.
+
+The inputs are read in record batches and never joined into a merged frame:
+the errands feed their top-k sketches and leave only the distinct Order_ids
+that have errands, with their errand counts (16 bytes per contacted order);
+the orders are then matched against those ids batch by batch.
+
+Usage:
+    python -m cs_analysis.approximate orders.parquet errands.parquet --save sketches-2024-05-01.json
+    python -m cs_analysis.approximate --merge sketches-2024-05-*.json
+"""
+import argparse
+import json
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from .analyses import INTERACTION_DIMENSIONS
+from .base36 import decode_base36_column
+from .joins import normalise_order_ids
+from .keys import group_keys, join_labels
+from .sketches import DEFAULT_CAPACITY, DEFAULT_PRECISION, HyperLogLog, SpaceSaving, sketch_from_dict
+from .streaming import _raw_columns
+from .timestamps import parse_timestamps
+
+
+# Top-k tables: result name -> (input, column); contacts are counted per order row, weighted by its errands
+TOP_K_COLUMNS = {
+    "errand_categories": ("errands", "Errand_category"),
+    "errand_types": ("errands", "Errand_type"),
+    "errand_actions": ("errands", "Errand_action"),
+    "countries_with_contacts": ("contacts", "Site_country"),
+}
+
+# Columns read from each input
+ORDER_COLUMNS = sorted({"Order_id", "Order_created_at", "Site_country"}.union(*INTERACTION_DIMENSIONS.values()))
+ERRAND_COLUMNS = ["Order_number"] + [column for table, column in TOP_K_COLUMNS.values() if table == "errands"]
+
+# Default number of rows per record batch
+DEFAULT_BATCH_ROWS = 1_000_000
+
+
+def _batches(path, columns, batch_rows):
+    """
+    Record batches of a Parquet file as DataFrames with capitalized column names.
+    """
+    parquet_file = pq.ParquetFile(path)
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=_raw_columns(path, columns)):
+        frame = batch.to_pandas()
+        frame.columns = [name.capitalize() for name in frame.columns]
+        yield frame
+
+
+def _add_grouped(sketch, order_ids, keys, mask):
+    """
+    Add the Order_ids of the masked rows to a HyperLogLog, grouped by their keys (null keys skipped).
+    """
+    mask = mask & (keys.codes >= 0)
+    codes = keys.codes[mask]
+    present = np.flatnonzero(np.bincount(codes, minlength=keys.size))
+    groups = np.zeros(keys.size, dtype=np.int64)
+    groups[present] = np.arange(len(present))
+    sketch.add(order_ids[mask], groups=groups[codes], labels=join_labels(keys.index(present)).tolist())
+
+
+class ApproximateAggregates:
+    """
+    All sketches of the approximate mode.
+
+    Parameters:
+        precision (int): HyperLogLog precision (log2 registers per group).
+        capacity (int): SpaceSaving capacity (tracked values per table).
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION, capacity=DEFAULT_CAPACITY):
+        self.top = {name: SpaceSaving(capacity) for name in TOP_K_COLUMNS}
+        self.orders = {name: HyperLogLog(precision) for name in INTERACTION_DIMENSIONS}
+        self.contacted = {name: HyperLogLog(precision) for name in INTERACTION_DIMENSIONS}
+
+    def _add_errands(self, errands_path, batch_rows):
+        """
+        Add the errands to their top-k sketches.
+
+        Returns:
+            tuple: (sorted distinct Order_ids that have errands, number of errands of each)
+        """
+        ids, counts = [], []
+        for frame in _batches(errands_path, ERRAND_COLUMNS, batch_rows):
+            for name, (table, column) in TOP_K_COLUMNS.items():
+                if table == "errands":
+                    self.top[name].add(frame[column])
+            order_ids = decode_base36_column(frame["Order_number"]).dropna().to_numpy(dtype=np.int64)
+            batch_ids, batch_counts = np.unique(order_ids, return_counts=True)
+            ids.append(batch_ids)
+            counts.append(batch_counts)
+
+        if not ids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        contacted_ids, positions = np.unique(np.concatenate(ids), return_inverse=True)
+        return contacted_ids, np.bincount(positions, weights=np.concatenate(counts)).astype(np.int64)
+
+    def update(self, orders_path, errands_path, batch_rows=DEFAULT_BATCH_ROWS):
+        """
+        Add an orders and an errands Parquet file to the sketches, reading record batches, and return self.
+
+        Parameters:
+            orders_path (str): Path of orders.parquet.
+            errands_path (str): Path of errands.parquet.
+            batch_rows (int): Rows per record batch.
+        """
+        contacted_ids, errand_counts = self._add_errands(errands_path, batch_rows)
+
+        for frame in _batches(orders_path, ORDER_COLUMNS, batch_rows):
+            order_ids = normalise_order_ids(frame["Order_id"])
+            ids = order_ids.to_numpy(dtype=np.int64, na_value=0)
+
+            # Errands per order row: what joining the errands to the orders would give
+            positions = np.searchsorted(contacted_ids, ids)
+            matched = order_ids.notna().to_numpy() & (positions < len(contacted_ids))
+            matched[matched] = contacted_ids[positions[matched]] == ids[matched]
+            errands = errand_counts[positions[matched]]
+            self.top["countries_with_contacts"].add(frame["Site_country"][matched], weights=errands)
+
+            # Like the script, the rates only use orders with a valid order date
+            dated = parse_timestamps(frame["Order_created_at"]).notna().to_numpy() & order_ids.notna().to_numpy()
+            for name, columns in INTERACTION_DIMENSIONS.items():
+                groups = group_keys(frame, columns)
+                _add_grouped(self.orders[name], ids, groups, dated)
+                _add_grouped(self.contacted[name], ids, groups, dated & matched)
+        return self
+
+    def merge(self, other):
+        """
+        Fold another ApproximateAggregates (e.g. another day or worker) into this one and return self.
+        """
+        for name, sketch in other.top.items():
+            self.top[name].merge(sketch)
+        for name in INTERACTION_DIMENSIONS:
+            self.orders[name].merge(other.orders[name])
+            self.contacted[name].merge(other.contacted[name])
+        return self
+
+    def tables(self, top_n=10):
+        """
+        Estimated tables with error bounds.
+
+        Returns:
+            dict: Top-k name -> DataFrame (count, lower, error) and
+                '<dimension>_interaction_rates' -> DataFrame (rate, error in
+                percentage points, one standard error), highest rate first.
+        """
+        tables = {name: sketch.top(top_n) for name, sketch in self.top.items()}
+        for name in INTERACTION_DIMENSIONS:
+            total = self.orders[name].estimate()
+            hits = self.contacted[name].estimate().reindex(total.index, fill_value=0)
+            rates = (hits / total * 100).clip(upper=100)
+            # Both estimates carry the relative standard error of the sketch
+            error = rates * np.sqrt(2) * self.orders[name].relative_error
+            tables[f"{name}_interaction_rates"] = pd.DataFrame({"rate": rates, "error": error}).sort_values(
+                "rate", ascending=False, kind="stable"
+            )
+        return tables
+
+    def to_dict(self):
+        return {
+            "top": {name: sketch.to_dict() for name, sketch in self.top.items()},
+            "orders": {name: sketch.to_dict() for name, sketch in self.orders.items()},
+            "contacted": {name: sketch.to_dict() for name, sketch in self.contacted.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregates = cls()
+        aggregates.top = {name: sketch_from_dict(sketch) for name, sketch in data["top"].items()}
+        aggregates.orders = {name: sketch_from_dict(sketch) for name, sketch in data["orders"].items()}
+        aggregates.contacted = {name: sketch_from_dict(sketch) for name, sketch in data["contacted"].items()}
+        return aggregates
+
+    def save(self, path):
+        with open(path, "w") as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as file:
+            return cls.from_dict(json.load(file))
+
+
+def write_tables(tables, path):
+    """
+    Write the approximate tables as JSON (one list of records per table).
+    """
+    data = {
+        name: table.rename_axis("value").reset_index().to_dict(orient="records")
+        for name, table in tables.items()
+    }
+    with open(path, "w") as file:
+        json.dump(data, file, indent=2, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Approximate customer service tables from mergeable sketches.")
+    parser.add_argument("orders", nargs="?", default=None)
+    parser.add_argument("errands", nargs="?", default=None)
+    parser.add_argument("--merge", nargs="*", default=[], help="Saved sketch files to combine")
+    parser.add_argument("--save", default=None, help="Write the combined sketches to this file")
+    parser.add_argument("--precision", type=int, default=DEFAULT_PRECISION)
+    parser.add_argument("--capacity", type=int, default=DEFAULT_CAPACITY)
+    parser.add_argument("--top-n", type=int, default=10)
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS)
+    parser.add_argument("--output", default="approximate_metrics.json")
+    args = parser.parse_args()
+
+    aggregates = ApproximateAggregates(args.precision, args.capacity)
+    if args.orders and args.errands:
+        aggregates.update(args.orders, args.errands, args.batch_rows)
+    for path in args.merge:
+        aggregates.merge(ApproximateAggregates.load(path))
+
+    if args.save:
+        aggregates.save(args.save)
+    write_tables(aggregates.tables(args.top_n), args.output)
+
+
+if __name__ == "__main__":
+    main()
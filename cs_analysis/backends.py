@@ -0,0 +1,517 @@
+"""
+Execution backends: the report computed by pandas, Polars (LazyFrame) or DuckDB (embedded).
+
+A backend has one job: aggregate the Parquet inputs into the fact cells of the
+aggregate cube (cube.GROUPING_SETS). Every analysis is then answered once, by
+AggregateCube.results() and .metrics(), whichever engine produced the cells:
+
+    cube = get_backend("duckdb").cube("orders.parquet", "errands.parquet")
+    metrics_result, results = cube.metrics(), cube.results()
+
+The lazy engines read only the needed columns, push the date and country
+filters into the scan, decode and join inside the engine and run the
+group-bys multithreaded; DuckDB spills to disk when the data exceeds memory
+and Polars can run its streaming engine. Polars and DuckDB are optional
+imports, needed only when their backend is used.
+
+Dimension values are ordered by first appearance in the rows left after the
+date and country filters, like the categories of the pandas loader
+(loader.first_appearance_categories), so tied counts rank the same in every backend.
+String dates are parsed with the format timestamps.timestamp_format detects from
+the first value, as parse_timestamps does; formats with fractional seconds or
+time zones, which the engines read differently from pandas, need the pandas backend.
+"""
+import importlib
+import os
+from abc import ABC, abstractmethod
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .base36 import BUFFER_WIDTH, MAX_DIGITS, decode_base36_column
+from .cube import GROUPING_SETS, MEASURES, AggregateCube, _used_columns
+from .loader import CATEGORICAL_COLUMNS, COUNTRY_COLUMN, DATE_COLUMN, _resolve_columns
+from .timestamps import timestamp_format
+
+
+# Order columns carried into the errands matched to an order
+_ORDER_COLUMNS = ["Brand", "Partner", "Site_country", "Origin_country", "Destination_country"]
+_ERRAND_COLUMNS = ["Errand_category", "Errand_channel", "Errand_type", "Errand_action"]
+_CANCEL_COLUMNS = ["Is_canceled", "Cancel_reason", "Change_reason"]
+
+# Characters stripped around a base-36 order number, and the accepted shape (as in base36.py)
+_BLANKS = " \t\n\v\f\r\0"
+_BASE36 = f"^[+-]?[0-9A-Za-z]{{1,{MAX_DIGITS}}}$"
+
+# strftime directives the engines parse differently from pandas
+_UNSUPPORTED_DIRECTIVES = ("%f", "%z", "%Z")
+
+
+def _import(module, backend):
+    try:
+        return importlib.import_module(module)
+    except ImportError:
+        raise ImportError(f"The {backend} backend needs the '{module}' package (pip install {module})") from None
+
+
+def _columns(path, columns):
+    """
+    Capitalized name -> (raw name, pyarrow type) for the columns of a Parquet file.
+    """
+    schema = pq.read_schema(path)
+    resolved = _resolve_columns(schema, columns)
+    return {column: (raw, schema.field(raw).type) for column, raw in resolved.items()}
+
+
+def _date_format(path, raw, field_type):
+    """
+    Format of a string date column, detected from its first non-null value like parse_timestamps does.
+
+    Returns:
+        str: strftime format, or None for timestamp and date columns and for columns without values.
+    """
+    if pa.types.is_timestamp(field_type) or pa.types.is_date(field_type):
+        return None
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=65_536, columns=[raw]):
+        values = batch.column(0).drop_null()
+        if len(values):
+            first = values[0].as_py()
+            break
+    else:
+        return None
+    fmt = timestamp_format(first) if isinstance(first, str) else None
+    if fmt is None or any(directive in fmt for directive in _UNSUPPORTED_DIRECTIVES):
+        raise ValueError(
+            f"{DATE_COLUMN} values like {first!r} are only parsed by the pandas backend "
+            "(no format detected, or fractional seconds or a time zone)"
+        )
+    return fmt
+
+
+def _finish(tables, categories, grouping_sets):
+    """
+    Give engine output the cube's layout: categorical dimensions in first-appearance order,
+    Int32 'month' (missing when the date is) and int64 measures, cells ordered like AggregateCube.build.
+    """
+    finished = {}
+    for fact, table in tables.items():
+        table = table.copy()
+        for column in {column for dimensions in grouping_sets[fact] for column in dimensions}:
+            if column in categories:
+                table[column] = pd.Categorical(table[column], categories=categories[column], ordered=False)
+            elif column == "month":
+                table[column] = table[column].astype("Int32")
+            else:
+                table[column] = table[column].astype("Int64")
+        for measure in MEASURES[fact] + ["grouping_set"]:
+            table[measure] = table[measure].astype(np.int64)
+
+        # Sort every grouping set's cells by its dimensions (categories in category order, nulls last)
+        parts = []
+        for position, dimensions in enumerate(grouping_sets[fact]):
+            cells = table[table["grouping_set"] == position]
+            parts.append(cells.sort_values(list(dimensions), na_position="last", kind="stable"))
+        finished[fact] = pd.concat(parts, ignore_index=True)[
+            _used_columns(grouping_sets[fact]) + MEASURES[fact] + ["grouping_set"]
+        ]
+    return finished
+
+
+class Backend(ABC):
+    """
+    Aggregates the report's inputs into the fact cells of an AggregateCube.
+    """
+
+    name = None
+
+    @abstractmethod
+    def cube(self, orders_path, errands_path, date_range=None, countries=None, grouping_sets=None):
+        """
+        Build the aggregate cube of two Parquet inputs.
+
+        Parameters:
+            orders_path (str): Path of orders.parquet.
+            errands_path (str): Path of errands.parquet.
+            date_range (tuple): (start, end) bounds on Order_created_at, end exclusive.
+            countries (list of str): Site_country values to keep.
+            grouping_sets (dict): Fact name -> dimension tuples; cube.GROUPING_SETS if omitted.
+
+        Returns:
+            AggregateCube: The cube; .results() and .metrics() give the report's tables.
+        """
+
+
+class EngineBackend(Backend):
+    """
+    A backend whose engine reads the Parquet files and aggregates the cells itself.
+    """
+
+    def cube(self, orders_path, errands_path, date_range=None, countries=None, grouping_sets=None):
+        if os.path.isdir(orders_path) or os.path.isdir(errands_path):
+            raise ValueError(f"The {self.name} backend reads single Parquet files; use pandas for dataset directories")
+        grouping_sets = GROUPING_SETS if grouping_sets is None else grouping_sets
+        tables, categories = self.aggregate(orders_path, errands_path, date_range, countries, grouping_sets)
+        sets = {name: [tuple(dimensions) for dimensions in grouping_sets[name]] for name in MEASURES}
+        return AggregateCube(_finish(tables, categories, sets), sets)
+
+    @abstractmethod
+    def aggregate(self, orders_path, errands_path, date_range, countries, grouping_sets):
+        """
+        Engine-specific part of cube().
+
+        Returns:
+            tuple: (fact name -> pd.DataFrame of cells with a 'grouping_set' column,
+                categorical column -> its values in first-appearance order)
+        """
+
+
+class PandasBackend(Backend):
+    """
+    The in-memory pandas pipeline (report.prepare_inputs) followed by AggregateCube.build.
+    """
+
+    name = "pandas"
+
+    def cube(self, orders_path, errands_path, date_range=None, countries=None, grouping_sets=None):
+        from .report import prepare_inputs
+
+        orders_df, merged_df, errands_df = prepare_inputs(orders_path, errands_path, date_range, countries)
+        return AggregateCube.build(orders_df, merged_df, errands_df, grouping_sets)
+
+
+class PolarsBackend(EngineBackend):
+    """
+    One Polars lazy query plan per fact and grouping set, collected together.
+
+    Parameters:
+        streaming (bool): Run on Polars' streaming engine (inputs larger than memory).
+    """
+
+    name = "polars"
+
+    def __init__(self, streaming=False):
+        self.pl = _import("polars", self.name)
+        self.streaming = streaming
+
+    def _scan(self, path, columns):
+        pl = self.pl
+        resolved = _columns(path, columns)
+        frame = pl.scan_parquet(path).select([pl.col(raw).alias(column) for column, (raw, _) in resolved.items()])
+        return frame.with_row_index("row_index"), resolved
+
+    def _order_ids(self, column, field_type):
+        """
+        Order_id as Int64 like joins.normalise_order_ids: integers as they are, other values only if whole.
+        """
+        pl = self.pl
+        values = pl.col(column)
+        if pa.types.is_integer(field_type):
+            return values.cast(pl.Int64)
+        if not pa.types.is_floating(field_type):
+            text = values.cast(pl.String).str.strip_chars()
+            as_integer = text.cast(pl.Int64, strict=False)
+            values = pl.coalesce(as_integer.cast(pl.Float64), text.cast(pl.Float64, strict=False))
+        return pl.when(values == values.floor()).then(values).cast(pl.Int64, strict=False)
+
+    def _created(self, field_type, fmt):
+        pl = self.pl
+        created = pl.col(DATE_COLUMN)
+        if pa.types.is_timestamp(field_type) or pa.types.is_date(field_type):
+            return created.cast(pl.Datetime("us"))
+        if fmt is None:
+            return pl.lit(None, dtype=pl.Datetime("us"))
+        # Like pandas, values with surrounding whitespace do not match the format
+        text = created.cast(pl.String)
+        parsed = text.str.strptime(pl.Datetime("us"), fmt, strict=False)
+        return pl.when(text == text.str.strip_chars()).then(parsed)
+
+    def _first_seen(self, frame, columns):
+        pl = self.pl
+        return [frame.select(pl.col(column).drop_nulls().unique(maintain_order=True)) for column in columns]
+
+    def aggregate(self, orders_path, errands_path, date_range, countries, grouping_sets):
+        pl = self.pl
+        order_columns = ["Order_id", DATE_COLUMN] + _ORDER_COLUMNS + _CANCEL_COLUMNS
+        orders, order_types = self._scan(orders_path, order_columns)
+        created_format = _date_format(orders_path, *order_types[DATE_COLUMN])
+        errands, _ = self._scan(errands_path, ["Order_number"] + _ERRAND_COLUMNS)
+        categorical = [column for column in order_columns if column in CATEGORICAL_COLUMNS] + _ERRAND_COLUMNS
+
+        # Orders: filters, keys, dates, then the first row of every Order_id
+        orders = orders.with_columns(
+            Order_id=self._order_ids("Order_id", order_types["Order_id"][1]),
+            **{DATE_COLUMN: self._created(order_types[DATE_COLUMN][1], created_format)},
+        )
+        if countries is not None:
+            orders = orders.filter(pl.col(COUNTRY_COLUMN).is_in(list(countries)))
+        if date_range is not None:
+            start, end = date_range
+            if start is not None:
+                orders = orders.filter(pl.col(DATE_COLUMN) >= pd.Timestamp(start).to_pydatetime())
+            if end is not None:
+                orders = orders.filter(pl.col(DATE_COLUMN) < pd.Timestamp(end).to_pydatetime())
+        created = pl.col(DATE_COLUMN)
+        orders = orders.with_columns(
+            month=created.dt.year().cast(pl.Int64) * 100 + created.dt.month().cast(pl.Int64),
+            first=pl.col("Order_id").is_not_null() & pl.col("Order_id").is_first_distinct(),
+        )
+
+        # Errands: base-36 decode in the engine, with the rules of base36.decode_base36_column
+        text = pl.col("Order_number").str.strip_chars(_BLANKS)
+        valid = text.str.contains(_BASE36) & (pl.col("Order_number").str.len_chars() < BUFFER_WIDTH)
+        errands = errands.with_columns(
+            Order_id=pl.when(valid).then(text.str.to_integer(base=36, strict=False).cast(pl.Int64))
+        )
+        if date_range is not None or countries is not None:
+            # Filtered orders: only their errands, like report.prepare_inputs
+            errands = errands.join(orders.select("Order_id"), on="Order_id", how="semi", maintain_order="left")
+        seen = self._first_seen(orders, categorical[:-len(_ERRAND_COLUMNS)])
+        seen += self._first_seen(errands, _ERRAND_COLUMNS)
+
+        contacts = errands.filter(pl.col("Order_id").is_not_null()).group_by("Order_id").agg(Contacts=pl.len())
+        orders = orders.join(contacts, on="Order_id", how="left").with_columns(
+            Contacts=pl.col("Contacts").fill_null(0).cast(pl.Int64)
+        )
+        merged = errands.filter(pl.col("Order_id").is_not_null()).join(
+            orders.select(["Order_id", "month"] + _ORDER_COLUMNS), on="Order_id", how="inner"
+        )
+
+        measures = {
+            "orders": [
+                pl.len().alias("orders"),
+                pl.col("first").sum().alias("distinct_orders"),
+                (pl.col("first") & (pl.col("Contacts") > 0)).sum().alias("contacted_orders"),
+                (pl.col("Contacts") == 0).sum().alias("uncontacted_orders"),
+                pl.col("Contacts").sum().alias("errands"),
+                (pl.col("Is_canceled") == 1).sum().alias("cancellations"),
+            ],
+            "contacts": [pl.len().alias("contacts")],
+            "errands": [pl.len().alias("contacts")],
+        }
+        sources = {"orders": orders, "contacts": merged, "errands": errands}
+        plans, keys = [], []
+        for fact in MEASURES:
+            for position, dimensions in enumerate(grouping_sets[fact]):
+                plans.append(
+                    sources[fact].group_by(list(dimensions)).agg(measures[fact])
+                    .with_columns(grouping_set=pl.lit(position))
+                )
+                keys.append(fact)
+
+        # All plans in one go: the shared scans, decode and joins are computed once
+        collected = pl.collect_all(seen + plans, engine="streaming" if self.streaming else "auto")
+        categories = {column: table[column].to_list() for column, table in zip(categorical, collected)}
+        collected = collected[len(seen):]
+        tables = {
+            fact: pd.concat([table.to_pandas() for key, table in zip(keys, collected) if key == fact],
+                            ignore_index=True)
+            for fact in MEASURES
+        }
+        return tables, categories
+
+
+class DuckDBBackend(EngineBackend):
+    """
+    The report as SQL over read_parquet() in an embedded DuckDB, one GROUPING SETS query per fact.
+
+    Parameters:
+        memory_limit (str): DuckDB memory limit, e.g. "4GB"; larger intermediates spill to temp_directory.
+        temp_directory (str): Spill directory (DuckDB's default if None).
+        threads (int): Worker threads (all cores if None).
+    """
+
+    name = "duckdb"
+
+    def __init__(self, memory_limit=None, temp_directory=None, threads=None):
+        self.duckdb = _import("duckdb", self.name)
+        self.memory_limit = memory_limit
+        self.temp_directory = temp_directory
+        self.threads = threads
+
+    def _connect(self):
+        connection = self.duckdb.connect()
+        for setting, value in (
+            ("memory_limit", self.memory_limit), ("temp_directory", self.temp_directory), ("threads", self.threads)
+        ):
+            if value is not None:
+                connection.execute(f"SET {setting} = '{value}'")
+
+        # The package's own vectorized decoder, called on Arrow batches
+        def decode(values):
+            decoded = decode_base36_column(pd.Series(values.to_pandas(), dtype=object))
+            return pa.array(decoded, type=pa.int64())
+
+        connection.create_function(
+            "decode_base36", decode, ["VARCHAR"], "BIGINT", type="arrow", null_handling="special"
+        )
+        return connection
+
+    @staticmethod
+    def _source(path, columns):
+        resolved = _columns(path, columns)
+        select = ", ".join(f'"{raw}" AS {column}' for column, (raw, _) in resolved.items())
+        escaped = path.replace("'", "''")
+        sql = f"SELECT file_row_number AS row_index, {select} FROM read_parquet('{escaped}', file_row_number=true)"
+        return sql, resolved
+
+    @staticmethod
+    def _order_ids(field_type):
+        if pa.types.is_integer(field_type):
+            return "CAST(Order_id AS BIGINT)"
+        if pa.types.is_floating(field_type):
+            value = "Order_id"
+        else:
+            text = "trim(CAST(Order_id AS VARCHAR))"
+            value = f"coalesce(CAST(TRY_CAST({text} AS BIGINT) AS DOUBLE), TRY_CAST({text} AS DOUBLE))"
+        return f"CASE WHEN {value} = floor({value}) THEN TRY_CAST({value} AS BIGINT) END"
+
+    @staticmethod
+    def _created(field_type, fmt):
+        if pa.types.is_timestamp(field_type) or pa.types.is_date(field_type):
+            return f"CAST({DATE_COLUMN} AS TIMESTAMP)"
+        if fmt is None:
+            return "CAST(NULL AS TIMESTAMP)"
+        # Like pandas, values with surrounding whitespace do not match the format
+        text = f"CAST({DATE_COLUMN} AS VARCHAR)"
+        fmt = fmt.replace("'", "''")
+        return f"CASE WHEN {text} = trim({text}, ' \t\n\r\v\f') THEN try_strptime({text}, '{fmt}') END"
+
+    @staticmethod
+    def _first_seen(connection, table, columns):
+        return {
+            column: [
+                row[0] for row in connection.execute(
+                    f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL "
+                    f"GROUP BY {column} ORDER BY min(row_index)"
+                ).fetchall()
+            ]
+            for column in columns
+        }
+
+    def aggregate(self, orders_path, errands_path, date_range, countries, grouping_sets):
+        connection = self._connect()
+        order_columns = ["Order_id", DATE_COLUMN] + _ORDER_COLUMNS + _CANCEL_COLUMNS
+        orders_sql, order_types = self._source(orders_path, order_columns)
+        created_format = _date_format(orders_path, *order_types[DATE_COLUMN])
+        errands_sql, _ = self._source(errands_path, ["Order_number"] + _ERRAND_COLUMNS)
+        connection.execute(f"CREATE TEMP VIEW orders_source AS {orders_sql}")
+        connection.execute(f"CREATE TEMP VIEW errands_source AS {errands_sql}")
+
+        conditions, parameters = [], []
+        if countries is not None:
+            conditions.append(f"{COUNTRY_COLUMN} IN (SELECT unnest(?))")
+            parameters.append(list(countries))
+        if date_range is not None:
+            start, end = date_range
+            if start is not None:
+                conditions.append("created >= ?")
+                parameters.append(pd.Timestamp(start).to_pydatetime())
+            if end is not None:
+                conditions.append("created < ?")
+                parameters.append(pd.Timestamp(end).to_pydatetime())
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        order_dimensions = ", ".join(_ORDER_COLUMNS + _CANCEL_COLUMNS)
+        connection.execute(
+            f"""
+            CREATE TEMP TABLE filtered AS
+            WITH keyed AS (
+                SELECT row_index, {self._order_ids(order_types["Order_id"][1])} AS Order_id,
+                       {self._created(order_types[DATE_COLUMN][1], created_format)} AS created, {order_dimensions}
+                FROM orders_source
+            )
+            SELECT * FROM keyed {where}
+            """,
+            parameters,
+        )
+        # Errands with their decoded key; with filtered orders only their errands, like report.prepare_inputs
+        semi_join = "WHERE Order_id IN (SELECT Order_id FROM filtered)" if conditions else ""
+        connection.execute(
+            "CREATE TEMP TABLE decoded AS SELECT * FROM ("
+            f"SELECT row_index, decode_base36(Order_number) AS Order_id, {', '.join(_ERRAND_COLUMNS)} "
+            f"FROM errands_source) {semi_join}"
+        )
+        categories = {
+            **self._first_seen(
+                connection, "filtered", [column for column in order_columns if column in CATEGORICAL_COLUMNS]
+            ),
+            **self._first_seen(connection, "decoded", _ERRAND_COLUMNS),
+        }
+
+        # Text dimensions become ENUMs in that order: integer joins and group-bys, categorical results
+        typed = {}
+        for column, values in categories.items():
+            if values and all(isinstance(value, str) for value in values):
+                labels = ", ".join("'" + value.replace("'", "''") + "'" for value in values)
+                connection.execute(f"CREATE TYPE {column}_enum AS ENUM ({labels})")
+                typed[column] = f"CAST({column} AS {column}_enum) AS {column}"
+
+        # Errands with typed dimensions; orders with their contact count and first-row flag
+        connection.execute(
+            "CREATE TEMP TABLE errands AS SELECT row_index, Order_id, "
+            f"{', '.join(typed.get(column, column) for column in _ERRAND_COLUMNS)} FROM decoded"
+        )
+        connection.execute(
+            f"""
+            CREATE TEMP TABLE orders AS
+            WITH contacts AS (
+                SELECT Order_id, count(*) AS Contacts FROM errands WHERE Order_id IS NOT NULL GROUP BY Order_id
+            )
+            SELECT filtered.* EXCLUDE ({order_dimensions}),
+                   {', '.join(typed.get(column, column) for column in _ORDER_COLUMNS + _CANCEL_COLUMNS)},
+                   CAST(year(created) * 100 + month(created) AS BIGINT) AS month,
+                   coalesce(contacts.Contacts, 0) AS Contacts,
+                   filtered.Order_id IS NOT NULL
+                       AND row_number() OVER (PARTITION BY filtered.Order_id ORDER BY row_index) = 1 AS first
+            FROM filtered LEFT JOIN contacts USING (Order_id)
+            """
+        )
+        connection.execute(
+            f"""
+            CREATE TEMP VIEW contacts AS
+            SELECT errands.*, orders.month, {', '.join(f'orders.{column}' for column in _ORDER_COLUMNS)}
+            FROM errands JOIN orders USING (Order_id)
+            """
+        )
+
+        measures = {
+            "orders": """count(*) AS orders,
+                         count(*) FILTER (WHERE first) AS distinct_orders,
+                         count(*) FILTER (WHERE first AND Contacts > 0) AS contacted_orders,
+                         count(*) FILTER (WHERE Contacts = 0) AS uncontacted_orders,
+                         sum(Contacts) AS errands,
+                         count(*) FILTER (WHERE Is_canceled = 1) AS cancellations""",
+            "contacts": "count(*) AS contacts",
+            "errands": "count(*) AS contacts",
+        }
+        tables = {}
+        for fact in MEASURES:
+            dimensions = sorted({column for dimensions in grouping_sets[fact] for column in dimensions})
+            sets = ", ".join(f"({', '.join(dimensions)})" for dimensions in grouping_sets[fact])
+            table = connection.execute(
+                f"SELECT {', '.join(dimensions)}, GROUPING({', '.join(dimensions)}) AS grouping_id, {measures[fact]} "
+                f"FROM {fact} GROUP BY GROUPING SETS ({sets})"
+            ).df()
+
+            # GROUPING() sets a bit for every dimension a set does not group by (first dimension highest)
+            bits = {}
+            for position, group in enumerate(grouping_sets[fact]):
+                missing = [index for index, column in enumerate(dimensions) if column not in group]
+                bits[sum(1 << (len(dimensions) - 1 - index) for index in missing)] = position
+            table["grouping_set"] = table.pop("grouping_id").map(bits)
+            tables[fact] = table
+        connection.close()
+        return tables, categories
+
+
+BACKENDS = {"pandas": PandasBackend, "polars": PolarsBackend, "duckdb": DuckDBBackend}
+
+
+def get_backend(name, **options):
+    """
+    Backend instance by name ("pandas", "polars" or "duckdb"); options go to its constructor.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend '{name}', expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
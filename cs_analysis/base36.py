@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+
+# Largest number of base-36 digits that always fits in an int64 (36**12 < 2**63)
+MAX_DIGITS = 12
+
+# Fixed character width used for the decode buffer: digits, a sign and some
+# surrounding whitespace. Longer values are treated as invalid.
+BUFFER_WIDTH = MAX_DIGITS + 8
+
+# Default number of rows decoded per buffer, keeps the character matrix small
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# Character class table indexed by code point (anything >= 128 maps to the last entry):
+# 0-35 are base-36 digit values, _BLANK marks padding/whitespace and _INVALID anything else
+_BLANK = -2
+_INVALID = -1
+_CLASS_TABLE = np.full(129, _INVALID, dtype=np.int8)
+_CLASS_TABLE[ord("0"):ord("9") + 1] = np.arange(10)
+_CLASS_TABLE[ord("a"):ord("z") + 1] = np.arange(10, 36)
+_CLASS_TABLE[ord("A"):ord("Z") + 1] = np.arange(10, 36)
+_CLASS_TABLE[[0, 9, 10, 11, 12, 13, 32]] = _BLANK  # NUL padding and str.strip() whitespace
+
+
+def decode_base36(value):
+    """
+    Decode a single base-36 string to an integer (row-by-row reference implementation).
+
+    Parameters:
+        value (str): The base-36 encoded value.
+
+    Returns:
+        int or None: The decoded integer, or None if the value is not valid base-36.
+    """
+    try:
+        return int(value, 36)  # Convert base-36 to base-10
+    except (TypeError, ValueError):
+        return None  # Handle invalid values
+
+
+def _decode_chunk(text):
+    """
+    Decode a fixed-width unicode array of base-36 strings.
+
+    Parameters:
+        text (np.ndarray): Array of dtype '<U{BUFFER_WIDTH}'.
+
+    Returns:
+        tuple: (int64 values, boolean mask of valid rows)
+    """
+    # View the unicode buffer as a (rows x width) matrix of UCS-4 code points and
+    # transpose it so every character position is a contiguous column
+    codes = np.ascontiguousarray(text.view(np.uint32).reshape(len(text), BUFFER_WIDTH).T)
+    truncated = codes[-1] != 0  # a full buffer means the value was cut off
+
+    # Drop trailing character positions that are padding in every row
+    width = BUFFER_WIDTH
+    while width > 1 and not codes[width - 1].any():
+        width -= 1
+    codes = codes[:width]
+    classes = _CLASS_TABLE[np.minimum(codes, 128).astype(np.uint8)]
+
+    filled = classes != _BLANK
+    is_digit = classes >= 0
+
+    # Non-blank characters must form one contiguous run (i.e. only outer whitespace)
+    n_filled = np.count_nonzero(filled, axis=0)
+    first = filled.argmax(axis=0)
+    last = width - 1 - filled[::-1].argmax(axis=0)
+    contiguous = (last - first + 1) == n_filled
+
+    # An optional sign is allowed in front of the digits
+    lead = codes[first, np.arange(codes.shape[1])]
+    negative = lead == ord("-")
+    signed = negative | (lead == ord("+"))
+
+    n_digits = np.count_nonzero(is_digit, axis=0)
+    valid = (
+        contiguous
+        & (n_digits >= 1)
+        & (n_digits == n_filled - signed)
+        & (n_digits <= MAX_DIGITS)
+        & ~truncated
+    )
+
+    # Horner's scheme over the character columns, skipping non-digit positions
+    result = np.zeros(codes.shape[1], dtype=np.int64)
+    for column, step in zip(classes, is_digit):
+        if not step.any():
+            continue
+        np.multiply(result, 36, out=result, where=step)
+        np.add(result, column, out=result, where=step)
+    np.negative(result, out=result, where=negative)
+
+    return result, valid
+
+
+def decode_base36_column(values, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Decode a column of base-36 strings to a nullable int64 column in batches.
+
+    Works on whole column buffers using character-table arithmetic instead of
+    calling int() per row. Only the rows that arithmetic rejects are retried
+    with decode_base36(), so the result matches int(value, 36) for every str
+    or bytes value whose result fits in an int64 (including leading zeros,
+    underscores and non-ASCII digits or whitespace). Null, empty, non base-36,
+    out-of-range and non-string values become <NA>.
+
+    Parameters:
+        values (pd.Series or array-like): The base-36 encoded values.
+        chunk_size (int): Number of rows decoded per buffer.
+
+    Returns:
+        pd.Series: Decoded values with dtype 'Int64', aligned to the input index.
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(values)
+    raw = series.to_numpy(dtype=object, na_value="")
+
+    # int() only accepts str and bytes; anything else (e.g. ints) is invalid,
+    # and is blanked so the buffer never holds its str() form
+    all_str = isinstance(series.dtype, pd.StringDtype) or pd.api.types.infer_dtype(raw) in ("string", "empty")
+    if all_str:
+        is_str = decodable = np.ones(len(raw), dtype=bool)
+    else:
+        is_str = np.fromiter((isinstance(value, str) for value in raw), dtype=bool, count=len(raw))
+        decodable = is_str | np.fromiter(
+            (isinstance(value, (bytes, bytearray)) for value in raw), dtype=bool, count=len(raw)
+        )
+
+    decoded = np.zeros(len(raw), dtype=np.int64)
+    valid = np.zeros(len(raw), dtype=bool)
+    for start in range(0, len(raw), chunk_size):
+        stop = start + chunk_size
+        chunk = raw[start:stop] if all_str else np.where(is_str[start:stop], raw[start:stop], "")
+        text = chunk.astype(f"<U{BUFFER_WIDTH}")
+        decoded[start:stop], valid[start:stop] = _decode_chunk(text)
+
+    # Retry rejected rows with int(), which also accepts what the buffer
+    # arithmetic does not (leading zeros beyond MAX_DIGITS, underscores, ...)
+    for row in np.flatnonzero(~valid & decodable & (raw != "")):
+        value = decode_base36(raw[row])
+        if value is not None and -(2 ** 63) <= value < 2 ** 63:
+            decoded[row] = value
+            valid[row] = True
+
+    return pd.Series(
+        pd.arrays.IntegerArray(decoded, ~valid),
+        index=series.index,
+        name=series.name,
+    )
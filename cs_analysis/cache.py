@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import pyarrow.feather as feather
+
+
+# Bump when the cached frames change shape, so older entries are never reused
+CACHE_VERSION = 3
+
+# Defaults for eviction: entries unused for a week, and at most 20 GB in total
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+DEFAULT_MAX_BYTES = 20 * 1024 ** 3
+
+# Unfinished writes (".tmp-<pid>") untouched this long are left over from a crashed run
+STALE_TMP_AGE = 3600
+
+_FINGERPRINTS = "fingerprints"
+_META = "meta.json"
+
+
+def _content_hash(path, block_size=1 << 20):
+    """
+    blake2b digest of a file's content, read in 1 MB blocks.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _last_modified(path):
+    """
+    Latest mtime of a file, or of a directory and the files in it.
+    """
+    if not os.path.isdir(path):
+        return os.path.getmtime(path)
+    return max([os.path.getmtime(path)] + [os.path.getmtime(os.path.join(path, name)) for name in os.listdir(path)])
+
+
+class DatasetCache:
+    """
+    On-disk cache of the decoded and joined frames, keyed by input fingerprints.
+
+    Every input file is fingerprinted by size, mtime and content hash. The content
+    hash is only recomputed when size or mtime changed since it was last taken.
+    Frames are stored as uncompressed Feather (Arrow IPC) files and read back
+    memory-mapped. Entries are evicted by age and by total size, least recently
+    used first.
+
+    Concurrent runs may share a directory: every fingerprint is a file of its own
+    and every entry is written under a per-process name, then renamed into place.
+    Unfinished writes left by crashed runs are removed when the cache is opened.
+
+    Parameters:
+        directory (str): Cache directory (created if missing).
+        max_age (float): Seconds an unused entry is kept.
+        max_bytes (int): Upper bound on the total size of all entries.
+    """
+
+    def __init__(self, directory, max_age=DEFAULT_MAX_AGE, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, _FINGERPRINTS), exist_ok=True)
+        self._remove_stale_tmp()
+
+    def _remove_stale_tmp(self):
+        """
+        Remove unfinished entries and fingerprints not written to for STALE_TMP_AGE seconds.
+        """
+        now = time.time()
+        for directory in (self.directory, os.path.join(self.directory, _FINGERPRINTS)):
+            for name in os.listdir(directory):
+                if ".tmp-" not in name:
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    if now - _last_modified(path) <= STALE_TMP_AGE:
+                        continue
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+                except OSError:
+                    pass  # published or removed by another run meanwhile
+
+    def _fingerprint_path(self, path):
+        name = hashlib.blake2b(path.encode(), digest_size=16).hexdigest()
+        return os.path.join(self.directory, _FINGERPRINTS, f"{name}.json")
+
+    def fingerprint(self, path):
+        """
+        Fingerprint of one input file: size, mtime and content hash.
+
+        Returns:
+            dict: {"size": int, "mtime_ns": int, "hash": str}
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        fingerprint_path = self._fingerprint_path(path)
+        try:
+            with open(fingerprint_path) as file:
+                known = json.load(file)
+        except (OSError, ValueError):
+            known = None
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return known
+
+        fingerprint = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": _content_hash(path)}
+        tmp_path = f"{fingerprint_path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as file:
+            json.dump(fingerprint, file)
+        os.replace(tmp_path, fingerprint_path)
+        return fingerprint
+
+    def key_for(self, paths, params=None):
+        """
+        Cache key for a set of input files and the parameters that shaped the frames.
+
+        Only content hashes enter the key, so touching a file without changing it
+        still hits the cache.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(CACHE_VERSION).encode())
+        for path in paths:
+            digest.update(self.fingerprint(path)["hash"].encode())
+        digest.update(json.dumps(params or {}, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """
+        Load the frames stored under a key.
+
+        Returns:
+            dict or None: Frame name -> pd.DataFrame, or None on a miss.
+        """
+        entry = self._entry(key)
+        meta_path = os.path.join(entry, _META)
+        # A concurrent run may evict the entry while it is read: treat that as a miss
+        try:
+            with open(meta_path) as file:
+                meta = json.load(file)
+            frames = {
+                name: feather.read_table(os.path.join(entry, f"{name}.feather"), memory_map=True).to_pandas()
+                for name in meta["frames"]
+            }
+            os.utime(meta_path)  # last use, for LRU eviction
+        except (OSError, ValueError):
+            return None
+        return frames
+
+    def put(self, key, frames):
+        """
+        Store frames under a key, then evict old entries.
+
+        Parameters:
+            key (str): Output of key_for().
+            frames (dict): Frame name -> pd.DataFrame.
+        """
+        entry = self._entry(key)
+        tmp_entry = f"{entry}.tmp-{os.getpid()}"
+        os.makedirs(tmp_entry, exist_ok=True)
+        for name, frame in frames.items():
+            feather.write_feather(
+                frame.reset_index(drop=True), os.path.join(tmp_entry, f"{name}.feather"), compression="uncompressed"
+            )
+        with open(os.path.join(tmp_entry, _META), "w") as file:
+            json.dump({"frames": list(frames), "created": time.time()}, file)
+
+        # Publish atomically; the rename fails if a concurrent writer stored the same entry
+        try:
+            os.replace(tmp_entry, entry)
+        except OSError:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+        self.evict(keep=key)
+
+    def entries(self):
+        """
+        Existing entries as (key, last used, size in bytes), least recently used first.
+        """
+        entries = []
+        for key in os.listdir(self.directory):
+            entry = self._entry(key)
+            meta_path = os.path.join(entry, _META)
+            if not os.path.isdir(entry) or not os.path.exists(meta_path):
+                continue
+            try:
+                size = sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+                last_used = os.path.getmtime(meta_path)
+            except OSError:
+                continue  # evicted by another run meanwhile
+            entries.append((key, last_used, size))
+        return sorted(entries, key=lambda item: item[1])
+
+    def evict(self, keep=None):
+        """
+        Remove entries older than max_age, then least recently used ones until under max_bytes.
+
+        Parameters:
+            keep (str): Key that is never evicted (the entry just written).
+        """
+        now = time.time()
+        entries = self.entries()
+        total = sum(size for _, _, size in entries)
+        for key, last_used, size in entries:
+            if key == keep:
+                continue
+            if now - last_used > self.max_age or total > self.max_bytes:
+                shutil.rmtree(self._entry(key), ignore_errors=True)
+                total -= size
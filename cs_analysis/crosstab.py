@@ -0,0 +1,213 @@
+import numpy as np
+import pandas as pd
+
+from .keys import DENSE_KEY_LIMIT, group_keys
+
+
+class SparseCrosstab:
+    """
+    Cross tabulation (rows x columns) stored as a CSR matrix over group codes.
+
+    Only non-empty cells are stored, so thousands of partners by dozens of
+    categories cost memory proportional to the cells that occur. Rows can be
+    normalised, ranked and sliced without building the dense table.
+
+    Parameters:
+        indptr (np.ndarray): int64, length n_rows + 1; row i holds entries indptr[i]:indptr[i + 1].
+        indices (np.ndarray): int64 column code of every entry (ascending within a row).
+        data (np.ndarray): Value of every entry.
+        row_labels (pd.Index): Label of every row code.
+        column_labels (pd.Index): Label of every column code.
+    """
+
+    def __init__(self, indptr, indices, data, row_labels, column_labels):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.row_labels = row_labels
+        self.column_labels = column_labels
+
+    @classmethod
+    def from_codes(cls, row_codes, column_codes, row_labels, column_labels, mask=None, weights=None):
+        """
+        Count (row, column) code pairs; pairs with a negative (null) code are skipped.
+
+        Parameters:
+            row_codes (np.ndarray): int64 row code per record.
+            column_codes (np.ndarray): int64 column code per record.
+            row_labels (pd.Index): Label of every row code.
+            column_labels (pd.Index): Label of every column code.
+            mask (np.ndarray): Optional boolean filter over the records.
+            weights (np.ndarray): Optional count per record (e.g. pre-aggregated cells); 1 if omitted.
+        """
+        n_rows, n_columns = len(row_labels), len(column_labels)
+        valid = (row_codes >= 0) & (column_codes >= 0)
+        if mask is not None:
+            valid &= mask
+        cells = row_codes[valid] * n_columns + column_codes[valid]
+        dtype = np.int64 if weights is None else np.asarray(weights).dtype
+        if weights is not None:
+            weights = np.asarray(weights)[valid]
+
+        # Small matrices: one bincount over all cells; large ones: sort the cells that occur
+        if n_rows * n_columns <= DENSE_KEY_LIMIT:
+            dense = np.bincount(cells, weights=weights, minlength=n_rows * n_columns)
+            cells = np.flatnonzero(dense)
+            counts = dense[cells]
+        elif weights is None:
+            cells, counts = np.unique(cells, return_counts=True)
+        else:
+            cells, inverse = np.unique(cells, return_inverse=True)
+            counts = np.bincount(inverse, weights=weights)
+
+        rows, indices = np.divmod(cells, n_columns)
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+        return cls(indptr, indices, counts.astype(dtype), row_labels, column_labels)
+
+    @classmethod
+    def from_frame(cls, frame, rows, columns, mask=None, weights=None):
+        """
+        Count rows of a frame by two groupings, like frame.groupby(rows + columns).size().unstack().
+
+        Parameters:
+            frame (pd.DataFrame): Records to count.
+            rows (list of str): Columns forming the crosstab rows.
+            columns (list of str): Columns forming the crosstab columns.
+            mask (np.ndarray): Optional boolean filter over the records (no frame copy).
+            weights (np.ndarray): Optional count per record; 1 if omitted.
+        """
+        row_keys = group_keys(frame, rows)
+        column_keys = group_keys(frame, columns)
+        return cls.from_codes(
+            row_keys.codes,
+            column_keys.codes,
+            row_keys.index(np.arange(row_keys.size)),
+            column_keys.index(np.arange(column_keys.size)),
+            mask=mask,
+            weights=weights,
+        )
+
+    @property
+    def shape(self):
+        return len(self.row_labels), len(self.column_labels)
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    def _entry_rows(self):
+        """
+        Row code of every stored entry.
+        """
+        return np.repeat(np.arange(len(self.row_labels)), np.diff(self.indptr))
+
+    def row_sums(self):
+        """
+        Total of every row (as a Series over all row labels).
+        """
+        sums = np.bincount(self._entry_rows(), weights=self.data, minlength=len(self.row_labels))
+        return pd.Series(sums.astype(self.data.dtype), index=self.row_labels)
+
+    def column_sums(self):
+        """
+        Total of every column (as a Series over all column labels).
+        """
+        sums = np.bincount(self.indices, weights=self.data, minlength=len(self.column_labels))
+        return pd.Series(sums.astype(self.data.dtype), index=self.column_labels)
+
+    def normalize_rows(self):
+        """
+        Divide every entry by its row total (each non-empty row sums to 1).
+        """
+        totals = self.row_sums().to_numpy()
+        data = self.data / totals[self._entry_rows()]
+        return SparseCrosstab(self.indptr, self.indices, data, self.row_labels, self.column_labels)
+
+    def __contains__(self, label):
+        """
+        True when the row label exists and has at least one entry.
+        """
+        if label not in self.row_labels:
+            return False
+        row = self.row_labels.get_loc(label)
+        return bool(self.indptr[row + 1] > self.indptr[row])
+
+    def row(self, label):
+        """
+        Non-empty cells of one row, like .loc[label] on the dense table without the empty cells.
+        """
+        row = self.row_labels.get_loc(label)
+        start, stop = self.indptr[row], self.indptr[row + 1]
+        return pd.Series(
+            self.data[start:stop], index=self.column_labels.take(self.indices[start:stop]), name=label
+        )
+
+    def transpose(self):
+        """
+        The same counts with rows and columns swapped.
+        """
+        rows = self._entry_rows()
+        order = np.argsort(self.indices, kind="stable")
+        indptr = np.zeros(len(self.column_labels) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=len(self.column_labels)), out=indptr[1:])
+        return SparseCrosstab(indptr, rows[order], self.data[order], self.column_labels, self.row_labels)
+
+    def top_k_per_row(self, k=10):
+        """
+        The k largest cells of every row.
+
+        Returns:
+            pd.Series: Values indexed by (row label, column label), rows in row order and
+                values highest first within a row.
+        """
+        rows = self._entry_rows()
+        order = np.lexsort((-self.data, rows))
+        rank = np.arange(len(order)) - self.indptr[rows[order]]
+        keep = order[rank < k]
+        index = pd.MultiIndex.from_arrays(
+            [self.row_labels.take(rows[keep]), self.column_labels.take(self.indices[keep])]
+        )
+        return pd.Series(self.data[keep], index=index)
+
+    def top_k_per_column(self, k=10):
+        """
+        The k largest cells of every column, indexed by (column label, row label).
+        """
+        return self.transpose().top_k_per_row(k)
+
+    def to_frame(self, rows=None, columns=None, fill_value=np.nan):
+        """
+        Dense DataFrame of a selection (only for small selections, e.g. a chart).
+
+        Parameters:
+            rows (list): Row labels to include; all non-empty rows if omitted.
+            columns (list): Column labels to include, in this order; all non-empty columns if omitted.
+            fill_value: Value of the empty cells.
+        """
+        if rows is None:
+            row_codes = np.flatnonzero(np.diff(self.indptr) > 0)
+        else:
+            row_codes = self.row_labels.get_indexer(rows)
+            row_codes = row_codes[row_codes >= 0]
+        if columns is None:
+            column_codes = np.unique(self.indices)
+        else:
+            column_codes = self.column_labels.get_indexer(columns)
+            column_codes = column_codes[column_codes >= 0]
+
+        # Map stored (row, column) codes to dense positions; -1 for cells outside the selection
+        row_position = np.full(len(self.row_labels), -1, dtype=np.int64)
+        row_position[row_codes] = np.arange(len(row_codes))
+        column_position = np.full(len(self.column_labels), -1, dtype=np.int64)
+        column_position[column_codes] = np.arange(len(column_codes))
+        entry_rows = row_position[self._entry_rows()]
+        entry_columns = column_position[self.indices]
+        selected = (entry_rows >= 0) & (entry_columns >= 0)
+
+        dtype = np.result_type(self.data.dtype, np.asarray(fill_value).dtype)
+        values = np.full((len(row_codes), len(column_codes)), fill_value, dtype=dtype)
+        values[entry_rows[selected], entry_columns[selected]] = self.data[selected]
+        return pd.DataFrame(
+            values, index=self.row_labels.take(row_codes), columns=self.column_labels.take(column_codes)
+        )
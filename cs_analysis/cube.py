@@ -0,0 +1,381 @@
+"""
+Materialised aggregate cube: the report's grouping sets computed once, every chart answered as a slice.
+
+Three fact tables are aggregated over a list of grouping sets each:
+
+    orders:    one cell per combination of order attributes, with order counts
+    contacts:  errands matched to an order, by order attributes and errand attributes
+    errands:   all errands (matched or not), by errand attributes only
+
+All cells of a fact are stored in one columnar table with a 'grouping_set'
+column (like SQL GROUPING SETS), dimensions as categoricals. A query picks the
+smallest grouping set covering its dimensions and filters and sums its cells,
+so new questions never touch the raw rows:
+
+    cube = AggregateCube.build(orders_df, merged_df, errands_df)
+    cube.query(["Partner"], ["contacted_orders", "distinct_orders"], dated_only=True)
+    cube.query(["Errand_category"], where={"Brand": "Brand A"})
+    build_charts(cube.metrics(), cube.results())  # the report's charts without the raw frames
+
+A query is answerable when one grouping set of its fact holds all of its 'by'
+and 'where' dimensions (plus 'month' for dated_only). With GROUPING_SETS:
+
+    orders    any of month, Brand, Site_country, Partner together; routes
+              (Origin_country, Destination_country) by month and Is_canceled;
+              cancel and change reasons by month and Is_canceled; Contacts
+              (the key metrics) with any of month, Brand, Site_country, Partner
+    contacts  any of month, Brand, Site_country, Partner with Errand_category or
+              Errand_channel; routes with Errand_category by month
+    errands   any combination of the errand dimensions (matched or not)
+
+so e.g. partner rates filtered by Site_country or Brand, and channels filtered
+by Site_country, come from the cube, while routes filtered by Brand do not.
+
+Usage:
+    python -m cs_analysis.cube CUBE_DIR --by Partner Errand_category --where Brand="Brand A" --dated
+"""
+import argparse
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+from .analyses import INTERACTION_DIMENSIONS, sort_descending, top_columns_table
+from .crosstab import SparseCrosstab
+from .metrics import ContactMetrics, MetricsResult
+from .rollups import readable_directory, replace_directory
+
+
+# Dimensions of the order attributes and of the errand attributes
+ORDER_DIMENSIONS = [
+    "month", "Brand", "Partner", "Site_country", "Origin_country", "Destination_country",
+    "Is_canceled", "Cancel_reason", "Change_reason", "Contacts",
+]
+ERRAND_DIMENSIONS = ["Errand_category", "Errand_channel", "Errand_type", "Errand_action"]
+
+# Measures per fact table. Orders: rows, orders counted once per Order_id (first
+# occurrence, so cells stay additive; the interaction rates count a repeated
+# Order_id once per group, which only differs when Order_ids repeat), those with
+# a contact, rows without a contact, errands (sum of 'Contacts') and cancelled
+# rows. Contacts/errands: rows.
+MEASURES = {
+    "orders": ["orders", "distinct_orders", "contacted_orders", "uncontacted_orders", "errands", "cancellations"],
+    "contacts": ["contacts"],
+    "errands": ["contacts"],
+}
+
+# Grouping sets materialised per fact: enough for every chart of the report plus common drill-downs
+GROUPING_SETS = {
+    "orders": [
+        ("Contacts",),
+        ("Contacts", "month", "Brand", "Site_country", "Partner"),
+        ("month", "Site_country"),
+        ("month", "Brand", "Site_country"),
+        ("month", "Partner"),
+        ("month", "Brand", "Site_country", "Partner"),
+        ("month", "Origin_country", "Destination_country"),
+        ("month", "Is_canceled", "Origin_country", "Destination_country"),
+        ("month", "Is_canceled", "Cancel_reason", "Change_reason"),
+    ],
+    "contacts": [
+        ("month", "Brand", "Site_country", "Errand_category"),
+        ("month", "Partner", "Errand_category"),
+        ("month", "Brand", "Site_country", "Partner", "Errand_category"),
+        ("month", "Origin_country", "Destination_country", "Errand_category"),
+        ("month", "Brand", "Site_country", "Errand_channel"),
+    ],
+    "errands": [
+        ("Errand_category", "Errand_channel", "Errand_type", "Errand_action"),
+    ],
+}
+
+_META = "cube.json"
+
+
+def _used_columns(grouping_sets):
+    return sorted({column for dimensions in grouping_sets for column in dimensions})
+
+
+def _order_facts(orders):
+    """
+    One row per order with its measures and the order dimensions.
+    """
+    order_ids = orders["Order_id"]
+    distinct = (order_ids.notna() & ~order_ids.duplicated()).to_numpy()
+    contacts = orders["Contacts"].to_numpy()
+    return orders[[column for column in ORDER_DIMENSIONS if column in orders]].assign(
+        orders=1,
+        distinct_orders=distinct.astype(np.int64),
+        contacted_orders=(distinct & (contacts > 0)).astype(np.int64),
+        uncontacted_orders=(contacts == 0).astype(np.int64),
+        errands=contacts.astype(np.int64),
+        cancellations=(orders["Is_canceled"] == 1).to_numpy(dtype=np.int64, na_value=0),
+    )
+
+
+def _aggregate(frame, grouping_sets, measures):
+    """
+    Sum the measures over every grouping set (null dimension values kept as their own cell).
+
+    Returns:
+        pd.DataFrame: Cells of all sets: the dimensions (sorted by name), the measures and
+            'grouping_set' giving the set's position.
+    """
+    parts = []
+    for position, dimensions in enumerate(grouping_sets):
+        cells = frame.groupby(list(dimensions), observed=True, dropna=False, sort=True)[measures].sum()
+        parts.append(cells.reset_index().assign(grouping_set=position))
+    table = pd.concat(parts, ignore_index=True)
+
+    # Cells of other sets leave a dimension empty; keep the source's categories (and codes)
+    # and nullable integer keys throughout, and make other integer dimensions nullable
+    for column in {column for dimensions in grouping_sets for column in dimensions}:
+        if isinstance(frame[column].dtype, pd.api.extensions.ExtensionDtype):
+            table[column] = table[column].astype(frame[column].dtype)
+        elif pd.api.types.is_integer_dtype(frame[column].dtype):
+            table[column] = table[column].astype("Int64")
+    return table[_used_columns(grouping_sets) + list(measures) + ["grouping_set"]]
+
+
+class AggregateCube:
+    """
+    Pre-aggregated cells of the report's fact tables over a list of grouping sets each.
+
+    Parameters:
+        tables (dict): Fact name -> cells (dimension columns, MEASURES[fact] and 'grouping_set').
+        grouping_sets (dict): Fact name -> list of dimension tuples, indexed by 'grouping_set'.
+    """
+
+    def __init__(self, tables, grouping_sets):
+        self.tables = tables
+        self.grouping_sets = grouping_sets
+
+    @classmethod
+    def build(cls, orders, merged, errands, grouping_sets=None):
+        """
+        Aggregate the shared frames of the report once.
+
+        Parameters:
+            orders (pd.DataFrame): Orders with Order_id, 'Contacts', 'month' and the order dimensions.
+            merged (pd.DataFrame): Errands joined to orders, with 'month'.
+            errands (pd.DataFrame): All errands.
+            grouping_sets (dict): Fact name -> dimension tuples; GROUPING_SETS if omitted.
+
+        Returns:
+            AggregateCube: The cube.
+        """
+        grouping_sets = GROUPING_SETS if grouping_sets is None else grouping_sets
+        facts = {
+            "orders": _order_facts(orders),
+            "contacts": merged[_used_columns(grouping_sets["contacts"])].assign(contacts=1),
+            "errands": errands[_used_columns(grouping_sets["errands"])].assign(contacts=1),
+        }
+        tables = {
+            name: _aggregate(facts[name], grouping_sets[name], MEASURES[name]) for name in MEASURES
+        }
+        return cls(tables, {name: [tuple(dimensions) for dimensions in grouping_sets[name]] for name in MEASURES})
+
+    def _fact(self, measures, dimensions):
+        """
+        Fact table answering the measures; contacts come from the matched errands only
+        when an order dimension is involved.
+        """
+        facts = {name for name, names in MEASURES.items() if set(measures) <= set(names)}
+        if not facts:
+            raise ValueError(f"Measures {list(measures)} do not belong to one fact table: {MEASURES}")
+        if "orders" in facts:
+            return "orders"
+        return "contacts" if set(dimensions) & set(ORDER_DIMENSIONS) else "errands"
+
+    def query(self, by=(), measures=("contacts",), where=None, dated_only=False, dropna=True):
+        """
+        Sum the cells of the smallest grouping set covering the requested dimensions.
+
+        Parameters:
+            by (list of str): Dimensions of the result (empty = grand totals).
+            measures (list of str): Measures of one fact table (see MEASURES).
+            where (dict): Dimension -> value or list of values to keep.
+            dated_only (bool): Only rows with a valid order date (a known 'month').
+            dropna (bool): Drop groups with a null dimension value, like value_counts.
+
+        Returns:
+            pd.DataFrame or pd.Series: Measures indexed by the 'by' dimensions, or a Series of totals.
+        """
+        by, measures, where = list(by), list(measures), dict(where or {})
+        needed = set(by) | set(where) | ({"month"} if dated_only else set())
+        fact = self._fact(measures, needed)
+        table = self.tables[fact]
+
+        # Smallest covering set: fewest cells to filter and sum
+        sizes = table["grouping_set"].value_counts()
+        covering = [
+            position for position, dimensions in enumerate(self.grouping_sets[fact]) if needed <= set(dimensions)
+        ]
+        if not covering:
+            raise ValueError(
+                f"No {fact} grouping set covers {sorted(needed)}; materialised sets: {self.grouping_sets[fact]}"
+            )
+        position = min(covering, key=lambda candidate: sizes.get(candidate, 0))
+        selected = table["grouping_set"].to_numpy() == position
+
+        for column, values in where.items():
+            values = values if isinstance(values, (list, tuple, set)) else [values]
+            selected &= table[column].isin(values).to_numpy()
+        if dated_only:
+            selected &= table["month"].notna().to_numpy()
+        cells = table[selected]
+
+        if not by:
+            return cells[measures].sum()
+        return cells.groupby(by, observed=True, dropna=dropna, sort=True)[measures].sum()
+
+    def counts(self, by, measure="contacts", **kwargs):
+        """
+        One measure per value of one or more dimensions, highest first, empty groups dropped.
+        """
+        counts = self.query(by, [measure], **kwargs)[measure]
+        counts = counts[counts > 0]
+        return counts.sort_values(ascending=False, kind="stable")
+
+    def rates(self, by, numerator, denominator, **kwargs):
+        """
+        numerator / denominator * 100 per group of an order query, highest first (ties by label).
+        """
+        cells = self.query(by, [numerator, denominator], **kwargs)
+        cells = cells[cells[denominator] > 0]
+        return sort_descending(cells[numerator] / cells[denominator] * 100)
+
+    def metrics(self, where=None, dated_only=False):
+        """
+        Key metrics and the contacts-per-order distribution, from the smallest set with 'Contacts'.
+
+        Parameters:
+            where (dict): Dimension -> value or list of values to keep (see query()).
+            dated_only (bool): Only orders with a valid order date.
+        """
+        counts = self.query(["Contacts"], ["orders"], where=where, dated_only=dated_only)["orders"]
+        histogram = np.zeros(int(counts.index.max()) + 1 if len(counts) else 1, dtype=np.int64)
+        histogram[counts.index.to_numpy(dtype=np.int64)] = counts.to_numpy()
+        return MetricsResult(ContactMetrics.from_histogram(histogram), histogram)
+
+    def results(self, top_n=10, brand="Brand A"):
+        """
+        The result tables of ANALYSIS_TASKS (scheduler.py), answered from the cube.
+
+        Returns:
+            dict: Task name -> result, as accepted by report.build_charts().
+        """
+        results = {
+            "errand_categories": self.counts(["Errand_category"]).head(top_n),
+            "errand_channels": self.counts(["Errand_channel"]),
+            "errand_types": self.counts(["Errand_type"]).head(top_n),
+            "errand_actions": self.counts(["Errand_action"]).head(top_n),
+            "brand_contacts": self.counts(["Brand"]),
+            "brand_categories": self.counts(["Errand_category"], where={"Brand": brand}),
+            "countries_without_contacts": self.counts(["Site_country"], "uncontacted_orders"),
+            "countries_with_contacts": self.counts(["Site_country"]),
+            "cancellations_by_origin": sort_descending(self.counts(
+                ["Origin_country"], "orders", where={"Is_canceled": 1}, dated_only=True
+            )),
+            "cancel_reasons": self.counts(["Cancel_reason"], "orders", dated_only=True),
+            "change_reasons": self.counts(["Change_reason"], "orders", dated_only=True),
+        }
+
+        monthly_orders = self.query(["month"], ["orders"], dated_only=True)["orders"]
+        monthly_contacts = self.query(["month"], ["contacts"], dated_only=True)["contacts"]
+        results["monthly_contact_rate"] = (monthly_contacts / monthly_orders).fillna(0) * 100
+
+        rates = {
+            name: self.rates(columns, "contacted_orders", "distinct_orders", dated_only=True)
+            for name, columns in INTERACTION_DIMENSIONS.items()
+        }
+        results["interaction_rates"] = rates
+
+        cells = self.query(["Partner", "Errand_category"], dated_only=True).reset_index()
+        results["partner_categories"] = SparseCrosstab.from_frame(
+            cells, ["Partner"], ["Errand_category"], weights=cells["contacts"].to_numpy()
+        ).normalize_rows()
+
+        # Errand categories for the countries with the highest origin interaction rates
+        top_countries = rates["origin"].head(top_n).index.tolist()
+        cells = self.query(
+            ["Origin_country", "Destination_country", "Errand_category"], dated_only=True, dropna=False
+        ).reset_index()
+        selected = (
+            cells["Origin_country"].isin(top_countries) | cells["Destination_country"].isin(top_countries)
+        ).to_numpy()
+        by_country = SparseCrosstab.from_frame(
+            cells, ["Origin_country"], ["Errand_category"], mask=selected, weights=cells["contacts"].to_numpy()
+        )
+        results["country_categories"] = top_columns_table(by_country, top_n)
+        return results
+
+    def save(self, directory):
+        """
+        Write one Feather file per fact table and the grouping sets, replacing an earlier cube once fully written.
+        """
+        staging = f"{directory.rstrip(os.sep)}.next"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for name, table in self.tables.items():
+            feather.write_feather(table, os.path.join(staging, f"{name}.feather"), compression="uncompressed")
+        with open(os.path.join(staging, _META), "w") as file:
+            json.dump({name: [list(dimensions) for dimensions in sets] for name, sets in self.grouping_sets.items()},
+                      file, indent=2)
+        replace_directory(staging, directory)
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Load a cube written by save() (memory-mapped).
+        """
+        directory = readable_directory(directory)
+        with open(os.path.join(directory, _META)) as file:
+            grouping_sets = {name: [tuple(dimensions) for dimensions in sets] for name, sets in json.load(file).items()}
+        tables = {
+            name: feather.read_table(os.path.join(directory, f"{name}.feather"), memory_map=True).to_pandas()
+            for name in grouping_sets
+        }
+        return cls(tables, grouping_sets)
+
+
+def _parse_where(items):
+    """
+    ["Brand=Brand A", "Site_country=SE", "Site_country=NO"] -> {"Brand": ["Brand A"], "Site_country": ["SE", "NO"]}
+    """
+    where = {}
+    for item in items or []:
+        column, _, value = item.partition("=")
+        if column in ("month", "Is_canceled", "Contacts"):
+            value = int(value)
+        where.setdefault(column, []).append(value)
+    return where
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a materialised aggregate cube.")
+    parser.add_argument("directory", help="Cube written by run(cube_dir=...)")
+    parser.add_argument("--by", nargs="*", default=[], help="Dimensions of the result")
+    parser.add_argument("--measure", nargs="+", default=["contacts"], help="Measures of one fact table")
+    parser.add_argument("--where", nargs="+", default=None, help="COLUMN=VALUE filters (repeat a column for OR)")
+    parser.add_argument("--dated", action="store_true", help="Only rows with a valid order date")
+    parser.add_argument("--output", default=None, help="Write the result as CSV instead of printing it")
+    args = parser.parse_args()
+
+    cube = AggregateCube.load(args.directory)
+    try:
+        result = cube.query(args.by, args.measure, _parse_where(args.where), args.dated)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.output:
+        result.to_csv(args.output)
+    else:
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,348 @@
+"""
+Hive-partitioned Parquet datasets: a directory of files read as one table.
+
+Exports partitioned by order date and site country, e.g.
+
+    orders/order_date=2023-01-15/site_country=SE/part-0.parquet
+    orders/year=2023/month=1/site_country=NO/part-0.parquet
+
+load like the single file they replace (load_orders and load_errands accept
+the directory). Reading a dataset:
+
+    1. prunes partitions outside the date range or countries from their paths,
+       before any file is opened;
+    2. reads the footers of the remaining files (in parallel) and skips files
+       without rows, or whose column statistics rule out the filters;
+    3. reads the surviving files with a bounded thread pool and concatenates
+       them in path order, partition values missing from a file becoming columns.
+
+Usage:
+    python -m cs_analysis.dataset DATASET_DIR --start 2023-01-01 --end 2023-04-01 --country SE
+"""
+import argparse
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from urllib.parse import unquote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .loader import CATEGORICAL_COLUMNS, COUNTRY_COLUMN, DATE_COLUMN, _read_file, _timestamp_bound
+
+
+# Threads reading footers and files; reads release the GIL, so I/O and decoding overlap
+IO_WORKERS = 8
+
+# Partition keys (lower case) holding the order date as a day, "YYYY-MM" month or year,
+# and keys holding it in parts (year=2023/month=1/day=15)
+DATE_KEYS = ("order_created_at", "order_date", "created_date", "date")
+DATE_PART_KEYS = ("year", "month", "day")
+
+# Partition keys holding the site country
+COUNTRY_KEYS = ("site_country", "country")
+
+# Value Hive writes for a null partition
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def _period(values):
+    """
+    The day, month or year of order dates a partition holds, or None when it is not partitioned by date.
+    """
+    for key in DATE_KEYS:
+        if key in values:
+            text = values[key]
+            if text is None:
+                return None
+            return pd.Period(text, freq="D" if len(text) > 7 else "M" if len(text) > 4 else "Y")
+    if "year" not in values or values["year"] is None:
+        return None
+    parts = [int(values[key]) for key in DATE_PART_KEYS if values.get(key) is not None]
+    if len(parts) == 1 or "month" not in values:
+        return pd.Period(year=parts[0], freq="Y")
+    if len(parts) == 2 or "day" not in values:
+        return pd.Period(year=parts[0], month=parts[1], freq="M")
+    return pd.Period(year=parts[0], month=parts[1], day=parts[2], freq="D")
+
+
+def _is_dated(values):
+    return any(key in values for key in DATE_KEYS + ("year",))
+
+
+@dataclass
+class FileStats:
+    """
+    One data file of a dataset, its partition and the statistics of its footer.
+
+    Attributes:
+        path (str): Path of the Parquet file.
+        partition (dict): Partition key (as in the path) -> value (None for a null partition).
+        num_rows (int): Rows in the file (None until the footer is read).
+        num_row_groups (int): Row groups in the file.
+        size_bytes (int): File size.
+        date_min, date_max: Range of Order_created_at from the row-group statistics (None if unknown).
+        country_min, country_max: Range of Site_country from the row-group statistics (None if unknown).
+        schema (pa.Schema): Arrow schema of the file.
+    """
+
+    path: str
+    partition: dict = field(default_factory=dict)
+    num_rows: int = None
+    num_row_groups: int = None
+    size_bytes: int = None
+    date_min: object = None
+    date_max: object = None
+    country_min: object = None
+    country_max: object = None
+    schema: object = field(default=None, repr=False)
+
+    @property
+    def keys(self):
+        """
+        Partition values by lower-case key.
+        """
+        return {key.lower(): value for key, value in self.partition.items()}
+
+    def read_footer(self):
+        """
+        Fill in the statistics from the Parquet footer (no data pages are read).
+        """
+        metadata = pq.read_metadata(self.path)
+        self.num_rows, self.num_row_groups = metadata.num_rows, metadata.num_row_groups
+        self.size_bytes = os.path.getsize(self.path)
+        self.schema = metadata.schema.to_arrow_schema()
+        names = {metadata.schema.column(index).name.capitalize(): index for index in range(metadata.num_columns)}
+        for column, attribute in ((DATE_COLUMN, "date"), (COUNTRY_COLUMN, "country")):
+            if column in names:
+                bounds = _column_bounds(metadata, names[column])
+                if bounds is not None:
+                    setattr(self, f"{attribute}_min", bounds[0])
+                    setattr(self, f"{attribute}_max", bounds[1])
+        return self
+
+
+def _column_bounds(metadata, index):
+    """
+    (min, max) of a column over all row groups, or None when a row group has no statistics.
+    """
+    low = high = None
+    for group in range(metadata.num_row_groups):
+        statistics = metadata.row_group(group).column(index).statistics
+        if statistics is None or not statistics.has_min_max:
+            if statistics is not None and statistics.null_count == metadata.row_group(group).num_rows:
+                continue
+            return None
+        low = statistics.min if low is None else min(low, statistics.min)
+        high = statistics.max if high is None else max(high, statistics.max)
+    return None if low is None else (low, high)
+
+
+class PartitionedDataset:
+    """
+    A directory of Parquet files, Hive-partitioned (key=value directories) or not.
+
+    Parameters:
+        root (str): Dataset directory.
+        workers (int): Threads reading footers and files.
+    """
+
+    def __init__(self, root, workers=IO_WORKERS):
+        self.root = root
+        self.workers = workers
+        self._files = None
+
+    @property
+    def files(self):
+        """
+        FileStats of every data file (footers not read yet), in path order.
+        """
+        if self._files is None:
+            files = []
+            for directory, subdirectories, names in os.walk(self.root):
+                # Hidden and temporary entries (_SUCCESS, .part files) are not data
+                subdirectories[:] = sorted(name for name in subdirectories if not name.startswith(("_", ".")))
+                for name in sorted(names):
+                    if name.endswith(".parquet") and not name.startswith(("_", ".")):
+                        path = os.path.join(directory, name)
+                        files.append(FileStats(path, self._partition(os.path.relpath(directory, self.root))))
+            self._files = files
+        return self._files
+
+    @staticmethod
+    def _partition(relative):
+        values = {}
+        for segment in relative.split(os.sep):
+            key, equals, value = segment.partition("=")
+            if equals:
+                value = unquote(value)
+                values[key] = None if value == NULL_PARTITION else value
+        return values
+
+    def prune(self, date_range=None, countries=None):
+        """
+        Files whose partition can hold rows in the date range and countries (no I/O).
+        """
+        start, end = date_range if date_range is not None else (None, None)
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+        countries = None if countries is None else set(countries)
+
+        selected = []
+        for stats in self.files:
+            keys = stats.keys
+            country_key = next((key for key in COUNTRY_KEYS if key in keys), None)
+            if countries is not None and country_key is not None and keys[country_key] not in countries:
+                continue
+            if date_range is not None and _is_dated(keys):
+                # Rows without a date never match a date range
+                period = _period(keys)
+                if period is None:
+                    continue
+                if start is not None and period.end_time < start:
+                    continue
+                if end is not None and period.start_time >= end:
+                    continue
+            selected.append(stats)
+        return selected
+
+    def _map(self, function, items):
+        if self.workers <= 1 or len(items) <= 1:
+            return [function(item) for item in items]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(function, items))
+
+    def statistics(self, date_range=None, countries=None):
+        """
+        Footer statistics of the files that survive partition pruning, one row per file.
+
+        Returns:
+            pd.DataFrame: path, partition values, num_rows, num_row_groups, size_bytes,
+                date_min/date_max, country_min/country_max and 'skip' (True when the
+                statistics show the file has no rows for the filters).
+        """
+        files = self._map(FileStats.read_footer, self.prune(date_range, countries))
+        rows = []
+        for stats in files:
+            row = {"path": os.path.relpath(stats.path, self.root), **stats.partition}
+            row.update({
+                name: getattr(stats, name) for name in (
+                    "num_rows", "num_row_groups", "size_bytes", "date_min", "date_max", "country_min", "country_max"
+                )
+            })
+            row["skip"] = not _may_match(stats, date_range, countries)
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def select(self, date_range=None, countries=None):
+        """
+        Files to read for the filters: pruned by partition, then by footer statistics.
+        """
+        files = self._map(FileStats.read_footer, self.prune(date_range, countries))
+        return [stats for stats in files if _may_match(stats, date_range, countries)]
+
+    def read(self, columns, date_range=None, countries=None):
+        """
+        Read the given columns of every selected file in parallel, with filters pushed down.
+
+        Parameters:
+            columns (list of str): Capitalized column names; partition keys provide columns
+                the files do not store.
+            date_range (tuple): (start, end) bounds on Order_created_at, end exclusive.
+            countries (list of str): Site_country values to keep.
+
+        Returns:
+            pa.Table: The rows of all selected files in path order, capitalized column names.
+        """
+        if not self.files:
+            raise FileNotFoundError(f"No Parquet files in {self.root}")
+        files = self.select(date_range, countries)
+        if not files:
+            # Nothing survives the filters: an empty table with the schema of the first file
+            files, empty = [self.files[0]], True
+        else:
+            empty = False
+
+        def read_one(stats):
+            if stats.schema is None:
+                stats.read_footer()
+            stored = {name.capitalize() for name in stats.schema.names}
+            table = _read_file(
+                stats.path, [column for column in columns if column in stored], date_range, countries, stats.schema
+            )
+            partition = {key.capitalize(): value for key, value in stats.partition.items()}
+            for column in columns:
+                if column not in stored:
+                    if column not in partition:
+                        raise ValueError(f"Column {column} is neither in {stats.path} nor a partition key")
+                    table = table.append_column(column, _constant(partition[column], column, table.num_rows))
+            return table
+
+        tables = self._map(read_one, files)
+        table = pa.concat_tables(tables, promote_options="permissive")
+        return table.slice(0, 0) if empty else table
+
+
+def _constant(value, column, length):
+    """
+    A partition value repeated for every row of a file, dictionary-encoded for categorical columns.
+    """
+    if column in CATEGORICAL_COLUMNS:
+        if value is None:
+            return pa.DictionaryArray.from_arrays(pa.nulls(length, pa.int32()), pa.array([], pa.string()))
+        return pa.DictionaryArray.from_arrays(pa.array(np.zeros(length, dtype=np.int32)), pa.array([value]))
+    return pa.array([value] * length, type=pa.string())
+
+
+def _may_match(stats, date_range, countries):
+    """
+    False when a file's footer shows it has no rows for the filters.
+    """
+    if not stats.num_rows:
+        return False
+    if date_range is not None and stats.date_min is not None:
+        start, end = date_range
+        field_type = pa.scalar(stats.date_min).type
+        if pa.types.is_timestamp(field_type) or pa.types.is_date(field_type):
+            if start is not None and stats.date_max < _timestamp_bound(start, field_type):
+                return False
+            if end is not None and stats.date_min >= _timestamp_bound(end, field_type):
+                return False
+    if countries is not None and isinstance(stats.country_min, str):
+        if not any(stats.country_min <= country <= stats.country_max for country in countries):
+            return False
+    return True
+
+
+def input_files(path, date_range=None, countries=None):
+    """
+    The Parquet files behind an input path: the file itself, or a dataset's files left after partition pruning.
+    """
+    if not os.path.isdir(path):
+        return [path]
+    return [stats.path for stats in PartitionedDataset(path).prune(date_range, countries)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show the files of a partitioned dataset that a filter reads.")
+    parser.add_argument("directory", help="Dataset directory (Hive-partitioned Parquet files)")
+    parser.add_argument("--start", default=None, help="First Order_created_at date to include")
+    parser.add_argument("--end", default=None, help="First Order_created_at date to exclude")
+    parser.add_argument("--country", action="append", dest="countries", help="Site_country to keep (repeatable)")
+    parser.add_argument("--workers", type=int, default=IO_WORKERS)
+    args = parser.parse_args()
+
+    dataset = PartitionedDataset(args.directory, args.workers)
+    date_range = (args.start, args.end) if args.start or args.end else None
+    statistics = dataset.statistics(date_range, args.countries)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(statistics)
+    read = int((~statistics["skip"]).sum()) if len(statistics) else 0
+    print(f"{len(dataset.files)} files, {len(dataset.files) - len(statistics)} pruned by partition, "
+          f"{len(statistics) - read} skipped by statistics, {read} to read")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,522 @@
+"""
+Incremental (append) mode: fold only newly appended orders and errands into a persisted state.
+
+The state keeps one small row per order (its contact count and the attributes
+the rates are grouped by), the errands whose order has not arrived yet, the
+count aggregates of the streaming mode and, per input file, how many rows have
+been folded in. An update reads only the rows beyond that offset (whole new
+files, or row groups appended to a known file), so adding a day of data does not
+recompute the history. The metadata of the row groups already folded in is
+stored with the offset; when a known file no longer starts with the same row
+groups (rewritten, truncated or reordered) the state is rebuilt from every
+known input file.
+
+Orders are stored in segments sorted by Order_id: every update indexes only its
+new orders as a segment of its own, probes the errands against each segment's
+sorted keys and appends the segment to the state. The newest segments are merged
+while they are at least as large as the one before (like a binary counter), so
+there are O(log n) segments and every order is re-sorted O(log n) times in total.
+Saving writes new segments once and rewrites only the contact counts of segments
+that gained contacts.
+
+Errands may arrive before their order: they are counted by channel, type and so
+on right away and kept as pending until the order shows up. Errands still
+pending after PENDING_MAX_UPDATES further updates are dropped and reported;
+should their order arrive later, it does not count them as contacts. Order ids
+are assumed to be unique across all input files.
+
+Usage:
+    python -m cs_analysis.incremental STATE_DIR --orders orders-2024-05-01.parquet --errands errands-2024-05-01.parquet
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from .base36 import decode_base36_column
+from .joins import OrderIndex, normalise_order_ids
+from .loader import required_columns
+from .metrics import write_key_metrics, write_metrics_json
+from .streaming import (
+    ERRAND_COLUMNS,
+    RATE_DIMENSIONS,
+    PartialAggregates,
+    _counts,
+    _distinct_orders,
+    _raw_columns,
+    finalise,
+    write_tables,
+)
+from .timestamps import month_key, parse_timestamps
+
+
+# Order attributes kept per order: everything an errand arriving later is grouped by
+ORDER_ATTRIBUTES = ["Brand", "Site_country", "Partner", "Origin_country", "Destination_country"]
+
+# Errand columns kept while an errand waits for its order
+PENDING_COLUMNS = ["Order_id", "Errand_category"]
+
+# Number of later updates an errand waits for its order before it is dropped
+PENDING_MAX_UPDATES = 30
+
+_MANIFEST = "state.json"
+_SEGMENTS = "segments"
+
+
+def _empty_pending():
+    return pd.DataFrame({
+        "Order_id": pd.Series(dtype="Int64"),
+        "Errand_category": pd.Series(dtype=object),
+        "age": pd.Series(dtype=np.int64),
+    })
+
+
+def _write_series(series, path):
+    frame = series.rename("count").to_frame().reset_index()
+    frame.columns = [str(column) for column in frame.columns]
+    feather.write_feather(frame, path, compression="uncompressed")
+
+
+def _read_series(path):
+    frame = feather.read_table(path).to_pandas()
+    return frame.set_index(list(frame.columns[:-1]))["count"]
+
+
+def _prefix_digest(metadata, rows):
+    """
+    Digest of the metadata of the leading row groups that hold the first `rows` rows.
+
+    Returns:
+        str or None: Hex digest, or None if `rows` does not end on a row group boundary.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    covered = 0
+    for group in range(metadata.num_row_groups):
+        if covered == rows:
+            break
+        row_group = metadata.row_group(group)
+        covered += row_group.num_rows
+        digest.update(json.dumps(row_group.to_dict(), sort_keys=True, default=str).encode())
+    return digest.hexdigest() if covered == rows else None
+
+
+def _is_errands_file(path):
+    return "order_number" in [name.lower() for name in pq.read_schema(path).names]
+
+
+def _read_new_rows(path, columns, offset):
+    """
+    Read the rows of a Parquet file beyond the first `offset`, skipping whole row groups.
+
+    Returns:
+        pd.DataFrame: New rows with capitalized column names.
+    """
+    parquet_file = pq.ParquetFile(path)
+    raw_columns = _raw_columns(path, columns)
+
+    groups = []
+    skipped = 0
+    for group in range(parquet_file.num_row_groups):
+        rows = parquet_file.metadata.row_group(group).num_rows
+        if skipped + rows <= offset:
+            skipped += rows
+        else:
+            groups.append(group)
+
+    if groups:
+        table = parquet_file.read_row_groups(groups, columns=raw_columns).slice(offset - skipped)
+    else:
+        table = parquet_file.schema_arrow.empty_table().select(raw_columns)
+    frame = table.to_pandas()
+    frame.columns = [name.capitalize() for name in frame.columns]
+    return frame
+
+
+@dataclass
+class OrderSegment:
+    """
+    Orders folded in together, sorted by Order_id (orders without an id last).
+
+    Attributes:
+        name (str): File name stem of the segment in the state directory.
+        orders (pd.DataFrame): Order_id, month (<NA> if undated) and ORDER_ATTRIBUTES;
+            never changes once written.
+        contacts (np.ndarray): int64 number of matched errands per row.
+        index (OrderIndex): Index over orders["Order_id"] (built without a sort).
+        saved (bool): Whether the orders are on disk already.
+        contacts_file (str): File holding the saved contacts; None when they changed since.
+    """
+
+    name: str
+    orders: pd.DataFrame
+    contacts: np.ndarray
+    index: OrderIndex
+    saved: bool = False
+    contacts_file: str = None
+
+    @classmethod
+    def build(cls, name, orders, contacts):
+        """
+        Sort orders (and their contact counts) by Order_id into a new segment.
+        """
+        unsorted = OrderIndex(orders["Order_id"])
+        rows = np.concatenate([unsorted.rows, np.flatnonzero(orders["Order_id"].isna().to_numpy())])
+        orders = orders.take(rows).reset_index(drop=True)
+        return cls(name, orders, contacts[rows], OrderIndex(orders["Order_id"]))
+
+    @classmethod
+    def load(cls, directory, name, contacts_file):
+        """
+        Load a saved segment.
+        """
+        orders = feather.read_table(os.path.join(directory, f"{name}.feather")).to_pandas()
+        contacts = feather.read_table(os.path.join(directory, contacts_file)).column("Contacts").to_numpy()
+        return cls(name, orders, contacts.copy(), OrderIndex(orders["Order_id"]), True, contacts_file)
+
+    def save(self, directory, generation):
+        """
+        Write the orders if they are new and the contact counts if they changed.
+        """
+        if not self.saved:
+            path = os.path.join(directory, f"{self.name}.feather")
+            feather.write_feather(self.orders, path, compression="uncompressed")
+            self.saved = True
+        if self.contacts_file is None:
+            contacts_file = f"{self.name}.contacts-{generation}.feather"
+            contacts = pd.DataFrame({"Contacts": self.contacts})
+            feather.write_feather(contacts, os.path.join(directory, contacts_file), compression="uncompressed")
+            self.contacts_file = contacts_file
+
+
+@dataclass
+class IncrementalState:
+    """
+    Persisted state of the incremental mode.
+
+    Attributes:
+        segments (list of OrderSegment): One row per order, oldest segments first.
+        pending (pd.DataFrame): Errands (PENDING_COLUMNS) whose order has not arrived yet,
+            with the number of updates they have waited in 'age'.
+        aggregates (PartialAggregates): Counts in the layout of the streaming mode.
+        files (dict): Absolute input path -> {"size", "mtime_ns", "rows", "prefix"} already
+            folded in, "prefix" being the digest of the metadata of those rows' row groups.
+        generation (int): Number of the last save; names the files written by it.
+        segment_count (int): Number of segments created so far; names the next one.
+        expired (int): Number of pending errands dropped so far.
+        max_pending_updates (int): Updates a pending errand waits before it is dropped
+            (None keeps it forever); a setting, not saved with the state.
+    """
+
+    segments: list = field(default_factory=list)
+    pending: pd.DataFrame = field(default_factory=_empty_pending)
+    aggregates: PartialAggregates = field(default_factory=PartialAggregates)
+    files: dict = field(default_factory=dict)
+    generation: int = 0
+    segment_count: int = 0
+    expired: int = 0
+    max_pending_updates: int = PENDING_MAX_UPDATES
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Load the state saved in a directory, or an empty state if there is none.
+        """
+        manifest_path = os.path.join(directory, _MANIFEST)
+        if not os.path.exists(manifest_path):
+            return cls()
+
+        with open(manifest_path) as file:
+            manifest = json.load(file)
+        tables = os.path.join(directory, f"state-{manifest['generation']}")
+        aggregates = PartialAggregates({
+            name[:-len(".feather")]: _read_series(os.path.join(tables, "aggregates", name))
+            for name in os.listdir(os.path.join(tables, "aggregates"))
+        })
+        pending = feather.read_table(os.path.join(tables, "pending.feather")).to_pandas()
+        if "age" not in pending:
+            pending["age"] = np.zeros(len(pending), dtype=np.int64)  # saved before errands expired
+        return cls(
+            segments=[
+                OrderSegment.load(os.path.join(directory, _SEGMENTS), name, contacts_file)
+                for name, contacts_file in manifest["segments"]
+            ],
+            pending=pending,
+            aggregates=aggregates,
+            files=manifest["files"],
+            generation=manifest["generation"],
+            segment_count=manifest["segment_count"],
+            expired=manifest.get("expired", 0),
+        )
+
+    def save(self, directory):
+        """
+        Save the state to a directory, replacing the previous state only once fully written.
+
+        New segments are written once and contact counts only when they changed; the
+        pending errands and the aggregates go to a directory per save. The manifest
+        naming all of them is replaced atomically, then files it no longer names are
+        removed.
+        """
+        generation = self.generation + 1
+        segments_dir = os.path.join(directory, _SEGMENTS)
+        tables = os.path.join(directory, f"state-{generation}")
+        os.makedirs(segments_dir, exist_ok=True)
+        shutil.rmtree(tables, ignore_errors=True)
+        os.makedirs(os.path.join(tables, "aggregates"))
+
+        for segment in self.segments:
+            segment.save(segments_dir, generation)
+        feather.write_feather(self.pending, os.path.join(tables, "pending.feather"), compression="uncompressed")
+        for name, series in self.aggregates.counts.items():
+            _write_series(series, os.path.join(tables, "aggregates", f"{name}.feather"))
+
+        manifest = {
+            "generation": generation,
+            "segment_count": self.segment_count,
+            "segments": [[segment.name, segment.contacts_file] for segment in self.segments],
+            "files": self.files,
+            "expired": self.expired,
+        }
+        staging = os.path.join(directory, f"{_MANIFEST}.next")
+        with open(staging, "w") as file:
+            json.dump(manifest, file)
+        os.replace(staging, os.path.join(directory, _MANIFEST))
+        self.generation = generation
+
+        # Drop merged segments, replaced contact counts and earlier saves
+        keep = {f"{segment.name}.feather" for segment in self.segments}
+        keep.update(segment.contacts_file for segment in self.segments)
+        for name in os.listdir(segments_dir):
+            if name not in keep:
+                os.remove(os.path.join(segments_dir, name))
+        for name in os.listdir(directory):
+            if name.startswith("state-") and name != f"state-{generation}":
+                shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+    def _only_appended(self, path):
+        """
+        Whether an input file is new, unchanged, or still starts with the row groups folded in.
+        """
+        known = self.files.get(path)
+        stat = os.stat(path)
+        if not known or (known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns):
+            return True
+        return _prefix_digest(pq.ParquetFile(path).metadata, known["rows"]) == known.get("prefix")
+
+    def _new_rows(self, path, columns):
+        """
+        Rows of an input file not folded in yet (all rows of a new file).
+        """
+        stat = os.stat(path)
+        known = self.files.get(path)
+        if known and known["size"] == stat.st_size and known["mtime_ns"] == stat.st_mtime_ns:
+            return pd.DataFrame(columns=columns)
+
+        offset = known["rows"] if known else 0
+        metadata = pq.ParquetFile(path).metadata
+        self.files[path] = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "rows": metadata.num_rows,
+            "prefix": _prefix_digest(metadata, metadata.num_rows),
+        }
+        return _read_new_rows(path, columns, offset)
+
+    def _reset(self):
+        """
+        Forget everything folded in; segment and save numbers keep counting up.
+        """
+        self.segments = []
+        self.pending = _empty_pending()
+        self.aggregates = PartialAggregates()
+        self.files = {}
+        self.expired = 0
+
+    def update(self, orders_paths=(), errands_paths=()):
+        """
+        Fold the new rows of the given input files into the state.
+
+        If a known file was changed other than by appending row groups, the state
+        is rebuilt from all files folded in so far plus the given ones.
+
+        Parameters:
+            orders_paths (list of str): Orders Parquet files (new or appended to).
+            errands_paths (list of str): Errands Parquet files (new or appended to).
+
+        Returns:
+            tuple: (new orders rows, new errands rows, pd.DataFrame of the pending errands
+                dropped by this update) folded in.
+        """
+        orders_paths = [os.path.abspath(path) for path in orders_paths]
+        errands_paths = [os.path.abspath(path) for path in errands_paths]
+        if not all(self._only_appended(path) for path in orders_paths + errands_paths):
+            known = list(self.files)
+            missing = [path for path in known if not os.path.exists(path)]
+            if missing:
+                raise ValueError(f"cannot rebuild the incremental state: {', '.join(missing)} no longer exist(s)")
+            self._reset()
+            for path in known:
+                paths = errands_paths if _is_errands_file(path) else orders_paths
+                if path not in paths:
+                    paths.insert(0, path)
+
+        orders_columns = required_columns("orders")
+        errands_columns = required_columns("errands")
+        orders_df = pd.concat([self._new_rows(path, orders_columns) for path in orders_paths] or [
+            pd.DataFrame(columns=orders_columns)
+        ], ignore_index=True)
+        errands_df = pd.concat([self._new_rows(path, errands_columns) for path in errands_paths] or [
+            pd.DataFrame(columns=errands_columns)
+        ], ignore_index=True)
+        expired = self.fold(orders_df, errands_df)
+        return len(orders_df), len(errands_df), expired
+
+    def _new_segment(self, orders, contacts):
+        self.segment_count += 1
+        return OrderSegment.build(f"{self.segment_count:08d}", orders, contacts)
+
+    def _append(self, orders):
+        """
+        Add new orders as a segment, merging the newest segments while the last is at least as large.
+        """
+        segment = self._new_segment(orders, np.zeros(len(orders), dtype=np.int64))
+        while self.segments and len(self.segments[-1].orders) <= len(segment.orders):
+            previous = self.segments.pop()
+            segment = self._new_segment(
+                pd.concat([previous.orders, segment.orders], ignore_index=True),
+                np.concatenate([previous.contacts, segment.contacts]),
+            )
+        self.segments.append(segment)
+
+    def fold(self, orders_df, errands_df):
+        """
+        Fold new orders and errands (raw columns, as read from Parquet) into the state.
+
+        Returns:
+            pd.DataFrame: Pending errands dropped because they waited more than
+                max_pending_updates updates for their order.
+        """
+        aggregates = self.aggregates
+
+        # Errand-only counts include every errand, matched or not
+        for column in ERRAND_COLUMNS:
+            aggregates.add(column, errands_df[column].value_counts())
+
+        # New orders start without contacts; order-only counts need nothing else
+        created = parse_timestamps(orders_df["Order_created_at"])
+        new_orders = orders_df[ORDER_ATTRIBUTES].assign(
+            Order_id=normalise_order_ids(orders_df["Order_id"]),
+            month=month_key(created).astype("Int64"),
+        )[["Order_id", "month"] + ORDER_ATTRIBUTES]
+        dated = created.notna().to_numpy()
+        dated_orders = orders_df[dated].assign(
+            Order_id=new_orders["Order_id"][dated], month=month_key(created[dated]).astype(np.int64)
+        )
+
+        aggregates.add("contacts_histogram", pd.Series([len(new_orders)], index=[0]))
+        aggregates.add("no_contact_by_Site_country", new_orders["Site_country"].value_counts())
+        aggregates.add("orders_by_month", dated_orders["month"].value_counts())
+        for name, columns in RATE_DIMENSIONS.items():
+            aggregates.add(f"orders_by_{name}", _distinct_orders(dated_orders, columns))
+
+        canceled = dated_orders[dated_orders["Is_canceled"] == 1]
+        aggregates.add("cancellations_by_Origin_country", canceled["Origin_country"].value_counts())
+        aggregates.add("cancellations_by_Destination_country", canceled["Destination_country"].value_counts())
+        aggregates.add("Cancel_reason", dated_orders["Cancel_reason"].value_counts())
+        aggregates.add("Change_reason", dated_orders["Change_reason"].value_counts())
+
+        if len(new_orders):
+            self._append(new_orders)
+
+        # Match the pending errands and the new ones against every segment; the rest keep waiting
+        new_errands = errands_df[["Errand_category"]].assign(
+            Order_id=decode_base36_column(errands_df["Order_number"]).to_numpy()
+        )
+        probe = pd.concat([
+            self.pending.assign(age=self.pending["age"] + 1),
+            new_errands[new_errands["Order_id"].notna()][PENDING_COLUMNS].assign(age=0),
+        ], ignore_index=True)
+        matched = np.zeros(len(probe), dtype=bool)
+        merged = []
+        for segment in self.segments:
+            probe_rows, order_rows = segment.index.match(probe["Order_id"])
+            if not len(order_rows):
+                continue
+            matched[probe_rows] = True
+
+            # Orders whose contact count changed move between histogram buckets
+            rows, added = np.unique(order_rows, return_counts=True)
+            before = segment.contacts[rows]
+            after = before + added
+            aggregates.remove("contacts_histogram", pd.Series(before).value_counts())
+            aggregates.add("contacts_histogram", pd.Series(after).value_counts())
+
+            newly_contacted = segment.orders.take(rows[before == 0])
+            aggregates.remove("no_contact_by_Site_country", newly_contacted["Site_country"].value_counts())
+            newly_dated = newly_contacted[newly_contacted["month"].notna().to_numpy()]
+            for name, columns in RATE_DIMENSIONS.items():
+                aggregates.add(f"contacted_by_{name}", _distinct_orders(newly_dated, columns))
+
+            segment.contacts[rows] = after
+            segment.contacts_file = None
+            merged.append(segment.orders.take(order_rows).assign(
+                Errand_category=probe["Errand_category"].to_numpy()[probe_rows]
+            ))
+        pending = probe[~matched].reset_index(drop=True)
+        expired = np.zeros(len(pending), dtype=bool)
+        if self.max_pending_updates is not None:
+            expired = pending["age"].to_numpy() > self.max_pending_updates
+        self.pending = pending[~expired].reset_index(drop=True)
+        self.expired += int(expired.sum())
+
+        # Counts over the joined rows, only for the newly matched errands
+        if merged:
+            merged = pd.concat(merged, ignore_index=True)
+        else:
+            merged = pd.DataFrame(columns=["Order_id", "month"] + ORDER_ATTRIBUTES + ["Errand_category"])
+        dated_merged = merged[merged["month"].notna().to_numpy()]
+        aggregates.add("contacts_by_Brand", merged["Brand"].value_counts())
+        aggregates.add("contacts_by_Site_country", merged["Site_country"].value_counts())
+        aggregates.add("contacts_by_month", dated_merged["month"].astype(np.int64).value_counts())
+        aggregates.add("brand_category", _counts(merged, ["Brand", "Errand_category"]))
+        aggregates.add("partner_category", _counts(dated_merged, ["Partner", "Errand_category"]))
+        aggregates.add(
+            "origin_destination_category",
+            _counts(dated_merged, ["Origin_country", "Destination_country", "Errand_category"]),
+        )
+        return pending[expired].reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental customer service metrics.")
+    parser.add_argument("state_dir")
+    parser.add_argument("--orders", nargs="*", default=[])
+    parser.add_argument("--errands", nargs="*", default=[])
+    parser.add_argument("--output-dir", default=".")
+    parser.add_argument("--max-pending-updates", type=int, default=PENDING_MAX_UPDATES,
+                        help="updates an errand waits for its order before it is dropped")
+    args = parser.parse_args()
+
+    state = IncrementalState.load(args.state_dir)
+    state.max_pending_updates = args.max_pending_updates
+    new_orders, new_errands, expired = state.update(args.orders, args.errands)
+    state.save(args.state_dir)
+    print(f"Folded in {new_orders} orders and {new_errands} errands "
+          f"({len(state.pending)} errands waiting for their order, {len(expired)} dropped after "
+          f"waiting {args.max_pending_updates} updates, {state.expired} dropped in total)")
+
+    result, tables = finalise(state.aggregates)
+    write_key_metrics(result, os.path.join(args.output_dir, "key_metrics.txt"))
+    write_metrics_json(result, os.path.join(args.output_dir, "key_metrics.json"))
+    write_tables(tables, os.path.join(args.output_dir, "streaming_tables.json"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+def normalise_order_ids(values):
+    """
+    Normalise an Order_id column to nullable int64 keys.
+
+    Numeric columns are cast directly; string columns are stripped and parsed
+    once. Values that are not integers become <NA>.
+
+    Parameters:
+        values (pd.Series): Raw Order_id values.
+
+    Returns:
+        pd.Series: Keys with dtype 'Int64', aligned to the input index.
+    """
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return values.astype("Int64")
+    if pd.api.types.is_float_dtype(values.dtype):
+        whole = values.where(values == np.floor(values))
+        return whole.astype("Int64")
+
+    text = values.astype("string").str.strip()
+    parsed = pd.to_numeric(text, errors="coerce")
+    if pd.api.types.is_float_dtype(parsed.dtype):
+        # Non-integers (and anything beyond float precision) cannot be a valid key
+        parsed = parsed.where(parsed == np.floor(parsed))
+    return parsed.astype("Int64")
+
+
+def _key_arrays(keys):
+    """
+    Split an Int64 key Series into (int64 values, valid mask) numpy arrays.
+    """
+    keys = keys.astype("Int64")
+    valid = keys.notna().to_numpy()
+    values = keys.to_numpy(dtype=np.int64, na_value=0)
+    return values, valid
+
+
+class OrderIndex:
+    """
+    Sorted int64 index over the orders' Order_id keys.
+
+    Built once from the orders side and reused for the join, the anti-join of
+    orders without contacts and per-order contact counts.
+
+    Parameters:
+        order_ids (pd.Series): Normalised (Int64) Order_id keys of the orders table.
+    """
+
+    def __init__(self, order_ids):
+        values, valid = _key_arrays(order_ids)
+        rows = np.flatnonzero(valid)
+        keys = values[rows]
+        if (keys[1:] < keys[:-1]).any():
+            # Keys that are already sorted (e.g. a persisted segment) need no sort
+            rows = rows[np.argsort(keys, kind="stable")]
+
+        self.size = len(values)
+        self.rows = rows  # orders row positions, sorted by key
+        self.keys = values[self.rows]  # sorted keys
+
+    def locate(self, keys):
+        """
+        Find the range of matching index entries for every probe key.
+
+        Parameters:
+            keys (pd.Series): Int64 probe keys (nulls never match).
+
+        Returns:
+            tuple: (start, stop) arrays into the sorted index; empty when start == stop.
+        """
+        values, valid = _key_arrays(keys)
+        start = np.searchsorted(self.keys, values, side="left")
+        stop = np.searchsorted(self.keys, values, side="right")
+        stop[~valid] = start[~valid]
+        return start, stop
+
+    def contains(self, keys):
+        """
+        Boolean mask of probe keys that exist in the index (vectorized isin).
+        """
+        start, stop = self.locate(keys)
+        return stop > start
+
+    def match(self, keys):
+        """
+        Pair every probe key with every matching orders row.
+
+        Parameters:
+            keys (pd.Series): Int64 probe keys.
+
+        Returns:
+            tuple: (probe_rows, order_rows) int64 position arrays of equal length.
+        """
+        start, stop = self.locate(keys)
+        counts = stop - start
+        probe_rows = np.repeat(np.arange(len(counts)), counts)
+
+        # Offset of each output row within its matching range
+        run_starts = np.cumsum(counts) - counts
+        within = np.arange(len(probe_rows)) - np.repeat(run_starts, counts)
+        order_rows = self.rows[np.repeat(start, counts) + within]
+        return probe_rows, order_rows
+
+
+@dataclass
+class JoinResult:
+    """
+    Result of joining errands to orders on integer keys.
+
+    Attributes:
+        merged (pd.DataFrame): Inner join of errands and orders, one row per matched errand.
+        errand_rows (np.ndarray): Errands row position of every merged row.
+        order_rows (np.ndarray): Orders row position of every merged row.
+        contacts_per_order (np.ndarray): Number of matched errands for every orders row.
+    """
+
+    merged: pd.DataFrame
+    errand_rows: np.ndarray
+    order_rows: np.ndarray
+    contacts_per_order: np.ndarray
+
+    @property
+    def contacted(self):
+        """
+        Boolean mask over orders rows with at least one errand.
+        """
+        return self.contacts_per_order > 0
+
+    def unmatched_orders(self, orders_df):
+        """
+        Orders without any customer contact (anti-join, no isin over keys).
+        """
+        return orders_df[~self.contacted]
+
+    def matched_errands(self, errands_df):
+        """
+        Errands matched to at least one order (semi-join), in their original order.
+        """
+        return errands_df.take(np.unique(self.errand_rows)).reset_index(drop=True)
+
+    def order_counts(self, orders_df, key="Order_id"):
+        """
+        Number of errands per contacted order, like merged[key].value_counts().
+        """
+        contacted = self.contacted
+        return pd.Series(
+            self.contacts_per_order[contacted],
+            index=orders_df[key].to_numpy()[contacted],
+            name="count",
+        ).sort_values(ascending=False, kind="stable")
+
+
+def join_orders(errands_df, orders_df, key="Order_id", index=None, suffixes=("_x", "_y")):
+    """
+    Inner join errands to orders on int64 keys using a sorted index over the orders.
+
+    Both key columns must already be normalised to Int64 (see normalise_order_ids
+    and decode_base36_column). Overlapping non-key columns get pandas-style suffixes.
+
+    Parameters:
+        errands_df (pd.DataFrame): Errands with an Int64 key column.
+        orders_df (pd.DataFrame): Orders with an Int64 key column.
+        key (str): Name of the key column on both sides.
+        index (OrderIndex): Prebuilt index over orders_df[key]; built if omitted.
+        suffixes (tuple): Suffixes for overlapping column names (errands, orders).
+
+    Returns:
+        JoinResult: The merged frame and row mappings for reuse.
+    """
+    if index is None:
+        index = OrderIndex(orders_df[key])
+
+    errand_rows, order_rows = index.match(errands_df[key])
+
+    left = errands_df.take(errand_rows).reset_index(drop=True)
+    right = orders_df.drop(columns=key).take(order_rows).reset_index(drop=True)
+    overlap = left.columns.intersection(right.columns)
+    if len(overlap):
+        left = left.rename(columns={col: f"{col}{suffixes[0]}" for col in overlap})
+        right = right.rename(columns={col: f"{col}{suffixes[1]}" for col in overlap})
+    merged = pd.concat([left, right], axis=1)
+
+    contacts_per_order = np.bincount(order_rows, minlength=index.size)
+    return JoinResult(merged, errand_rows, order_rows, contacts_per_order)
@@ -0,0 +1,123 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+
+# Dense mixed-radix keys are used as-is up to this many possible groups (they index bincounts);
+# beyond that the keys are compacted to the combinations that actually occur
+DENSE_KEY_LIMIT = 1 << 22
+
+
+def _column_codes(values):
+    """
+    Integer code per row (-1 for nulls) and the labels the codes index into.
+
+    Categoricals reuse their codes and categories; other columns are factorized once.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy(dtype=np.int64), values.cat.categories
+    codes, labels = pd.factorize(values, sort=True)
+    return codes.astype(np.int64), pd.Index(labels)
+
+
+@dataclass(frozen=True)
+class GroupKeys:
+    """
+    Integer group keys for a multi-column grouping, without building per-row labels.
+
+    The per-column codes are combined in mixed radix (first column most
+    significant), so key order is the order of the column labels, like a sorted
+    groupby. Labels are only created for the keys asked for (e.g. a top-N table).
+
+    Attributes:
+        codes (np.ndarray): int64 key per row in [0, size), -1 where any column is null.
+        size (int): Number of possible keys (bincount length).
+        levels (list of pd.Index): Labels of every column, indexed by its codes.
+        names (list of str): Column names.
+        dense (np.ndarray): Mixed-radix key of every compacted key (None when keys are not compacted).
+    """
+
+    codes: np.ndarray
+    size: int
+    levels: list
+    names: list
+    dense: np.ndarray = None
+
+    def counts(self, mask=None):
+        """
+        Rows per key (optionally only rows where mask is True), as a bincount of length size.
+        """
+        selected = self.codes >= 0 if mask is None else mask & (self.codes >= 0)
+        return np.bincount(self.codes[selected], minlength=self.size)
+
+    def level_codes(self, keys):
+        """
+        Split keys back into one code array per column.
+        """
+        keys = np.asarray(keys, dtype=np.int64)
+        if self.dense is not None:
+            keys = self.dense[keys]
+        codes = []
+        for level in reversed(self.levels):
+            keys, code = np.divmod(keys, len(level))
+            codes.append(code)
+        return codes[::-1]
+
+    def index(self, keys):
+        """
+        Index for the given keys: plain for one column, a MultiIndex (built from codes) for several.
+        """
+        codes = self.level_codes(keys)
+        if len(self.levels) == 1:
+            return self.levels[0].take(codes[0]).rename(self.names[0])
+        return pd.MultiIndex(levels=self.levels, codes=codes, names=self.names)
+
+    def labels(self, keys, sep=" -> "):
+        """
+        String labels for the given keys only, e.g. "SE -> NO" for a route.
+        """
+        return join_labels(self.index(keys), sep)
+
+
+def group_keys(frame, columns):
+    """
+    Combine the category codes of several columns into one integer key per row.
+
+    Parameters:
+        frame (pd.DataFrame): Rows to key.
+        columns (list of str): Columns to group by.
+
+    Returns:
+        GroupKeys: Keys, their number and what is needed to label them.
+    """
+    keys = np.zeros(len(frame), dtype=np.int64)
+    valid = np.ones(len(frame), dtype=bool)
+    levels = []
+    size = 1
+    for column in columns:
+        codes, labels = _column_codes(frame[column])
+        size *= max(len(labels), 1)
+        if size >= 1 << 62:
+            raise ValueError(f"Too many combinations of {', '.join(columns)} for int64 keys")
+        keys = keys * max(len(labels), 1) + codes
+        valid &= codes >= 0
+        levels.append(labels)
+
+    if size <= DENSE_KEY_LIMIT:
+        return GroupKeys(np.where(valid, keys, -1), size, levels, list(columns))
+
+    # Sparse combinations: number the ones that occur (in key order)
+    dense, compact = np.unique(keys[valid], return_inverse=True)
+    codes = np.full(len(frame), -1, dtype=np.int64)
+    codes[valid] = compact
+    return GroupKeys(codes, len(dense), levels, list(columns), dense)
+
+
+def join_labels(index, sep=" -> "):
+    """
+    Join the levels of a MultiIndex into string labels (a plain Index is returned as is).
+    """
+    if not isinstance(index, pd.MultiIndex):
+        return index
+    return pd.Index([sep.join(str(value) for value in key) for key in index])
@@ -0,0 +1,259 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .timestamps import parse_timestamps
+
+
+# Columns each part of the report reads, per input table (see scheduler.ANALYSIS_TASKS and metrics.py)
+ANALYSIS_COLUMNS = {
+    "metrics": {"orders": ["Order_id"], "errands": ["Order_number"]},
+    "errand_categories": {"errands": ["Errand_category"]},
+    "channels": {"errands": ["Errand_channel"]},
+    "errand_types": {"errands": ["Errand_type"]},
+    "errand_actions": {"errands": ["Errand_action"]},
+    "brands": {"orders": ["Brand"], "errands": ["Errand_category"]},
+    "countries": {"orders": ["Site_country"]},
+    "monthly": {"orders": ["Order_created_at"]},
+    "partners": {"orders": ["Partner"], "errands": ["Errand_category"]},
+    "origin_destination": {"orders": ["Origin_country", "Destination_country"], "errands": ["Errand_category"]},
+    "routes": {"orders": ["Origin_country", "Destination_country"]},
+    "cancellations": {
+        "orders": ["Is_canceled", "Origin_country", "Destination_country", "Cancel_reason", "Change_reason"],
+    },
+}
+
+# Join keys, always loaded
+KEY_COLUMNS = {"orders": ["Order_id"], "errands": ["Order_number"]}
+
+# Low-cardinality columns loaded as categoricals (dictionary-encoded on read)
+CATEGORICAL_COLUMNS = [
+    "Brand",
+    "Partner",
+    "Site_country",
+    "Origin_country",
+    "Destination_country",
+    "Errand_category",
+    "Errand_channel",
+    "Errand_type",
+    "Errand_action",
+    "Cancel_reason",
+    "Change_reason",
+]
+
+# Columns the date-range and country filters apply to
+DATE_COLUMN = "Order_created_at"
+COUNTRY_COLUMN = "Site_country"
+
+
+def required_columns(table, analyses=None):
+    """
+    List the columns of a table needed by a set of analyses.
+
+    Parameters:
+        table (str): "orders" or "errands".
+        analyses (list of str): Names from ANALYSIS_COLUMNS; all analyses if omitted.
+
+    Returns:
+        list: Column names (in the capitalized form used by the analysis).
+    """
+    if analyses is None:
+        analyses = ANALYSIS_COLUMNS.keys()
+
+    columns = list(KEY_COLUMNS[table])
+    for name in analyses:
+        for column in ANALYSIS_COLUMNS[name].get(table, []):
+            if column not in columns:
+                columns.append(column)
+    return columns
+
+
+def _resolve_columns(schema, columns):
+    """
+    Map capitalized column names to the raw names stored in the file.
+    """
+    raw_names = {name.capitalize(): name for name in schema.names}
+    missing = [column for column in columns if column not in raw_names]
+    if missing:
+        raise ValueError(f"Columns not found in Parquet file: {', '.join(missing)}")
+    return {column: raw_names[column] for column in columns}
+
+
+def _timestamp_bound(value, field_type):
+    """
+    Convert a date-range bound to a scalar comparable with the stored column type.
+    """
+    bound = pd.Timestamp(value)
+    if pa.types.is_date(field_type):
+        return bound.date()
+    if field_type.tz is not None:
+        bound = bound.tz_localize(field_type.tz) if bound.tzinfo is None else bound.tz_convert(field_type.tz)
+    return bound.to_pydatetime()
+
+
+def _build_filters(schema, date_range=None, countries=None):
+    """
+    Build pyarrow filters that can be pushed down to row-group statistics.
+
+    Date filters are only pushed down for timestamp/date columns; string dates
+    are filtered after loading (see _apply_post_filters).
+    """
+    raw_names = {name.capitalize(): name for name in schema.names}
+    filters = []
+    if date_range is not None and DATE_COLUMN in raw_names:
+        raw = raw_names[DATE_COLUMN]
+        field_type = schema.field(raw).type
+        if pa.types.is_timestamp(field_type) or pa.types.is_date(field_type):
+            start, end = date_range
+            if start is not None:
+                filters.append((raw, ">=", _timestamp_bound(start, field_type)))
+            if end is not None:
+                filters.append((raw, "<", _timestamp_bound(end, field_type)))
+    if countries is not None and COUNTRY_COLUMN in raw_names:
+        filters.append((raw_names[COUNTRY_COLUMN], "in", list(countries)))
+    return filters or None
+
+
+def _apply_post_filters(df, date_range=None):
+    """
+    Apply the date-range filter to string date columns that could not be pushed down.
+
+    The column is left parsed, so it is not parsed again downstream.
+    """
+    if date_range is None or DATE_COLUMN not in df.columns:
+        return df
+    if pd.api.types.is_datetime64_any_dtype(df[DATE_COLUMN]):
+        return df
+
+    created_at = df[DATE_COLUMN] = parse_timestamps(df[DATE_COLUMN])
+    start, end = date_range
+    keep = created_at.notna()
+    if start is not None:
+        keep &= created_at >= pd.Timestamp(start)
+    if end is not None:
+        keep &= created_at < pd.Timestamp(end)
+    return df[keep.to_numpy()].reset_index(drop=True)
+
+
+def first_appearance_categories(values):
+    """
+    A categorical with its categories in order of first appearance in the rows, unused ones dropped.
+
+    Parquet dictionaries need not be in that order (a writer may store sorted categories, and
+    skipped row groups or filtered rows leave values behind), and tied counts rank by it.
+    """
+    codes = values.cat.codes.to_numpy()
+    used = pd.unique(codes[codes >= 0])
+    categories = values.cat.categories
+    if len(used) == len(categories) and (used == np.arange(len(used))).all():
+        return values
+
+    # Old code -> new code; the extra last slot keeps missing values (-1) missing
+    recode = np.full(len(categories) + 1, -1, dtype=codes.dtype)
+    recode[used] = np.arange(len(used))
+    recoded = pd.Categorical.from_codes(recode[codes], categories[used])
+    return pd.Series(recoded, index=values.index, name=values.name)
+
+
+def _read_file(path, columns, date_range=None, countries=None, schema=None):
+    """
+    Read the given columns of one Parquet file with filters pushed down.
+
+    Returns:
+        pa.Table: Columns renamed to their capitalized names, plus Order_created_at when a
+            date range needs it for the post-filter.
+    """
+    schema = pq.read_schema(path) if schema is None else schema
+
+    # String dates can only be filtered after loading, so read the date column too
+    load = list(columns)
+    has_date = DATE_COLUMN in (name.capitalize() for name in schema.names)
+    if date_range is not None and has_date and DATE_COLUMN not in load:
+        load.append(DATE_COLUMN)
+    resolved = _resolve_columns(schema, load)
+
+    dictionary_columns = [resolved[column] for column in CATEGORICAL_COLUMNS if column in resolved]
+    table = pq.read_table(
+        path,
+        columns=list(resolved.values()),
+        filters=_build_filters(schema, date_range, countries),
+        read_dictionary=dictionary_columns,
+    )
+    return table.rename_columns([name.capitalize() for name in table.column_names])
+
+
+def load_table(path, columns, date_range=None, countries=None):
+    """
+    Read only the given columns of a Parquet file, with filters pushed down.
+
+    Column names are capitalized like the rest of the analysis expects, and
+    low-cardinality columns are read dictionary-encoded into categoricals whose
+    categories are in order of first appearance in the returned rows.
+
+    Parameters:
+        path (str): Path of the Parquet file, or of a Hive-partitioned directory of Parquet files
+            (see dataset.PartitionedDataset; partitions outside the filters are never read).
+        columns (list of str): Capitalized column names to load.
+        date_range (tuple): (start, end) bounds on Order_created_at, end exclusive; either may be None.
+        countries (list of str): Keep only rows whose Site_country is in this list.
+
+    Returns:
+        pd.DataFrame: The projected and filtered table.
+    """
+    if os.path.isdir(path):
+        from .dataset import PartitionedDataset
+
+        table = PartitionedDataset(path).read(columns, date_range, countries)
+    else:
+        table = _read_file(path, columns, date_range, countries)
+
+    df = table.to_pandas()
+    df = _apply_post_filters(df, date_range)
+    for column in df.columns:
+        if isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = first_appearance_categories(df[column])
+    return df[list(columns)]
+
+
+def load_orders(path="orders.parquet", analyses=None, date_range=None, countries=None):
+    """
+    Load the orders columns needed by the given analyses.
+
+    Parameters:
+        path (str): Path of orders.parquet, or a partitioned directory of orders files.
+        analyses (list of str): Names from ANALYSIS_COLUMNS; all analyses if omitted.
+        date_range (tuple): (start, end) bounds on Order_created_at, end exclusive.
+        countries (list of str): Site_country values to keep.
+
+    Returns:
+        pd.DataFrame: The orders table.
+    """
+    return load_table(path, required_columns("orders", analyses), date_range, countries)
+
+
+def load_errands(path="errands.parquet", analyses=None):
+    """
+    Load the errands columns needed by the given analyses.
+
+    Errands carry no date or country; report.prepare_inputs restricts them to the
+    loaded orders when the orders are filtered.
+
+    Parameters:
+        path (str): Path of errands.parquet, or a directory of errands files.
+        analyses (list of str): Names from ANALYSIS_COLUMNS; all analyses if omitted.
+
+    Returns:
+        pd.DataFrame: The errands table.
+    """
+    return load_table(path, required_columns("errands", analyses))
+
+
+def observed_value_counts(values):
+    """
+    value_counts() without the zero counts categoricals report for unused categories.
+    """
+    counts = values.value_counts()
+    return counts[counts > 0]
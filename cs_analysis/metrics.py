@@ -0,0 +1,163 @@
+import json
+from dataclasses import asdict, dataclass
+
+import numpy as np
+import pandas as pd
+
+
+def _percentage(part, whole):
+    """
+    part / whole as a percentage, 0 when whole is 0.
+    """
+    return (part / whole) * 100 if whole > 0 else 0.0
+
+
+def contact_histogram(contacts_per_order):
+    """
+    Build the contacts-per-order histogram in a single pass.
+
+    Parameters:
+        contacts_per_order (np.ndarray): Number of errands for every order
+            (0 for orders without contacts), e.g. JoinResult.contacts_per_order.
+
+    Returns:
+        np.ndarray: histogram[k] = number of orders with exactly k contacts.
+    """
+    return np.bincount(np.asarray(contacts_per_order, dtype=np.int64), minlength=3)
+
+
+@dataclass(frozen=True)
+class ContactMetrics:
+    """
+    Key contact metrics derived from one contacts-per-order histogram.
+
+    Attributes:
+        total_orders (int): Number of orders.
+        total_contacts (int): Number of errands matched to an order (rows of the merge).
+        percentage_with_contacts (float): Matched errands per 100 orders.
+        percentage_no_contacts (float): 100 minus percentage_with_contacts.
+        percentage_unique_contact (float): Orders with exactly 1 contact per 100 matched errands.
+        percentage_two_contacts (float): Orders with exactly 2 contacts per 100 matched errands.
+        percentage_more_than_two_contacts (float): Matched errands not from a 1-contact order, per 100.
+    """
+
+    total_orders: int
+    total_contacts: int
+    percentage_with_contacts: float
+    percentage_no_contacts: float
+    percentage_unique_contact: float
+    percentage_two_contacts: float
+    percentage_more_than_two_contacts: float
+
+    @classmethod
+    def from_histogram(cls, histogram):
+        """
+        Compute every key metric from a contacts-per-order histogram.
+
+        Parameters:
+            histogram (np.ndarray): Output of contact_histogram().
+
+        Returns:
+            ContactMetrics: The key metrics.
+        """
+        histogram = np.asarray(histogram, dtype=np.int64)
+        total_orders = int(histogram.sum())
+        total_contacts = int((np.arange(len(histogram)) * histogram).sum())
+        one_contact = int(histogram[1]) if len(histogram) > 1 else 0
+        two_contacts = int(histogram[2]) if len(histogram) > 2 else 0
+
+        return cls(
+            total_orders=total_orders,
+            total_contacts=total_contacts,
+            percentage_with_contacts=_percentage(total_contacts, total_orders),
+            percentage_no_contacts=_percentage(total_orders - total_contacts, total_orders),
+            percentage_unique_contact=_percentage(one_contact, total_contacts),
+            percentage_two_contacts=_percentage(two_contacts, total_contacts),
+            percentage_more_than_two_contacts=_percentage(total_contacts - one_contact, total_contacts),
+        )
+
+    def as_labels(self):
+        """
+        Formatted metrics keyed by the labels used in key_metrics.txt.
+        """
+        return {
+            "Percentage of Orders With Contacts": f"{self.percentage_with_contacts:.2f}%",
+            "Percentage of Orders Without Contacts": f"{self.percentage_no_contacts:.2f}%",
+            "Percentage of Orders With 1 Contact": f"{self.percentage_unique_contact:.2f}%",
+            "Percentage of Orders With 2 Contacts": f"{self.percentage_two_contacts:.2f}%",
+            "Percentage of Orders With >1 Contact": f"{self.percentage_more_than_two_contacts:.2f}%",
+        }
+
+
+@dataclass(frozen=True)
+class MetricsResult:
+    """
+    Key metrics plus the contacts-per-order distribution, all from one histogram.
+
+    Attributes:
+        metrics (ContactMetrics): The key metrics.
+        histogram (np.ndarray): histogram[k] = number of orders with exactly k contacts.
+    """
+
+    metrics: ContactMetrics
+    histogram: np.ndarray
+
+    @property
+    def distribution(self):
+        """
+        Number of orders per contact count for contacted orders (counts >= 1 that occur).
+        """
+        counts = pd.Series(self.histogram[1:], index=np.arange(1, len(self.histogram)), name="count")
+        counts.index.name = "Contacts per order"
+        return counts[counts > 0]
+
+    @property
+    def contact_distribution(self):
+        """
+        Percentages for the '1 Contact', '2 Contacts' and '>1 Contact' chart.
+        """
+        return pd.Series({
+            "1 Contact": self.metrics.percentage_unique_contact,
+            "2 Contacts": self.metrics.percentage_two_contacts,
+            ">1 Contact": self.metrics.percentage_more_than_two_contacts,
+        })
+
+    def to_dict(self):
+        """
+        JSON-serialisable representation of the result.
+        """
+        return {
+            "metrics": asdict(self.metrics),
+            "distribution": {int(k): int(v) for k, v in self.distribution.items()},
+        }
+
+
+def compute_metrics(contacts_per_order):
+    """
+    Compute the key metrics and distribution from per-order contact counts.
+
+    Parameters:
+        contacts_per_order (np.ndarray): Number of errands for every order.
+
+    Returns:
+        MetricsResult: Key metrics and distribution.
+    """
+    histogram = contact_histogram(contacts_per_order)
+    return MetricsResult(ContactMetrics.from_histogram(histogram), histogram)
+
+
+def write_key_metrics(result, path="key_metrics.txt"):
+    """
+    Write the key metrics as 'label: value' lines.
+    """
+    with open(path, "w") as file:
+        for key, value in result.metrics.as_labels().items():
+            file.write(f"{key}: {value}\n")
+
+
+def write_metrics_json(result, path="key_metrics.json"):
+    """
+    Write the key metrics and distribution as JSON.
+    """
+    with open(path, "w") as file:
+        json.dump(result.to_dict(), file, indent=2)
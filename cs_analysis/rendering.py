@@ -0,0 +1,220 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from .tracing import NULL_TRACER, Tracer, row_count
+
+
+# Rendering modes:
+#   metrics-only: skip chart rendering entirely
+#   draw:         build every figure but do not write it
+#   save:         build every figure and save it as PNG
+RENDER_MODES = ("metrics-only", "draw", "save")
+
+
+@dataclass
+class ChartJob:
+    """
+    A chart to render, described with plain data only.
+
+    Attributes:
+        kind (str): "bar", "pie" or "stacked_bar".
+        data (pd.Series or pd.DataFrame): The computed values to plot.
+        title (str): Title of the chart (also the PNG file name).
+        xlabel (str): Label for the x-axis.
+        ylabel (str): Label for the y-axis.
+        options (dict): Kind-specific options (color, rotation, colors, ...).
+    """
+
+    kind: str
+    data: object
+    title: str
+    xlabel: str = ""
+    ylabel: str = ""
+    options: dict = field(default_factory=dict)
+
+
+def bar_chart(data, title, xlabel, ylabel, color="blue", rotation=45):
+    """
+    Describe a bar chart with customizable color and x-axis label rotation.
+
+    Parameters:
+        data (pd.Series or pd.DataFrame): The data to plot. Use a Series for simple bar charts.
+        title (str): Title of the chart.
+        xlabel (str): Label for the x-axis.
+        ylabel (str): Label for the y-axis.
+        color (str or list): Color of the bars. Can be a single color or a list of colors.
+        rotation (int or float): Rotation angle for the x-axis labels.
+
+    Returns:
+        ChartJob: The chart job.
+    """
+    return ChartJob("bar", data, title, xlabel, ylabel, {"color": color, "rotation": rotation})
+
+
+def pie_chart(data, title, colors=None, startangle=None):
+    """
+    Describe a pie chart with percentage labels.
+
+    Parameters:
+        data (pd.Series): Slice sizes, indexed by label.
+        title (str): Title of the chart.
+        colors (list or str): Slice colors, or the name of a seaborn palette such as "pastel".
+        startangle (float): Rotation of the first slice.
+
+    Returns:
+        ChartJob: The chart job.
+    """
+    return ChartJob("pie", data, title, options={"colors": colors, "startangle": startangle})
+
+
+def stacked_bar_chart(data, title, xlabel, ylabel, legend_title="", colormap="tab20", rotation=45):
+    """
+    Describe a stacked bar chart with one bar per row and one segment per column.
+
+    Parameters:
+        data (pd.DataFrame): Values to stack.
+        title (str): Title of the chart.
+        xlabel (str): Label for the x-axis.
+        ylabel (str): Label for the y-axis.
+        legend_title (str): Title of the legend (the column dimension).
+        colormap (str): Matplotlib colormap for the segments.
+        rotation (int or float): Rotation angle for the x-axis labels.
+
+    Returns:
+        ChartJob: The chart job.
+    """
+    options = {"legend_title": legend_title, "colormap": colormap, "rotation": rotation}
+    return ChartJob("stacked_bar", data, title, xlabel, ylabel, options)
+
+
+def _pyplot():
+    """
+    Import pyplot on the non-interactive Agg backend (only when rendering).
+    """
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def _draw_bar(plt, job):
+    plt.figure(figsize=(10, 6))
+    job.data.plot(kind="bar", color=job.options["color"])
+    plt.title(job.title)
+    plt.xlabel(job.xlabel, ha="center")
+    plt.ylabel(job.ylabel)
+    plt.xticks(rotation=job.options["rotation"])
+    plt.grid(axis="y", linestyle="--", alpha=0.7)
+    plt.tight_layout()
+
+
+def _draw_pie(plt, job):
+    colors = job.options["colors"]
+    if isinstance(colors, str):
+        import seaborn as sns
+
+        colors = sns.color_palette(colors)
+
+    plt.figure(figsize=(8, 8))
+    kwargs = {"startangle": job.options["startangle"]} if job.options["startangle"] is not None else {}
+    plt.pie(job.data.to_numpy(), labels=job.data.index, autopct="%1.1f%%", colors=colors, **kwargs)
+    plt.title(job.title)
+    plt.ylabel("")  # Remove the y-label for better appearance
+
+
+def _draw_stacked_bar(plt, job):
+    job.data.plot(kind="bar", stacked=True, figsize=(14, 8), colormap=job.options["colormap"])
+    plt.title(job.title, fontsize=16)
+    plt.xlabel(job.xlabel, fontsize=14)
+    plt.ylabel(job.ylabel, fontsize=14)
+    plt.legend(title=job.options["legend_title"], bbox_to_anchor=(1.05, 1), loc="upper left")
+    plt.xticks(rotation=job.options["rotation"])
+    plt.tight_layout()
+    plt.grid(axis="y", linestyle="--", alpha=0.7)
+
+
+_DRAW = {"bar": _draw_bar, "pie": _draw_pie, "stacked_bar": _draw_stacked_bar}
+
+
+def chart_path(output_dir, title):
+    """
+    PNG path for a chart, named after its title.
+    """
+    return os.path.join(output_dir, f"{title.replace(os.sep, '-')}.png")
+
+
+def render_chart(job, output_dir=None):
+    """
+    Render one chart job; save it as PNG when output_dir is given.
+
+    Returns:
+        str or None: The saved file path.
+    """
+    plt = _pyplot()
+    _DRAW[job.kind](plt, job)
+    path = None
+    if output_dir is not None:
+        path = chart_path(output_dir, job.title)
+        plt.savefig(path, format="png", dpi=300)
+    plt.close("all")
+    return path
+
+
+def _render_batch(jobs, output_dir, traced=False):
+    """
+    Render a batch of chart jobs in one worker process.
+
+    Returns:
+        tuple: (saved paths, trace records of every chart)
+    """
+    tracer = Tracer(enabled=traced)
+    paths = []
+    for job in jobs:
+        with tracer.stage(f"render:{job.kind}:{job.title}", rows_in=row_count(job.data)):
+            paths.append(render_chart(job, output_dir))
+    return paths, tracer.records
+
+
+def render_charts(jobs, mode="save", output_dir=".", workers=None, tracer=NULL_TRACER):
+    """
+    Render a batch of chart jobs, in a worker pool when workers > 1.
+
+    Parameters:
+        jobs (list of ChartJob): The charts to render.
+        mode (str): One of RENDER_MODES.
+        output_dir (str): Where PNG files are written in "save" mode.
+        workers (int): Number of worker processes; os.cpu_count() if None, inline if 1.
+        tracer (Tracer): Records one stage per chart.
+
+    Returns:
+        list: Saved file paths (empty unless mode is "save").
+    """
+    if mode not in RENDER_MODES:
+        raise ValueError(f"Unknown render mode '{mode}', expected one of {', '.join(RENDER_MODES)}")
+    if mode == "metrics-only" or not jobs:
+        return []
+
+    target = output_dir if mode == "save" else None
+    if target is not None:
+        os.makedirs(target, exist_ok=True)
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        paths, records = _render_batch(jobs, target, tracer.enabled)
+        tracer.extend(records)
+    else:
+        # One batch per worker so each process pays the matplotlib start-up once
+        batches = [jobs[start::workers] for start in range(workers)]
+        context = multiprocessing.get_context("fork")
+        paths = []
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            for batch_paths, records in pool.map(
+                _render_batch, batches, [target] * workers, [tracer.enabled] * workers
+            ):
+                paths += batch_paths
+                tracer.extend(records)
+    return [path for path in paths if path is not None]
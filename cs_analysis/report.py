@@ -0,0 +1,506 @@
+import os
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from .backends import get_backend
+from .base36 import decode_base36_column
+from .cache import DatasetCache
+from .cube import AggregateCube
+from .dataset import input_files
+from .joins import OrderIndex, join_orders, normalise_order_ids
+from .keys import join_labels
+from .loader import first_appearance_categories, load_errands, load_orders
+from .metrics import compute_metrics, write_key_metrics, write_metrics_json
+from .rendering import bar_chart, pie_chart, render_charts, stacked_bar_chart
+from .rollups import DailyRollups
+from .scheduler import ANALYSIS_TASKS, run_tasks
+from .segments import segment_report, write_segments
+from .timestamps import add_calendar_keys
+from .tracing import NULL_TRACER, Tracer
+
+
+@dataclass
+class Report:
+    """
+    Everything one run of the report produced.
+
+    Attributes:
+        metrics (MetricsResult): Key metrics and the contacts-per-order distribution.
+        results (dict): Analysis task name -> result table.
+        charts (list of ChartJob): The chart jobs built from the results.
+        chart_paths (list of str): PNG files written (only in "save" mode).
+        segments (dict): Segmentation name -> per-segment top errand categories (if requested).
+    """
+
+    metrics: object
+    results: dict
+    charts: list
+    chart_paths: list
+    segments: dict = field(default_factory=dict)
+
+
+def load_inputs(
+    orders_path="orders.parquet", errands_path="errands.parquet", date_range=None, countries=None, tracer=NULL_TRACER
+):
+    """
+    Load both tables, normalise their Order_id keys to Int64 and parse the order timestamps.
+
+    Parameters:
+        orders_path (str): Path of orders.parquet.
+        errands_path (str): Path of errands.parquet.
+        date_range (tuple): (start, end) bounds on Order_created_at, pushed down to the reader.
+        countries (list of str): Site_country values to keep, pushed down to the reader.
+        tracer (Tracer): Records the load and decode stages.
+
+    Returns:
+        tuple: (orders_df, errands_df)
+    """
+    # Read only the columns the analyses need (capitalized, low-cardinality columns as categoricals)
+    with tracer.stage("load_orders") as span:
+        orders_df = load_orders(orders_path, date_range=date_range, countries=countries)
+        span.rows_out = len(orders_df)
+    with tracer.stage("load_errands") as span:
+        errands_df = load_errands(errands_path)
+        span.rows_out = len(errands_df)
+
+    # Decode 'Order_number' from base-36 to base-10 (invalid values become <NA>)
+    with tracer.stage("decode_base36", rows_in=len(errands_df)) as span:
+        errands_df["Order_id"] = decode_base36_column(errands_df["Order_number"])
+        span.rows_out = int(errands_df["Order_id"].notna().sum()) if tracer.enabled else None
+
+    # Normalise the orders' 'Order_id' once to int64 keys (errands keys are already int64)
+    with tracer.stage("normalise_order_ids", rows_in=len(orders_df)) as span:
+        orders_df["Order_id"] = normalise_order_ids(orders_df["Order_id"])
+        span.rows_out = int(orders_df["Order_id"].notna().sum()) if tracer.enabled else None
+
+    # Parse Order_created_at once, before the join, with its integer month/week/day keys
+    with tracer.stage("parse_timestamps", rows_in=len(orders_df)) as span:
+        orders_df = add_calendar_keys(orders_df)
+        span.rows_out = int(orders_df["month"].notna().sum()) if tracer.enabled else None
+    return orders_df, errands_df
+
+
+def join_inputs(orders_df, errands_df, tracer=NULL_TRACER):
+    """
+    Join errands to orders and prepare the shared frames for the analyses.
+
+    Adds 'Contacts' (errands per order, 0 = no contact) to the orders; the merged
+    frame inherits the parsed Order_created_at and calendar keys of its orders.
+
+    Returns:
+        tuple: (orders_df, merged_df, JoinResult)
+    """
+    # Index the orders keys once and join the errands to it
+    with tracer.stage("join", rows_in=len(orders_df) + len(errands_df)) as span:
+        order_index = OrderIndex(orders_df["Order_id"])
+        join = join_orders(errands_df, orders_df, key="Order_id", index=order_index)
+        span.rows_out = len(join.merged)
+
+    orders_df["Contacts"] = join.contacts_per_order
+    return orders_df, join.merged, join
+
+
+def prepare_inputs(orders_path, errands_path, date_range=None, countries=None, cache_dir=None, tracer=NULL_TRACER):
+    """
+    Load, decode and join both tables, reusing the on-disk cache when the inputs are unchanged.
+
+    With a date or country filter, the returned errands are only those of the
+    loaded orders, so the errand-only analyses follow the filters too; without
+    one, they include errands whose order is missing.
+
+    Parameters:
+        orders_path (str): Path of orders.parquet.
+        errands_path (str): Path of errands.parquet.
+        date_range (tuple): (start, end) bounds on Order_created_at.
+        countries (list of str): Site_country values to keep.
+        cache_dir (str): DatasetCache directory; None disables caching.
+        tracer (Tracer): Records the cache lookup and every load/join stage.
+
+    Returns:
+        tuple: (orders_df, merged_df, errands_df), orders_df carrying 'Contacts'.
+    """
+    cache = key = None
+    if cache_dir:
+        # Key on the inputs' content and on the filters that shaped the frames
+        cache = DatasetCache(cache_dir)
+        params = {"date_range": date_range, "countries": countries}
+        paths = [orders_path, errands_path]
+        if os.path.isdir(orders_path) or os.path.isdir(errands_path):
+            # Dataset directories: the files left after pruning, and their partitions (given by the paths)
+            paths = input_files(orders_path, date_range, countries) + input_files(errands_path)
+            params["paths"] = [os.path.abspath(path) for path in paths]
+        key = cache.key_for(paths, params)
+        with tracer.stage("cache_get") as span:
+            frames = cache.get(key)
+            span.rows_out = 0 if frames is None else len(frames["merged"])
+        if frames is not None:
+            return frames["orders"], frames["merged"], frames["errands"]
+
+    orders_df, errands_df = load_inputs(orders_path, errands_path, date_range, countries, tracer=tracer)
+    orders_df, merged_df, join = join_inputs(orders_df, errands_df, tracer=tracer)
+    if date_range is not None or countries is not None:
+        with tracer.stage("filter_errands", rows_in=len(errands_df)) as span:
+            errands_df = join.matched_errands(errands_df)
+            # Errand categories in order of first appearance among those errands (merged rows keep their order)
+            for column in errands_df.columns:
+                if isinstance(errands_df[column].dtype, pd.CategoricalDtype):
+                    errands_df[column] = first_appearance_categories(errands_df[column])
+                    merged_df[column] = first_appearance_categories(merged_df[column])
+            span.rows_out = len(errands_df)
+
+    if cache is not None:
+        with tracer.stage("cache_put", rows_in=len(merged_df)):
+            cache.put(key, {"orders": orders_df, "merged": merged_df, "errands": errands_df})
+    return orders_df, merged_df, errands_df
+
+
+def build_charts(metrics_result, results, specific_partner="Partner CO"):
+    """
+    Describe every chart of the report as a ChartJob (plain data, nothing is drawn).
+
+    Parameters:
+        metrics_result (MetricsResult): Key metrics and distribution.
+        results (dict): Analysis task name -> result table (see ANALYSIS_TASKS).
+        specific_partner (str): Partner shown in the per-partner errand category chart.
+
+    Returns:
+        list: ChartJob objects.
+    """
+    key_metrics = metrics_result.metrics
+    charts = []
+
+    # Distribution of contacts per order
+    charts.append(bar_chart(
+        data=metrics_result.distribution.head(23),
+        title="Distribution of Contacts per Order vs Number of Orders",
+        xlabel="Number of Contacts per Order",
+        ylabel="Number of Orders"
+    ))
+
+    # Pie chart for contact vs. no contact
+    charts.append(pie_chart(
+        data=pd.Series(
+            [key_metrics.percentage_no_contacts, key_metrics.percentage_with_contacts],
+            index=["No Contact", "With Contact"],
+        ),
+        title="Percentage of Orders With and Without Customer Service Contacts",
+        colors=["green", "blue"],
+        startangle=140
+    ))
+
+    # Bar chart for contact distribution
+    charts.append(bar_chart(
+        data=metrics_result.contact_distribution,
+        title="Distribution of Contacts per Order vs Percentage of Orders",
+        xlabel="Contact Type",
+        ylabel="Percentage of Orders",
+        color="orange",
+        rotation=0
+    ))
+
+    # The frequency of errand categories
+    charts.append(bar_chart(
+        data=results["errand_categories"],
+        title="Top 10 Frequency of Errand Categories",
+        xlabel="Errand Category",
+        ylabel="Frequency",
+        color="orange",
+        rotation=45
+    ))
+
+    # Distribution of communication channels
+    charts.append(pie_chart(
+        data=results["errand_channels"],
+        title="Distribution of Communication Channels",
+        colors="pastel"
+    ))
+
+    charts.append(bar_chart(
+        data=results["errand_categories"],
+        title="Top 10 Errand category",
+        xlabel="Errand category",
+        ylabel="Frequency",
+        color="teal",
+    ))
+
+    charts.append(bar_chart(
+        data=results["errand_types"],
+        title="Top 10 Errand types",
+        xlabel="Errand Type",
+        ylabel="Frequency",
+        color="green",
+    ))
+
+    charts.append(bar_chart(
+        data=results["errand_actions"],
+        title="Top 10 Errand Actions",
+        xlabel="Errand Action",
+        ylabel="Frequency",
+        color="blue",
+    ))
+
+    # Compare customer contacts by brands
+    charts.append(bar_chart(
+        data=results["brand_contacts"],
+        title="Customer Contacts by Brand",
+        xlabel="Brand",
+        ylabel="Frequency",
+        color="purple",
+    ))
+
+    charts.append(bar_chart(
+        data=results["brand_categories"].head(5),
+        title="Top 5 Errand Categories for Brand A",
+        xlabel="Errand Category",
+        ylabel="Number of Contacts",
+        color="blue",
+        rotation=15
+    ))
+
+    # Orders without contacts and contacts by country
+    charts.append(bar_chart(
+        data=results["countries_without_contacts"].head(10),
+        title="Top 10 Countries with No Customer Contacts",
+        xlabel="Country",
+        ylabel="Number of Contacts",
+        color="teal",
+        rotation=45
+    ))
+
+    charts.append(bar_chart(
+        data=results["countries_with_contacts"].head(10),
+        title="Top 10 Countries with Most Customer Contacts",
+        xlabel="Country",
+        ylabel="Number of Contacts",
+        color="blue",
+        rotation=45
+    ))
+
+    # Seasonal trends, one bar per month of every year (yyyymm keys shown as "2023-01")
+    monthly = results["monthly_contact_rate"]
+    charts.append(bar_chart(
+        data=monthly.set_axis([f"{int(key) // 100}-{int(key) % 100:02d}" for key in monthly.index]),
+        title="Customer Service Contact Rate by Month",
+        xlabel="Month",
+        ylabel="Contact Rate (%)",
+        color="purple"
+    ))
+
+    # Interaction rates and errand categories by partner
+    rates = results["interaction_rates"]
+    charts.append(bar_chart(
+        data=rates["partner"].head(10),
+        title="Customer Service Interaction Rates by Partner",
+        xlabel="Partner",
+        ylabel="Interaction Rate (%)",
+        color="blue",
+        rotation=45
+    ))
+
+    partner_categories = results["partner_categories"]
+    if specific_partner in partner_categories:
+        charts.append(bar_chart(
+            data=partner_categories.row(specific_partner),
+            title=f"Errand Categories for {specific_partner}",
+            xlabel="Errand Category",
+            ylabel="Percentage of Total Contacts",
+            color="orange",
+            rotation=45
+        ))
+
+    # Interaction rates by origin and destination country
+    charts.append(bar_chart(
+        data=rates["origin"].head(10),
+        title="Top 10 Customer Service Interaction Rates by Origin Country",
+        xlabel="Origin Country",
+        ylabel="Interaction Rate (%)",
+        color="blue",
+        rotation=45
+    ))
+
+    charts.append(bar_chart(
+        data=rates["destination"].head(10),
+        title="Top 10 Customer Service Interaction Rates by Destination Country",
+        xlabel="Destination Country",
+        ylabel="Interaction Rate (%)",
+        color="orange",
+        rotation=45
+    ))
+
+    # Errand categories for the countries with the highest interaction rates
+    charts.append(stacked_bar_chart(
+        data=results["country_categories"].T,
+        title="Top 10 Errand Categories with Highest Contacts Across Countries",
+        xlabel="Errand Category",
+        ylabel="Number of Contacts",
+        legend_title="Country"
+    ))
+
+    # Routes with the most customer service contacts (labels only for the routes shown)
+    top_routes = rates["route"].head(10)
+    charts.append(bar_chart(
+        data=top_routes.set_axis(join_labels(top_routes.index)),
+        title="Top 10 Routes with Highest Customer Service Interaction Rates",
+        xlabel="Route (Origin -> Destination)",
+        ylabel="Interaction Rate (%)",
+        color="purple",
+        rotation=15
+    ))
+
+    # Cancellations and booking changes
+    charts.append(bar_chart(
+        data=results["cancellations_by_origin"].head(10),
+        title="Top 10 Origin Countries with Highest Cancellation Rates",
+        xlabel="Origin Country",
+        ylabel="Number of Cancellations",
+        color="red",
+        rotation=15
+    ))
+
+    charts.append(bar_chart(
+        data=results["cancel_reasons"].head(10),
+        title="Top 10 Cancellation Reasons",
+        xlabel="Cancellation Reason",
+        ylabel="Frequency",
+        color="red",
+        rotation=45
+    ))
+
+    charts.append(bar_chart(
+        data=results["change_reasons"].head(5),
+        title="Top 5 Change Reasons",
+        xlabel="Change Reason",
+        ylabel="Frequency",
+        color="blue",
+        rotation=10
+    ))
+    return charts
+
+
+def run(
+    orders_path="orders.parquet",
+    errands_path="errands.parquet",
+    output_dir=".",
+    chart_dir=None,
+    date_range=None,
+    countries=None,
+    workers=None,
+    render_mode="metrics-only",
+    cache_dir=None,
+    segments=None,
+    rollup_dir=None,
+    cube_dir=None,
+    trace=False,
+    chrome_trace=False,
+    backend="pandas",
+):
+    """
+    Run the whole customer service report.
+
+    Writes key_metrics.txt and key_metrics.json to output_dir and, in "save"
+    mode, one PNG per chart to chart_dir.
+
+    Parameters:
+        orders_path (str): Path of orders.parquet.
+        errands_path (str): Path of errands.parquet.
+        output_dir (str): Directory for the metrics files.
+        chart_dir (str): Directory for chart PNGs; output_dir if omitted.
+        date_range (tuple): (start, end) bounds on Order_created_at, e.g. ("2023-01-01", "2024-01-01").
+        countries (list of str): Site_country values to keep, e.g. ["SE", "NO"].
+        workers (int): Worker processes for analyses and rendering (None = one per CPU core, 1 = inline).
+        render_mode (str): "metrics-only", "draw" or "save" (see rendering.RENDER_MODES).
+        cache_dir (str): Directory of the decoded/joined input cache (None = no cache).
+        segments (list of str): Segmentations (see segments.SEGMENTS, e.g. ["brand", "partner"]) whose
+            per-segment top errand categories are written to output_dir as a batch, with charts in
+            <chart_dir>/segments/ in "save" mode.
+        rollup_dir (str): Write the daily rollup store (see rollups.DailyRollups) to this directory
+            for day/week/month/quarter range queries without rerunning the report.
+        cube_dir (str): Write the aggregate cube (see cube.AggregateCube) to this directory; every chart
+            and ad-hoc drill-downs can then be answered from it without the raw rows.
+        trace (bool): Write trace.json to output_dir: wall time, CPU time, peak RSS growth and
+            rows in/out of every stage (load, decode, join, each analysis, each chart, ...).
+        chrome_trace (bool): Also write trace.chrome.json (chrome://tracing, Perfetto); implies trace.
+        backend (str): "pandas", or "polars"/"duckdb" to aggregate the inputs in that engine and answer
+            the report from the aggregate cube (see backends.py); those skip the row-level frames, so
+            segments and rollup_dir need the pandas backend, and cache_dir (which holds those frames)
+            is not used.
+
+    Returns:
+        Report: Metrics, analysis results and chart jobs.
+    """
+    if backend != "pandas":
+        row_level = {"segments": segments, "rollup_dir": rollup_dir}
+        unsupported = [name for name, value in row_level.items() if value]
+        if unsupported:
+            raise ValueError(f"{', '.join(unsupported)} need the pandas backend, not '{backend}'")
+        engine = get_backend(backend)
+
+    os.makedirs(output_dir, exist_ok=True)
+    tracer = Tracer() if trace or chrome_trace else NULL_TRACER
+
+    if backend != "pandas":
+        # The engine aggregates the Parquet files into the cube; every analysis is a slice of it
+        with tracer.stage(f"aggregate:{backend}") as span:
+            cube = engine.cube(orders_path, errands_path, date_range, countries)
+            span.rows_out = sum(len(table) for table in cube.tables.values())
+        with tracer.stage("metrics"):
+            metrics_result = cube.metrics()
+            write_key_metrics(metrics_result, os.path.join(output_dir, "key_metrics.txt"))
+            write_metrics_json(metrics_result, os.path.join(output_dir, "key_metrics.json"))
+        with tracer.stage("analyses") as span:
+            results = cube.results()
+            span.rows_out = len(results)
+    else:
+        orders_df, merged_df, errands_df = prepare_inputs(
+            orders_path, errands_path, date_range, countries, cache_dir=cache_dir, tracer=tracer
+        )
+
+        # Build the contacts-per-order histogram once; every key metric and the distribution come from it
+        with tracer.stage("metrics", rows_in=len(orders_df)):
+            metrics_result = compute_metrics(orders_df["Contacts"].to_numpy())
+            write_key_metrics(metrics_result, os.path.join(output_dir, "key_metrics.txt"))
+            write_metrics_json(metrics_result, os.path.join(output_dir, "key_metrics.json"))
+
+        # Run the independent analyses (only reading the shared frames) over a process pool
+        results = run_tasks(
+            ANALYSIS_TASKS,
+            {"orders": orders_df, "merged": merged_df, "errands": errands_df},
+            workers=workers,
+            tracer=tracer,
+        )
+
+    with tracer.stage("build_charts") as span:
+        charts = build_charts(metrics_result, results)
+        span.rows_out = len(charts)
+    chart_paths = render_charts(
+        charts, mode=render_mode, output_dir=chart_dir or output_dir, workers=workers, tracer=tracer
+    )
+
+    # Every segment of every requested segmentation from one grouping per segmentation
+    segment_tables = {}
+    if segments:
+        with tracer.stage("segments", rows_in=len(merged_df)):
+            segment_tables = segment_report(merged_df, segments)
+            _, segment_chart_paths = write_segments(segment_tables, output_dir, chart_dir, render_mode, workers)
+        chart_paths += segment_chart_paths
+
+    # Per-day counts by the main dimensions, for trend queries over any date range
+    if rollup_dir:
+        with tracer.stage("rollups", rows_in=len(orders_df)):
+            DailyRollups.from_orders(orders_df).save(rollup_dir)
+
+    # The report's grouping sets, aggregated once for later queries
+    if cube_dir:
+        if backend != "pandas":
+            with tracer.stage("cube"):
+                cube.save(cube_dir)
+        else:
+            with tracer.stage("cube", rows_in=len(orders_df) + len(merged_df) + len(errands_df)):
+                AggregateCube.build(orders_df, merged_df, errands_df).save(cube_dir)
+
+    if tracer.enabled:
+        tracer.write_json(os.path.join(output_dir, "trace.json"))
+        if chrome_trace:
+            tracer.write_chrome_trace(os.path.join(output_dir, "trace.chrome.json"))
+    return Report(metrics_result, results, charts, chart_paths, segment_tables)
@@ -0,0 +1,250 @@
+"""
+Daily rollup store: per-day counts of orders, contacted orders, errands and cancellations.
+
+The rollups are built once from the orders frame (one row per order with its
+'Contacts') and hold one table for all orders plus one per dimension, each
+sorted by day. Range queries at day, week, month or quarter granularity only
+slice and sum those daily buckets, so multi-year trends never rescan rows.
+
+    rollups = DailyRollups.from_orders(orders_df)
+    rollups.save("rollups")
+    DailyRollups.load("rollups").query("quarter", start="2023-01-01", dimension="Brand")
+
+Usage:
+    python -m cs_analysis.rollups ROLLUP_DIR --freq month --start 2023-01-01 --end 2024-01-01 --dimension Partner
+"""
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pyarrow.feather as feather
+
+
+# Dimensions rolled up per day, next to the total over all orders
+ROLLUP_DIMENSIONS = ["Brand", "Partner", "Site_country", "Origin_country", "Destination_country"]
+
+# Additive counts kept per bucket
+MEASURES = ["orders", "contacted_orders", "errands", "cancellations"]
+
+# Query granularities
+FREQUENCIES = ("day", "week", "month", "quarter")
+
+_TOTAL = "total"
+
+
+def _period_start(days, freq):
+    """
+    First day of the day/week (Monday)/month/quarter containing each datetime64[D] day.
+    """
+    if freq == "day":
+        return days
+    if freq == "week":
+        # Day 0 (1970-01-01) was a Thursday
+        offsets = (days.astype(np.int64) + 3) % 7
+        return days - offsets.astype("timedelta64[D]")
+    months = days.astype("datetime64[M]")
+    if freq == "quarter":
+        months = months - (months.astype(np.int64) % 3).astype("timedelta64[M]")
+    return months.astype("datetime64[D]")
+
+
+def _previous(directory):
+    return f"{directory.rstrip(os.sep)}.previous"
+
+
+def replace_directory(staging, directory):
+    """
+    Move a fully written staging directory into place.
+
+    A directory cannot be renamed over another one, so the old store is renamed
+    aside first and deleted only after the swap: an interruption leaves the old
+    or the new store readable (see readable_directory()).
+    """
+    previous = _previous(directory)
+    if os.path.isdir(previous):
+        if os.path.isdir(directory):
+            shutil.rmtree(previous)
+        else:
+            # Interrupted between the two renames: the old store is the one to keep until the swap
+            os.replace(previous, directory)
+    if os.path.isdir(directory):
+        os.replace(directory, previous)
+    os.replace(staging, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+
+
+def readable_directory(directory):
+    """
+    The directory to load: the store itself, or the old one while replace_directory() is swapping.
+    """
+    previous = _previous(directory)
+    if not os.path.isdir(directory) and os.path.isdir(previous):
+        return previous
+    return directory
+
+
+def _daily(frame, dimension=None):
+    """
+    Sum the measures of every (day[, dimension value]), sorted by day.
+    """
+    keys = ["day"] if dimension is None else ["day", dimension]
+    table = frame.groupby(keys, observed=True, sort=True)[MEASURES].sum().reset_index()
+    return table.rename(columns={dimension: "value"}) if dimension is not None else table
+
+
+class DailyRollups:
+    """
+    Per-day counts for all orders and per dimension value.
+
+    Parameters:
+        tables (dict): "total" and dimension name -> DataFrame with 'day' (datetime64),
+            'value' (dimension tables only) and the MEASURES columns, sorted by day.
+    """
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    @classmethod
+    def from_orders(cls, orders, dimensions=None):
+        """
+        Roll up the dated orders per day.
+
+        Parameters:
+            orders (pd.DataFrame): Orders with Order_created_at (datetime), Contacts, Is_canceled
+                and the dimension columns.
+            dimensions (list of str): Dimensions to roll up; ROLLUP_DIMENSIONS if omitted.
+
+        Returns:
+            DailyRollups: The store.
+        """
+        dimensions = ROLLUP_DIMENSIONS if dimensions is None else dimensions
+        created = orders["Order_created_at"]
+        dated = created.notna().to_numpy()
+        contacts = orders["Contacts"].to_numpy()[dated]
+
+        # One row per dated order carrying its own counts, then summed per bucket
+        frame = orders.loc[dated, dimensions].assign(
+            day=created[dated].to_numpy().astype("datetime64[D]"),
+            orders=1,
+            contacted_orders=(contacts > 0).astype(np.int64),
+            errands=contacts.astype(np.int64),
+            cancellations=(orders["Is_canceled"][dated] == 1).to_numpy(dtype=np.int64, na_value=0),
+        )
+        tables = {_TOTAL: _daily(frame)}
+        for dimension in dimensions:
+            tables[dimension] = _daily(frame, dimension)
+        return cls(tables)
+
+    @property
+    def dimensions(self):
+        return [name for name in self.tables if name != _TOTAL]
+
+    def merge(self, other):
+        """
+        Add another store's counts (e.g. a later day's rollups) to this one in place.
+        """
+        for name, table in other.tables.items():
+            if name not in self.tables:
+                self.tables[name] = table
+                continue
+            keys = ["day"] if name == _TOTAL else ["day", "value"]
+            combined = pd.concat([self.tables[name], table], ignore_index=True)
+            self.tables[name] = combined.groupby(keys, observed=True, sort=True)[MEASURES].sum().reset_index()
+        return self
+
+    def query(self, freq="month", start=None, end=None, dimension=None, values=None):
+        """
+        Sum the daily buckets of a date range per day, week, month or quarter.
+
+        Parameters:
+            freq (str): One of FREQUENCIES; weeks start on Monday.
+            start (str or datetime): First day to include (None = from the first day).
+            end (str or datetime): First day to exclude (None = through the last day).
+            dimension (str): Split by this dimension (None = all orders).
+            values (list): Only these values of the dimension (requires dimension).
+
+        Returns:
+            pd.DataFrame: MEASURES plus 'contact_rate' (errands per 100 orders), 'interaction_rate'
+                (% of orders with a contact) and 'cancellation_rate' (%), indexed by period start
+                (and dimension value).
+        """
+        if freq not in FREQUENCIES:
+            raise ValueError(f"Unknown frequency '{freq}', expected one of {', '.join(FREQUENCIES)}")
+        if values is not None and dimension is None:
+            raise ValueError("'values' requires a 'dimension' to filter on")
+        table = self.tables[dimension or _TOTAL]
+
+        # Tables are sorted by day, so the range is one slice
+        days = table["day"].to_numpy().astype("datetime64[D]")
+        first = 0 if start is None else np.searchsorted(days, np.datetime64(pd.Timestamp(start).date()), "left")
+        last = len(days) if end is None else np.searchsorted(days, np.datetime64(pd.Timestamp(end).date()), "left")
+        rows = table.iloc[first:last]
+        periods = _period_start(days[first:last], freq)
+        if values is not None:
+            selected = rows["value"].isin(values).to_numpy()
+            rows, periods = rows[selected], periods[selected]
+
+        keys = [pd.Index(periods.astype("datetime64[s]"), name="period")]
+        if dimension is not None:
+            keys.append(rows["value"].rename(dimension).to_numpy())
+        result = rows[MEASURES].groupby(keys, observed=True, sort=True).sum()
+        if dimension is not None:
+            result.index = result.index.set_names(["period", dimension])
+
+        orders = result["orders"].where(result["orders"] > 0)
+        result["contact_rate"] = (result["errands"] / orders).fillna(0) * 100
+        result["interaction_rate"] = (result["contacted_orders"] / orders).fillna(0) * 100
+        result["cancellation_rate"] = (result["cancellations"] / orders).fillna(0) * 100
+        return result
+
+    def save(self, directory):
+        """
+        Write one Feather file per table, replacing an earlier store only once fully written.
+        """
+        staging = f"{directory.rstrip(os.sep)}.next"
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        for name, table in self.tables.items():
+            feather.write_feather(table, os.path.join(staging, f"{name}.feather"), compression="uncompressed")
+        replace_directory(staging, directory)
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Load a store written by save().
+        """
+        directory = readable_directory(directory)
+        return cls({
+            name[:-len(".feather")]: feather.read_table(os.path.join(directory, name)).to_pandas()
+            for name in sorted(os.listdir(directory))
+            if name.endswith(".feather")
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a daily rollup store.")
+    parser.add_argument("directory", help="Rollup store written by run(rollup_dir=...)")
+    parser.add_argument("--freq", choices=FREQUENCIES, default="month")
+    parser.add_argument("--start", default=None, help="First day to include")
+    parser.add_argument("--end", default=None, help="First day to exclude")
+    parser.add_argument("--dimension", choices=ROLLUP_DIMENSIONS, default=None)
+    parser.add_argument("--value", action="append", dest="values", help="Dimension value to keep (repeatable)")
+    parser.add_argument("--output", default=None, help="Write the result as CSV instead of printing it")
+    args = parser.parse_args()
+
+    rollups = DailyRollups.load(args.directory)
+    try:
+        result = rollups.query(args.freq, args.start, args.end, args.dimension, args.values)
+    except ValueError as exc:
+        parser.error(str(exc))
+    if args.output:
+        result.to_csv(args.output)
+    else:
+        with pd.option_context("display.max_rows", None, "display.width", 200):
+            print(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+
+from . import analyses
+from .tracing import NULL_TRACER, Tracer, row_count
+
+
+@dataclass(frozen=True)
+class Task:
+    """
+    An analysis with declared inputs.
+
+    Attributes:
+        name (str): Unique name of the result.
+        func (callable): Top-level function from analyses.py.
+        inputs (dict): Shared table name -> columns the function reads.
+        kwargs (dict): Extra keyword arguments for the function.
+    """
+
+    name: str
+    func: object
+    inputs: dict
+    kwargs: dict = field(default_factory=dict)
+
+
+ORDER_DATES = ["Order_id", "month"]
+
+# Every independent analysis of the report, with the columns it reads
+ANALYSIS_TASKS = [
+    Task("errand_categories", analyses.errand_categories, {"errands": ["Errand_category"]}),
+    Task("errand_channels", analyses.errand_channels, {"errands": ["Errand_channel"]}),
+    Task("errand_types", analyses.errand_types, {"errands": ["Errand_type"]}),
+    Task("errand_actions", analyses.errand_actions, {"errands": ["Errand_action"]}),
+    Task("brand_contacts", analyses.brand_contacts, {"merged": ["Brand"]}),
+    Task("brand_categories", analyses.brand_categories, {"merged": ["Brand", "Errand_category"]}, {"brand": "Brand A"}),
+    Task("countries_without_contacts", analyses.countries_without_contacts, {"orders": ["Contacts", "Site_country"]}),
+    Task("countries_with_contacts", analyses.countries_with_contacts, {"merged": ["Site_country"]}),
+    Task("monthly_contact_rate", analyses.monthly_contact_rate, {"orders": ["month"], "merged": ["month"]}),
+    Task(
+        "interaction_rates", analyses.interaction_rates,
+        {"orders": ORDER_DATES + ["Contacts", "Partner", "Origin_country", "Destination_country"]},
+    ),
+    Task("partner_categories", analyses.partner_categories, {"merged": ["month", "Partner", "Errand_category"]}),
+    Task(
+        "country_categories", analyses.country_categories,
+        {
+            "orders": ORDER_DATES + ["Contacts", "Origin_country"],
+            "merged": ["month", "Origin_country", "Destination_country", "Errand_category"],
+        },
+    ),
+    Task("cancellations_by_origin", analyses.cancellations_by_origin, {"orders": ["month", "Is_canceled", "Origin_country"]}),
+    Task("cancel_reasons", analyses.cancel_reasons, {"orders": ["month", "Cancel_reason"]}),
+    Task("change_reasons", analyses.change_reasons, {"orders": ["month", "Change_reason"]}),
+]
+
+
+def _run_inline(task, tables, tracer=NULL_TRACER):
+    """
+    Run a task on in-process frames, projected to its declared columns.
+    """
+    with tracer.stage(f"analysis:{task.name}") as span:
+        frames = {table: tables[table][columns] for table, columns in task.inputs.items()}
+        span.rows_in = row_count(frames)
+        result = task.func(**frames, **task.kwargs)
+        span.rows_out = row_count(result)
+    return result
+
+
+# Frames of the current run_tasks() call; forked workers inherit them copy-on-write
+_FORKED_TABLES = {}
+
+
+def _run_forked(task, traced=False):
+    """
+    Run a task in a forked worker process on the frames it inherited from the parent.
+
+    The column buffers are never written to, so they stay shared with the parent
+    instead of being pickled to every task.
+
+    Returns:
+        tuple: (result, trace records)
+    """
+    tracer = Tracer(enabled=traced)
+    return _run_inline(task, _FORKED_TABLES, tracer), tracer.records
+
+
+def run_tasks(tasks, tables, workers=None, tracer=NULL_TRACER):
+    """
+    Run independent analysis tasks, in parallel over a process pool when workers > 1.
+
+    Parameters:
+        tasks (list of Task): The tasks to run.
+        tables (dict): Shared table name -> pd.DataFrame.
+        workers (int): Number of worker processes; os.cpu_count() if None, inline if 1.
+        tracer (Tracer): Records one stage per task (timed inside the worker).
+
+    Returns:
+        dict: Task name -> result.
+    """
+    workers = workers or os.cpu_count() or 1
+    workers = min(workers, len(tasks))
+
+    # Workers are forked so they never re-import (and re-run) the calling script
+    if workers <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        return {task.name: _run_inline(task, tables, tracer) for task in tasks}
+
+    # Workers are forked while the pool is open, so they see these frames
+    _FORKED_TABLES.update(tables)
+    try:
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = {task.name: pool.submit(_run_forked, task, tracer.enabled) for task in tasks}
+            results = {}
+            for name, future in futures.items():
+                results[name], records = future.result()
+                tracer.extend(records)
+            return results
+    finally:
+        _FORKED_TABLES.clear()
@@ -0,0 +1,96 @@
+import os
+
+import pandas as pd
+
+from .crosstab import SparseCrosstab
+from .rendering import bar_chart, render_charts
+
+
+# Segmentations of the batch report: name -> (column, only rows with a valid order date).
+# Like the single-segment charts, brands use all contacts and partners the dated ones.
+SEGMENTS = {
+    "brand": ("Brand", False),
+    "partner": ("Partner", True),
+}
+
+
+def segment_categories(merged, column, top_n=10, dated_only=False):
+    """
+    Top errand categories of every segment, grouped once over the merged frame.
+
+    Parameters:
+        merged (pd.DataFrame): Errands joined to orders, with 'month'.
+        column (str): Segment column, e.g. "Brand" or "Partner".
+        top_n (int): Categories kept per segment.
+        dated_only (bool): Only count contacts with a valid order date.
+
+    Returns:
+        pd.DataFrame: Columns 'count' and 'share' (of the segment's contacts), indexed
+            by (segment, Errand_category), highest count first within a segment.
+    """
+    mask = merged["month"].notna().to_numpy() if dated_only else None
+    crosstab = SparseCrosstab.from_frame(merged, [column], ["Errand_category"], mask=mask)
+    counts = crosstab.top_k_per_row(top_n)
+    totals = crosstab.row_sums()
+    shares = counts / totals.reindex(counts.index.get_level_values(0)).to_numpy()
+    return pd.DataFrame({"count": counts, "share": shares})
+
+
+def segment_report(merged, segments=None, top_n=10):
+    """
+    Per-segment top errand categories for every segmentation.
+
+    Parameters:
+        merged (pd.DataFrame): Errands joined to orders, with 'month'.
+        segments (list of str): Names from SEGMENTS; all if omitted.
+        top_n (int): Categories kept per segment.
+
+    Returns:
+        dict: Segmentation name -> DataFrame from segment_categories().
+    """
+    segments = SEGMENTS if segments is None else {name: SEGMENTS[name] for name in segments}
+    return {
+        name: segment_categories(merged, column, top_n=top_n, dated_only=dated_only)
+        for name, (column, dated_only) in segments.items()
+    }
+
+
+def segment_charts(table):
+    """
+    One bar chart of the top errand categories per segment.
+
+    Returns:
+        list: ChartJob objects.
+    """
+    return [
+        bar_chart(
+            data=rows.droplevel(0)["count"],
+            title=f"Top {len(rows)} Errand Categories for {segment}",
+            xlabel="Errand Category",
+            ylabel="Number of Contacts",
+            color="blue",
+            rotation=15
+        )
+        for segment, rows in table.groupby(level=0, sort=False)
+    ]
+
+
+def write_segments(tables, output_dir, chart_dir=None, render_mode="metrics-only", workers=None):
+    """
+    Write every segmentation as one CSV and, depending on render_mode, its charts in one batch.
+
+    Files: <output_dir>/segments_<name>.csv and, in "save" mode,
+    <chart_dir>/segments/<name>/<chart title>.png.
+
+    Returns:
+        tuple: (CSV paths, chart PNG paths)
+    """
+    table_paths, chart_paths = [], []
+    for name, table in tables.items():
+        path = os.path.join(output_dir, f"segments_{name}.csv")
+        table.to_csv(path)
+        table_paths.append(path)
+
+        segment_dir = os.path.join(chart_dir or output_dir, "segments", name)
+        chart_paths += render_charts(segment_charts(table), mode=render_mode, output_dir=segment_dir, workers=workers)
+    return table_paths, chart_paths
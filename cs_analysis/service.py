@@ -0,0 +1,288 @@
+"""
+Local HTTP/JSON metrics service over a materialised aggregate cube.
+
+The cube written by run(cube_dir=...) is loaded once into memory and every
+request is answered from it (no raw rows, no recomputation). The directory is
+polled and reloaded in the background when a new cube is written; requests keep
+being served from the previous cube until the new one is fully loaded. Only
+the standard library and the package itself are used, so it runs offline.
+
+Endpoints (GET, JSON responses):
+    /health                         cube source and load time
+    /metrics                        key metrics and the contacts-per-order distribution
+    /top/<dimension>?n=10           top values by contacts (or ?measure=orders, ...)
+    /rates/<dimension>[,<dim2>]     interaction rates (% of distinct orders with a contact)
+    /monthly                        contacts per 100 orders for every month
+    /query?by=Brand,month&measure=contacts
+                                    any cube query
+
+Every endpoint except /health takes filters as query parameters: a dimension
+name with one or more comma-separated values (e.g. ?Brand=Brand%20A&Site_country=SE,NO)
+and dated=1 for rows with a valid order date. /metrics can be filtered by month,
+Brand, Site_country and Partner; the combinations the other endpoints can
+answer are listed in cube.py. Unknown parameters, and filters no grouping set
+covers, are answered with 400.
+
+Queries run in the event loop's thread pool, so a slow query never blocks
+other connections.
+
+Usage:
+    python -m cs_analysis.service CUBE_DIR --port 8765
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .cube import ERRAND_DIMENSIONS, ORDER_DIMENSIONS, AggregateCube
+
+
+# Dimensions stored as integers in the cube; filter values are parsed accordingly
+_INTEGER_DIMENSIONS = {"month", "Is_canceled", "Contacts"}
+
+# Query parameters other than dimension filters
+_OPTIONS = {"dated", "n", "measure", "by"}
+
+# Responses kept per cube version (cleared on reload)
+RESPONSE_CACHE_SIZE = 1024
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+
+class RequestError(Exception):
+    """
+    A request that cannot be answered; carries the HTTP status.
+    """
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _records(table, value_name="value"):
+    """
+    A Series or DataFrame as a list of JSON-ready row dicts (index levels become fields).
+    """
+    if hasattr(table, "to_frame"):
+        table = table.rename(value_name).to_frame()
+    return json.loads(table.reset_index().to_json(orient="records"))
+
+
+def _filters(params):
+    """
+    Split query parameters into cube filters and dated_only; unknown parameters are rejected.
+    """
+    where = {}
+    for name, values in params.items():
+        if name not in _OPTIONS and name not in ORDER_DIMENSIONS and name not in ERRAND_DIMENSIONS:
+            raise RequestError(400, f"Unknown parameter {name}")
+        if name in ORDER_DIMENSIONS or name in ERRAND_DIMENSIONS:
+            values = [value for item in values for value in item.split(",")]
+            try:
+                where[name] = [int(value) for value in values] if name in _INTEGER_DIMENSIONS else values
+            except ValueError:
+                raise RequestError(400, f"{name} expects integers") from None
+    dated_only = params.get("dated", ["0"])[-1] in ("1", "true", "yes")
+    return where, dated_only
+
+
+def _integer(params, name, default):
+    try:
+        return int(params.get(name, [default])[-1])
+    except ValueError:
+        raise RequestError(400, f"{name} expects an integer") from None
+
+
+class MetricsService:
+    """
+    Serves cube queries over HTTP and reloads the cube when its directory changes.
+
+    Parameters:
+        cube_dir (str): Directory written by AggregateCube.save().
+        reload_interval (float): Seconds between checks for a new cube.
+    """
+
+    def __init__(self, cube_dir, reload_interval=2.0):
+        self.cube_dir = cube_dir
+        self.reload_interval = reload_interval
+        self.cube = None
+        self.version = None
+        self.loaded_at = None
+        self._responses = {}
+
+    def _signature(self):
+        """
+        Identity of the cube currently on disk (None while it is missing or being replaced).
+        """
+        try:
+            meta = os.stat(os.path.join(self.cube_dir, "cube.json"))
+        except OSError:
+            return None
+        return meta.st_ino, meta.st_mtime_ns
+
+    async def reload(self):
+        """
+        Load the cube if it changed on disk; the previous cube serves requests meanwhile.
+
+        Returns:
+            bool: True when a new cube was loaded.
+        """
+        signature = self._signature()
+        if signature is None or signature == self.version:
+            return False
+        try:
+            cube = await asyncio.get_running_loop().run_in_executor(None, AggregateCube.load, self.cube_dir)
+        except (OSError, ValueError):
+            # Replaced while loading; the next check picks up the complete cube
+            return False
+        self.cube, self.version, self.loaded_at = cube, signature, time.time()
+        self._responses = {}
+        return True
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            await self.reload()
+
+    def answer(self, path, params):
+        """
+        JSON-ready response body of one GET request.
+        """
+        if path == "/health":
+            return {"status": "ok" if self.cube else "loading", "cube_dir": self.cube_dir, "loaded_at": self.loaded_at}
+        if self.cube is None:
+            raise RequestError(503, f"No cube loaded from {self.cube_dir}")
+
+        cube = self.cube
+        parts = [unquote(part) for part in path.strip("/").split("/")]
+        where, dated_only = _filters(params)
+        try:
+            if parts == ["metrics"]:
+                return cube.metrics(where=where, dated_only=dated_only).to_dict()
+            if parts[0] == "top" and len(parts) == 2:
+                measure = params.get("measure", ["contacts"])[-1]
+                counts = cube.counts([parts[1]], measure, where=where, dated_only=dated_only)
+                return _records(counts.head(_integer(params, "n", 10)), measure)
+            if parts[0] == "rates" and len(parts) == 2:
+                rates = cube.rates(
+                    parts[1].split(","), "contacted_orders", "distinct_orders", where=where, dated_only=dated_only
+                )
+                return _records(rates.head(_integer(params, "n", 10_000)), "interaction_rate")
+            if parts == ["monthly"]:
+                orders = cube.query(["month"], ["orders"], where=where, dated_only=True)["orders"]
+                contacts = cube.query(["month"], ["contacts"], where=where, dated_only=True)["contacts"]
+                return _records((contacts / orders).fillna(0) * 100, "contact_rate")
+            if parts == ["query"]:
+                by = [name for item in params.get("by", []) for name in item.split(",") if name]
+                measures = [name for item in params.get("measure", ["contacts"]) for name in item.split(",")]
+                result = cube.query(by, measures, where=where, dated_only=dated_only)
+                return _records(result) if by else json.loads(result.to_json())
+        except (KeyError, ValueError) as exc:
+            raise RequestError(400, str(exc)) from None
+        raise RequestError(404, f"Unknown endpoint {path}")
+
+    def _render(self, target):
+        """
+        Status and encoded JSON body for a request target (runs in a worker thread).
+        """
+        url = urlsplit(target)
+        try:
+            status, body = 200, self.answer(url.path, parse_qs(url.query))
+        except RequestError as exc:
+            status, body = exc.status, {"error": str(exc)}
+        except Exception as exc:
+            status, body = 500, {"error": f"{type(exc).__name__}: {exc}"}
+        return status, json.dumps(body).encode()
+
+    async def respond(self, target):
+        """
+        Status and encoded JSON body for a request target, cached per cube version.
+        """
+        cached = self._responses.get(target)
+        if cached is not None:
+            return cached
+        version = self.version
+        response = await asyncio.get_running_loop().run_in_executor(None, self._render, target)
+        status = response[0]
+        # Answers computed from a cube replaced meanwhile are not cached for the new one
+        if status == 200 and self.cube is not None and self.version == version:
+            if len(self._responses) >= RESPONSE_CACHE_SIZE:
+                self._responses.pop(next(iter(self._responses)))
+            self._responses[target] = response
+        return response
+
+    async def handle(self, reader, writer):
+        """
+        Serve the HTTP/1.1 requests of one connection (keep-alive until the client closes).
+        """
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                method, target, version = (request_line.decode("latin-1").split() + ["", "", ""])[:3]
+                if method != "GET":
+                    status, body = 405, json.dumps({"error": f"{method} not supported"}).encode()
+                else:
+                    status, body = await self.respond(target)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(body)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        """
+        Load the cube, then serve until cancelled.
+        """
+        await self.reload()
+        watcher = asyncio.create_task(self._watch())
+        server = await asyncio.start_server(self.handle, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the aggregate cube as a local JSON API.")
+    parser.add_argument("cube_dir", help="Cube written by run(cube_dir=...) or --cube-dir")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--reload-interval", type=float, default=2.0, help="Seconds between checks for a new cube")
+    args = parser.parse_args()
+
+    service = MetricsService(args.cube_dir, args.reload_interval)
+    print(f"serving {args.cube_dir} on http://{args.host}:{args.port}")
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
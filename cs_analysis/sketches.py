@@ -0,0 +1,262 @@
+"""
+Mergeable sketches for the approximate mode.
+
+HyperLogLog estimates distinct counts (per group) and SpaceSaving the most
+frequent values with per-value error bounds. Both merge exactly (the merge of
+two sketches equals the sketch of the combined input, up to the stated
+bounds) and serialise to plain dicts, so daily or per-worker sketches can be
+stored as JSON and combined later.
+"""
+import base64
+import zlib
+
+import numpy as np
+import pandas as pd
+
+
+# Default HyperLogLog precision: 2**12 one-byte registers (4 KB) per group, ~1.6% standard error
+DEFAULT_PRECISION = 12
+
+# Default SpaceSaving capacity (tracked values); counts are exact while fewer values are seen
+DEFAULT_CAPACITY = 200
+
+
+def _bit_length(values):
+    """
+    Number of significant bits of every uint64 value (0 for 0), exact for all 64 bits.
+    """
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    # frexp(x) = (m, e) with x = m * 2**e and 0.5 <= m < 1, so e is the bit length of x > 0
+    return np.where(high > 0, 32 + np.frexp(high)[1], np.frexp(low)[1])
+
+
+def _register_ranks(values, precision):
+    """
+    Hash values and split each hash into a register index and a rank (position of the first 1 bit).
+    """
+    hashes = pd.util.hash_array(np.asarray(values))
+    index = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - precision)) - 1)
+    rank = (64 - precision) - _bit_length(rest) + 1
+    return index, rank.astype(np.uint8)
+
+
+def _estimate(registers):
+    """
+    HyperLogLog estimate for every row of a 2-D register array (with linear counting for small sets).
+    """
+    m = registers.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)), axis=-1)
+    zeros = np.count_nonzero(registers == 0, axis=-1)
+    with np.errstate(divide="ignore"):
+        linear = m * np.log(m / np.maximum(zeros, 1))
+    return np.where((raw <= 2.5 * m) & (zeros > 0), linear, raw)
+
+
+def _encode(array):
+    """
+    Compress an array to base64 text (registers hold small values and compress well).
+    """
+    return base64.b64encode(zlib.compress(np.ascontiguousarray(array).tobytes())).decode("ascii")
+
+
+def _decode(text, dtype):
+    return np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype=dtype).copy()
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch per group (one group if no groups are given).
+
+    Parameters:
+        precision (int): log2 of the number of registers per group (4-18).
+    """
+
+    def __init__(self, precision=DEFAULT_PRECISION):
+        if not 4 <= precision <= 18:
+            raise ValueError("precision must be between 4 and 18")
+        self.precision = precision
+        self.labels = []
+        self.registers = np.zeros((0, 1 << precision), dtype=np.uint8)
+
+    @property
+    def relative_error(self):
+        """
+        Standard error of every estimate, relative to the true count (1.04 / sqrt(registers)).
+        """
+        return 1.04 / np.sqrt(1 << self.precision)
+
+    def _rows(self, labels):
+        """
+        Register row of every label, adding rows for new labels.
+        """
+        positions = {label: row for row, label in enumerate(self.labels)}
+        new = [label for label in labels if label not in positions]
+        if new:
+            positions.update({label: len(self.labels) + offset for offset, label in enumerate(new)})
+            self.labels = self.labels + new
+            self.registers = np.vstack(
+                [self.registers, np.zeros((len(new), self.registers.shape[1]), dtype=np.uint8)]
+            )
+        return np.array([positions[label] for label in labels], dtype=np.int64)
+
+    def add(self, values, groups=None, labels=None):
+        """
+        Add values, optionally per group.
+
+        Parameters:
+            values (array-like): Values to count (nulls must be removed by the caller).
+            groups (np.ndarray): Group code of every value (indexes labels); one group if omitted.
+            labels (list): Label of every group code.
+        """
+        if groups is None:
+            groups, labels = np.zeros(len(values), dtype=np.int64), [None]
+        rows = self._rows(list(labels))[groups]
+        index, rank = _register_ranks(values, self.precision)
+        flat = self.registers.reshape(-1)
+        np.maximum.at(flat, rows * self.registers.shape[1] + index, rank)
+        return self
+
+    def merge(self, other):
+        """
+        Fold another sketch of the same precision into this one and return self.
+        """
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precision")
+        rows = self._rows(other.labels)
+        self.registers[rows] = np.maximum(self.registers[rows], other.registers)
+        return self
+
+    def estimate(self):
+        """
+        Estimated distinct count per group.
+
+        Returns:
+            pd.Series: Label -> estimate (a single unnamed entry without groups).
+        """
+        return pd.Series(_estimate(self.registers), index=pd.Index(self.labels, dtype=object))
+
+    def to_dict(self):
+        return {
+            "type": "hyperloglog",
+            "precision": self.precision,
+            "labels": self.labels,
+            "registers": _encode(self.registers),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["precision"])
+        sketch.labels = list(data["labels"])
+        sketch.registers = _decode(data["registers"], np.uint8).reshape(len(sketch.labels), -1)
+        return sketch
+
+
+class SpaceSaving:
+    """
+    Top-k sketch keeping at most `capacity` values with count bounds.
+
+    Every tracked count is an upper bound of the true count and count - error a
+    lower bound; a value that is not tracked occurred at most `floor` times.
+    Batches are summarised exactly and then merged, so updates are vectorized.
+    Values are kept as strings so the sketch serialises to JSON.
+
+    Parameters:
+        capacity (int): Maximum number of tracked values.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.errors = pd.Series(dtype=np.int64)
+        self.floor = 0
+        self.total = 0
+
+    def add(self, values, weights=None):
+        """
+        Add a batch of values (nulls are ignored), each occurring once or `weights` times.
+        """
+        batch = SpaceSaving(self.capacity)
+        if weights is None:
+            counts = pd.Series(values).value_counts()
+        else:
+            counts = pd.Series(np.asarray(weights, dtype=np.int64)).groupby(np.asarray(values), sort=False).sum()
+        counts = counts[counts > 0]
+        counts.index = counts.index.astype(str)
+        batch.counts = counts.astype(np.int64)
+        batch.errors = pd.Series(0, index=counts.index, dtype=np.int64)
+        batch.total = int(counts.sum())
+        batch._truncate()
+        return self.merge(batch)
+
+    def _truncate(self):
+        """
+        Keep the `capacity` largest counts; dropped counts raise the floor.
+        """
+        if len(self.counts) <= self.capacity:
+            return
+        order = self.counts.sort_values(ascending=False, kind="stable").index
+        self.floor = max(self.floor, int(self.counts[order[self.capacity]]))
+        self.counts = self.counts[order[:self.capacity]]
+        self.errors = self.errors[order[:self.capacity]]
+
+    def merge(self, other):
+        """
+        Fold another sketch into this one and return self.
+
+        A value missing from one side may have occurred up to that side's floor
+        times, which is added to both its count and its error.
+        """
+        counts = self.counts.add(other.counts, fill_value=0)
+        errors = self.errors.add(other.errors, fill_value=0)
+        only_other = ~counts.index.isin(self.counts.index)
+        only_self = ~counts.index.isin(other.counts.index)
+        missing = np.where(only_other, self.floor, 0) + np.where(only_self, other.floor, 0)
+        self.counts = (counts + missing).astype(np.int64)
+        self.errors = (errors + missing).astype(np.int64)
+        self.floor += other.floor
+        self.total += other.total
+        self._truncate()
+        return self
+
+    def top(self, k=10):
+        """
+        The k most frequent values with their bounds.
+
+        Returns:
+            pd.DataFrame: Columns 'count' (upper bound), 'lower' and 'error', highest first.
+        """
+        counts = self.counts.sort_values(ascending=False, kind="stable").head(k)
+        errors = self.errors[counts.index]
+        return pd.DataFrame({"count": counts, "lower": counts - errors, "error": errors})
+
+    def to_dict(self):
+        return {
+            "type": "spacesaving",
+            "capacity": self.capacity,
+            "values": self.counts.index.tolist(),
+            "counts": self.counts.tolist(),
+            "errors": self.errors.tolist(),
+            "floor": self.floor,
+            "total": self.total,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["capacity"])
+        index = pd.Index(data["values"], dtype=object)
+        sketch.counts = pd.Series(data["counts"], index=index, dtype=np.int64)
+        sketch.errors = pd.Series(data["errors"], index=index, dtype=np.int64)
+        sketch.floor = data["floor"]
+        sketch.total = data["total"]
+        return sketch
+
+
+def sketch_from_dict(data):
+    """
+    Rebuild any sketch from its to_dict() output.
+    """
+    types = {"hyperloglog": HyperLogLog, "spacesaving": SpaceSaving}
+    return types[data["type"]].from_dict(data)
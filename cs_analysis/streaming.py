@@ -0,0 +1,408 @@
+"""
+Streaming execution of the count-based analyses for inputs larger than memory.
+
+Both Parquet files are read record batch by record batch and hash-partitioned
+on Order_id into spill files, so every order and all of its errands land in the
+same partition. Each partition pair is then joined and reduced to mergeable
+partial aggregates (counts only), which are combined at the end. Because an
+order never spans two partitions, distinct-order counts per Partner, Origin,
+Destination and route simply add up across partitions.
+
+Spilled rows are buffered per partition and written as one Parquet file per
+flush, so no writer stays open per partition and row groups are not split per
+batch. Buffers hold about one batch of rows (at least SPILL_BUFFER_ROWS per
+partition): when they fill up, the largest ones are flushed.
+
+Usage:
+    python -m cs_analysis.streaming orders.parquet errands.parquet --chunk-rows 2000000
+"""
+import argparse
+import json
+import math
+import os
+import tempfile
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .analyses import sort_descending, top_columns_table
+from .analyses import top_columns_table
+from .base36 import decode_base36_column
+from .crosstab import SparseCrosstab
+from .joins import join_orders, normalise_order_ids
+from .loader import required_columns
+from .metrics import ContactMetrics, MetricsResult, write_key_metrics, write_metrics_json
+from .timestamps import add_calendar_keys
+
+
+# Default number of rows per record batch and (approximately) per partition
+DEFAULT_CHUNK_ROWS = 1_000_000
+
+# Spill buffers may hold this many rows per partition even when that exceeds one batch
+SPILL_BUFFER_ROWS = 4096
+
+# Dimensions with interaction rates (distinct contacted orders / distinct orders)
+RATE_DIMENSIONS = {
+    "Partner": ["Partner"],
+    "Origin_country": ["Origin_country"],
+    "Destination_country": ["Destination_country"],
+    "route": ["Origin_country", "Destination_country"],
+}
+
+# Name of every rate dimension in report.run()'s interaction_rates
+RATE_NAMES = {"Partner": "partner", "Origin_country": "origin", "Destination_country": "destination", "route": "route"}
+
+# Errand attributes counted over all errands
+ERRAND_COLUMNS = ["Errand_category", "Errand_channel", "Errand_type", "Errand_action"]
+
+
+def _counts(frame, columns):
+    """
+    Row counts per value (or value combination) of the given columns, nulls excluded.
+    """
+    if len(columns) == 1:
+        return frame[columns[0]].value_counts()
+    return frame.groupby(columns, observed=True).size()
+
+
+def _distinct_orders(frame, columns):
+    """
+    Number of distinct Order_ids per value of the given columns.
+    """
+    unique = frame.dropna(subset=["Order_id"]).drop_duplicates(subset=["Order_id"] + columns)
+    return _counts(unique, columns)
+
+
+@dataclass
+class PartialAggregates:
+    """
+    Mergeable count aggregates for one chunk (or the combination of several).
+
+    Attributes:
+        counts (dict): Name -> pd.Series of counts; merged by index-aligned addition.
+    """
+
+    counts: dict = field(default_factory=dict)
+
+    def add(self, name, series):
+        """
+        Add a count Series under a name, summing with what is already there.
+        """
+        series = series[series > 0]
+        if name in self.counts:
+            self.counts[name] = self.counts[name].add(series, fill_value=0)
+        else:
+            self.counts[name] = series.astype(np.int64)
+
+    def remove(self, name, series):
+        """
+        Subtract counts under a name (values that moved elsewhere), dropping those that reach zero.
+        """
+        series = series[series > 0]
+        remaining = self.get(name).sub(series, fill_value=0)
+        self.counts[name] = remaining[remaining > 0].astype(np.int64)
+
+    def merge(self, other):
+        """
+        Fold another PartialAggregates into this one and return self.
+        """
+        for name, series in other.counts.items():
+            self.add(name, series)
+        return self
+
+    def get(self, name):
+        """
+        Counts for a name (empty if nothing was counted), cast back to int64.
+        """
+        return self.counts.get(name, pd.Series(dtype=np.int64)).astype(np.int64)
+
+
+def aggregate_partition(orders_df, errands_df):
+    """
+    Reduce one partition of orders and errands to partial aggregates.
+
+    Parameters:
+        orders_df (pd.DataFrame): Orders of the partition with Int64 Order_id.
+        errands_df (pd.DataFrame): Errands of the partition with decoded Int64 Order_id.
+
+    Returns:
+        PartialAggregates: Counts for every count-based analysis.
+    """
+    partial = PartialAggregates()
+    # Parse the partition's timestamps once; the merged rows inherit them with the calendar keys
+    orders_df = add_calendar_keys(orders_df)
+    join = join_orders(errands_df.drop(columns="Order_number"), orders_df, key="Order_id")
+    merged_df = join.merged
+
+    histogram = np.bincount(join.contacts_per_order, minlength=1)
+    partial.add("contacts_histogram", pd.Series(histogram))
+
+    for column in ERRAND_COLUMNS:
+        partial.add(column, errands_df[column].value_counts())
+
+    partial.add("contacts_by_Brand", merged_df["Brand"].value_counts())
+    partial.add("contacts_by_Site_country", merged_df["Site_country"].value_counts())
+    partial.add("no_contact_by_Site_country", join.unmatched_orders(orders_df)["Site_country"].value_counts())
+
+    # Like the script, the remaining analyses only use rows with a valid order date
+    dated = orders_df["month"].notna().to_numpy()
+    dated_orders = orders_df[dated].astype({"month": np.int64})
+    dated_merged = merged_df[merged_df["month"].notna().to_numpy()].astype({"month": np.int64})
+    contacted = join.contacted[dated]
+
+    partial.add("orders_by_month", dated_orders["month"].value_counts())
+    partial.add("contacts_by_month", dated_merged["month"].value_counts())
+
+    for name, columns in RATE_DIMENSIONS.items():
+        partial.add(f"orders_by_{name}", _distinct_orders(dated_orders, columns))
+        partial.add(f"contacted_by_{name}", _distinct_orders(dated_orders[contacted], columns))
+
+    partial.add("brand_category", _counts(merged_df, ["Brand", "Errand_category"]))
+    partial.add("partner_category", _counts(dated_merged, ["Partner", "Errand_category"]))
+    partial.add(
+        "origin_destination_category",
+        _counts(dated_merged, ["Origin_country", "Destination_country", "Errand_category"]),
+    )
+
+    canceled = dated_orders[dated_orders["Is_canceled"] == 1]
+    partial.add("cancellations_by_Origin_country", canceled["Origin_country"].value_counts())
+    partial.add("cancellations_by_Destination_country", canceled["Destination_country"].value_counts())
+    partial.add("Cancel_reason", dated_orders["Cancel_reason"].value_counts())
+    partial.add("Change_reason", dated_orders["Change_reason"].value_counts())
+    return partial
+
+
+def _raw_columns(path, columns):
+    """
+    Raw (stored) names of the given capitalized columns.
+    """
+    raw_names = {name.capitalize(): name for name in pq.read_schema(path).names}
+    return [raw_names[column] for column in columns]
+
+
+def _partition_file(path, columns, key_func, n_partitions, spill_dir, prefix, batch_size):
+    """
+    Split a Parquet file into spill files by Order_id hash.
+
+    Rows are buffered per partition; once the buffers hold more than batch_size
+    rows (or SPILL_BUFFER_ROWS per partition, if more), the largest are written
+    out until at most half of that remains.
+
+    Parameters:
+        key_func (callable): Maps a record batch (as pandas) to an Int64 Series of Order_ids.
+
+    Returns:
+        list: Spill file paths of every partition (empty if the partition is empty).
+    """
+    parquet_file = pq.ParquetFile(path)
+    raw_columns = _raw_columns(path, columns)
+
+    # Spill schema: the stored column types plus an int64 Order_id key
+    fields = [
+        pa.field(name.capitalize(), parquet_file.schema_arrow.field(name).type)
+        for name in raw_columns
+        if name.capitalize() != "Order_id"
+    ]
+    schema = pa.schema(fields + [pa.field("Order_id", pa.int64())])
+
+    budget = max(batch_size, n_partitions * SPILL_BUFFER_ROWS)
+    buffers = [[] for _ in range(n_partitions)]
+    buffered = np.zeros(n_partitions, dtype=np.int64)
+    paths = [[] for _ in range(n_partitions)]
+
+    def flush(partition):
+        path = os.path.join(spill_dir, f"{prefix}-{partition:05d}-{len(paths[partition]):05d}.parquet")
+        pq.write_table(pa.concat_tables(buffers[partition]), path)
+        paths[partition].append(path)
+        buffers[partition] = []
+        buffered[partition] = 0
+
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=raw_columns):
+        frame = batch.to_pandas()
+        frame.columns = [name.capitalize() for name in frame.columns]
+        keys = key_func(frame)
+        frame = frame.drop(columns="Order_id", errors="ignore").assign(Order_id=keys)
+
+        # Null keys never join; keep them in partition 0 so they are still counted
+        buckets = np.remainder(keys.to_numpy(dtype=np.int64, na_value=0), n_partitions)
+        table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+        order = np.argsort(buckets, kind="stable")
+        bounds = np.searchsorted(buckets[order], np.arange(n_partitions + 1))
+        for partition in np.flatnonzero(np.diff(bounds)):
+            buffers[partition].append(table.take(pa.array(order[bounds[partition]:bounds[partition + 1]])))
+        buffered += np.diff(bounds)
+
+        if buffered.sum() > budget:
+            while buffered.sum() > budget // 2:
+                flush(int(np.argmax(buffered)))
+
+    for partition in np.flatnonzero(buffered):
+        flush(partition)
+    return paths
+
+
+def _read_partition(paths, columns):
+    """
+    Read the spill files of one partition, or an empty frame with the expected columns.
+    """
+    if not paths:
+        return pd.DataFrame({column: pd.Series(dtype=object) for column in columns}).astype({"Order_id": "Int64"})
+    frame = pa.concat_tables([pq.read_table(path) for path in paths]).to_pandas()
+    frame["Order_id"] = frame["Order_id"].astype("Int64")
+    return frame
+
+
+def stream_aggregates(orders_path, errands_path, chunk_rows=DEFAULT_CHUNK_ROWS, spill_dir=None):
+    """
+    Compute every count-based aggregate with memory bounded by the chunk size.
+
+    Parameters:
+        orders_path (str): Path of orders.parquet.
+        errands_path (str): Path of errands.parquet.
+        chunk_rows (int): Rows per record batch and approximate rows per partition.
+        spill_dir (str): Directory for partition spill files; a temporary one if omitted.
+
+    Returns:
+        PartialAggregates: The combined aggregates of all partitions.
+    """
+    orders_columns = required_columns("orders")
+    errands_columns = required_columns("errands")
+    total_rows = max(pq.ParquetFile(orders_path).metadata.num_rows, pq.ParquetFile(errands_path).metadata.num_rows)
+    n_partitions = max(1, math.ceil(total_rows / chunk_rows))
+
+    with tempfile.TemporaryDirectory(dir=spill_dir) as tmp:
+        orders_parts = _partition_file(
+            orders_path, orders_columns, lambda frame: normalise_order_ids(frame["Order_id"]),
+            n_partitions, tmp, "orders", chunk_rows,
+        )
+        errands_parts = _partition_file(
+            errands_path, errands_columns, lambda frame: decode_base36_column(frame["Order_number"]),
+            n_partitions, tmp, "errands", chunk_rows,
+        )
+
+        total = PartialAggregates()
+        for orders_part, errands_part in zip(orders_parts, errands_parts):
+            if not orders_part and not errands_part:
+                continue
+            orders_df = _read_partition(orders_part, orders_columns)
+            errands_df = _read_partition(errands_part, errands_columns + ["Order_id"])
+            total.merge(aggregate_partition(orders_df, errands_df))
+    return total
+
+
+def _rate(numerator, denominator):
+    """
+    numerator / denominator * 100, aligned on the index, 0 where undefined.
+    """
+    return (numerator / denominator).fillna(0) * 100
+
+
+def finalise(aggregates, top_n=10, brand="Brand A"):
+    """
+    Combine step: turn merged partial aggregates into the report's tables.
+
+    The tables carry the names and layout of report.run()'s results (rates per
+    dimension in interaction_rates, partner shares as a SparseCrosstab), plus
+    cancellations_by_destination, which the report does not compute. Counts
+    over errands include every errand, like the report.
+
+    Parameters:
+        aggregates (PartialAggregates): Output of stream_aggregates().
+        top_n (int): Size of top-N tables.
+        brand (str): Brand of the brand_categories table.
+
+    Returns:
+        tuple: (MetricsResult, dict of name -> table)
+    """
+    histogram_counts = aggregates.get("contacts_histogram")
+    histogram = np.zeros(int(histogram_counts.index.max()) + 1 if len(histogram_counts) else 1, dtype=np.int64)
+    histogram[histogram_counts.index.to_numpy(dtype=np.int64)] = histogram_counts.to_numpy()
+    result = MetricsResult(ContactMetrics.from_histogram(histogram), histogram)
+
+    def top(name):
+        return aggregates.get(name).sort_values(ascending=False, kind="stable")
+
+    tables = {
+        "errand_categories": top("Errand_category").head(top_n),
+        "errand_channels": top("Errand_channel"),
+        "errand_types": top("Errand_type").head(top_n),
+        "errand_actions": top("Errand_action").head(top_n),
+        "brand_contacts": top("contacts_by_Brand"),
+    }
+    brand_category = aggregates.get("brand_category")
+    if len(brand_category):
+        brand_category = brand_category[brand_category.index.get_level_values(0) == brand].droplevel(0)
+    tables["brand_categories"] = brand_category.sort_values(ascending=False, kind="stable")
+    tables["countries_without_contacts"] = top("no_contact_by_Site_country")
+    tables["countries_with_contacts"] = top("contacts_by_Site_country")
+    tables["monthly_contact_rate"] = _rate(aggregates.get("contacts_by_month"), aggregates.get("orders_by_month"))
+
+    tables["interaction_rates"] = {}
+    for dimension, name in RATE_NAMES.items():
+        rates = _rate(aggregates.get(f"contacted_by_{dimension}"), aggregates.get(f"orders_by_{dimension}"))
+        tables["interaction_rates"][name] = sort_descending(rates)
+
+    cells = aggregates.get("partner_category").rename("contacts").reset_index()
+    tables["partner_categories"] = SparseCrosstab.from_frame(
+        cells, ["Partner"], ["Errand_category"], weights=cells["contacts"].to_numpy()
+    ).normalize_rows()
+
+    # Errand categories for origins/destinations with the highest interaction rates
+    top_countries = tables["interaction_rates"]["origin"].head(top_n).index
+    cells = aggregates.get("origin_destination_category").rename("contacts").reset_index()
+    selected = (
+        cells["Origin_country"].isin(top_countries) | cells["Destination_country"].isin(top_countries)
+    ).to_numpy()
+    by_country = SparseCrosstab.from_frame(
+        cells, ["Origin_country"], ["Errand_category"], mask=selected, weights=cells["contacts"].to_numpy()
+    )
+    tables["country_categories"] = top_columns_table(by_country, top_n)
+
+    tables["cancellations_by_origin"] = sort_descending(aggregates.get("cancellations_by_Origin_country"))
+    tables["cancellations_by_destination"] = sort_descending(aggregates.get("cancellations_by_Destination_country"))
+    tables["cancel_reasons"] = top("Cancel_reason")
+    tables["change_reasons"] = top("Change_reason")
+    return result, tables
+
+
+def write_tables(tables, path):
+    """
+    Write finalise() tables as JSON (one list of records per table, one per interaction rate dimension).
+    """
+    flat = {}
+    for name, table in tables.items():
+        if isinstance(table, dict):
+            flat.update({f"{name}_{dimension}": rates for dimension, rates in table.items()})
+        elif isinstance(table, SparseCrosstab):
+            flat[name] = table.to_frame(fill_value=0)
+        else:
+            flat[name] = table
+    data = {}
+    for name, table in flat.items():
+        if isinstance(table, pd.Series):
+            table = table.rename(table.name or "value").to_frame()
+        data[name] = table.reset_index().to_dict(orient="records")
+    with open(path, "w") as file:
+        json.dump(data, file, indent=2, default=str)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming customer service metrics.")
+    parser.add_argument("orders", nargs="?", default="orders.parquet")
+    parser.add_argument("errands", nargs="?", default="errands.parquet")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--spill-dir", default=None)
+    parser.add_argument("--output-dir", default=".")
+    args = parser.parse_args()
+
+    aggregates = stream_aggregates(args.orders, args.errands, args.chunk_rows, args.spill_dir)
+    result, tables = finalise(aggregates)
+    write_key_metrics(result, os.path.join(args.output_dir, "key_metrics.txt"))
+    write_metrics_json(result, os.path.join(args.output_dir, "key_metrics.json"))
+    write_tables(tables, os.path.join(args.output_dir, "streaming_tables.json"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Timestamp ingestion: Order_created_at parsed once, calendar keys derived as integers.
+
+The orders' Order_created_at is parsed once, before the join, so the merged
+frame inherits parsed datetimes instead of parsing the same order's timestamp
+once per errand. String timestamps are parsed with an explicit format,
+detected once per call from the first value like pd.to_datetime does; the
+format is not shared between calls, since a day-first and a month-first file
+can have values of the same shape. Columns of repeated values (dates without
+a time) are parsed once per distinct value.
+
+Calendar keys are compact nullable int32 columns computed from the datetime64
+values with numpy (no string formatting, no per-element parsing):
+
+    month   yyyymm     (202301)
+    week    ISO yyyyww (202252 for 2023-01-01, a Sunday)
+    day     yyyymmdd   (20230101)
+"""
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+
+# Calendar key columns added by add_calendar_keys
+CALENDAR_KEYS = ("month", "week", "day")
+
+# Rows sampled to decide whether parsing distinct values pays off, and the distinct share below which it does
+DISTINCT_SAMPLE = 10_000
+DISTINCT_SHARE = 0.5
+
+
+def timestamp_format(value):
+    """
+    strftime format of a timestamp string (None if it cannot be detected).
+    """
+    return guess_datetime_format(value)
+
+
+def parse_timestamps(values):
+    """
+    Parse timestamps like pd.to_datetime(values, errors="coerce"), with the format detected once.
+
+    Parameters:
+        values (pd.Series): Datetimes (returned as they are) or timestamp strings.
+
+    Returns:
+        pd.Series: datetime64 values, NaT where a value does not match the format.
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    present = values.dropna()
+    first = present.iloc[0] if len(present) else None
+    fmt = timestamp_format(first) if isinstance(first, str) else None
+    if fmt is None:
+        return pd.to_datetime(values, errors="coerce")
+
+    # Repeated values (e.g. dates without a time) are parsed once each
+    sample = values.iloc[:DISTINCT_SAMPLE]
+    if sample.nunique() < len(sample) * DISTINCT_SHARE:
+        codes, distinct = pd.factorize(values)
+        parsed = pd.to_datetime(pd.Series(distinct), format=fmt, errors="coerce")
+        taken = parsed.to_numpy()[codes]
+        taken[codes < 0] = np.datetime64("NaT")
+        return pd.Series(taken, index=values.index, name=values.name).astype(parsed.dtype)
+    return pd.to_datetime(values, format=fmt, errors="coerce")
+
+
+def _integer_key(keys, missing, index):
+    return pd.Series(pd.arrays.IntegerArray(keys.astype(np.int32), missing), index=index)
+
+
+def calendar_keys(created):
+    """
+    Month, ISO week and day keys of datetimes as nullable int32 Series (missing where the date is).
+
+    Parameters:
+        created (pd.Series): datetime64 values (local wall time is used for time-zone aware values).
+
+    Returns:
+        dict: "month" (yyyymm), "week" (ISO yyyyww) and "day" (yyyymmdd) -> pd.Series.
+    """
+    if getattr(created.dt, "tz", None) is not None:
+        created = created.dt.tz_localize(None)
+    values = created.to_numpy()
+    missing = np.isnat(values)
+    days = np.where(missing, np.datetime64(0, "D"), values.astype("datetime64[D]"))
+
+    months = days.astype("datetime64[M]")
+    month_number = months.astype(np.int64)
+    year, month = month_number // 12 + 1970, month_number % 12 + 1
+    day_of_month = (days - months.astype("datetime64[D]")).astype(np.int64) + 1
+
+    # ISO weeks start on Monday and belong to the year of their Thursday (day 0 was a Thursday)
+    day_number = days.astype(np.int64)
+    thursday = day_number - (day_number + 3) % 7 + 3
+    iso_year = thursday.astype("datetime64[D]").astype("datetime64[Y]")
+    week = (thursday - iso_year.astype("datetime64[D]").astype(np.int64)) // 7 + 1
+
+    return {
+        "month": _integer_key(year * 100 + month, missing, created.index),
+        "week": _integer_key((iso_year.astype(np.int64) + 1970) * 100 + week, missing, created.index),
+        "day": _integer_key(year * 10_000 + month * 100 + day_of_month, missing, created.index),
+    }
+
+
+def month_key(created):
+    """
+    Year and month of datetimes as one yyyymm number (e.g. 202301), so the same
+    month of different years stays a separate bucket; missing where the date is.
+    """
+    return calendar_keys(created)["month"]
+
+
+def add_calendar_keys(frame, column="Order_created_at"):
+    """
+    Parse a frame's timestamp column in place and add the CALENDAR_KEYS columns.
+
+    Parameters:
+        frame (pd.DataFrame): Orders with Order_created_at.
+        column (str): Timestamp column.
+
+    Returns:
+        pd.DataFrame: The same frame with a datetime64 column and 'month', 'week' and 'day'.
+    """
+    frame[column] = parse_timestamps(frame[column])
+    for name, keys in calendar_keys(frame[column]).items():
+        frame[name] = keys
+    return frame
@@ -0,0 +1,170 @@
+"""
+Per-stage instrumentation: wall time, CPU time, peak RSS growth and row counts.
+
+    tracer = Tracer()
+    with tracer.stage("decode_base36", rows_in=len(errands_df)) as span:
+        keys = decode_base36_column(errands_df["Order_number"])
+        span.rows_out = int(keys.notna().sum())
+    tracer.write_json("trace.json")
+    tracer.write_chrome_trace("trace.chrome.json")  # chrome://tracing or https://ui.perfetto.dev
+
+A disabled tracer (NULL_TRACER, the default everywhere) hands out one shared
+no-op span, so instrumented code costs an attribute lookup and a method call.
+Worker processes record into their own Tracer and return its records, which
+the parent adds with extend().
+"""
+import json
+import os
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def _max_rss_mb():
+    """
+    Peak resident set size of the process so far in MB (None where unsupported).
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 2 ** 20 if os.uname().sysname == "Darwin" else peak / 2 ** 10
+
+
+def row_count(value):
+    """
+    Rows of a stage's input or output: len() of a frame or array, summed over dicts, else None.
+    """
+    if isinstance(value, dict):
+        counts = [row_count(item) for item in value.values()]
+        return sum(count for count in counts if count is not None)
+    try:
+        return len(value)
+    except TypeError:
+        return None
+
+
+class Span:
+    """
+    One timed stage; a context manager that appends its record to the tracer on exit.
+
+    Attributes:
+        rows_in (int): Input rows (optional).
+        rows_out (int): Output rows, usually set inside the with block (optional).
+    """
+
+    def __init__(self, tracer, name, rows_in=None):
+        self.tracer = tracer
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+
+    def __enter__(self):
+        self._start_ns = time.time_ns()
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._max_rss = _max_rss_mb()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        wall = time.perf_counter() - self._wall
+        cpu = time.process_time() - self._cpu
+        max_rss = _max_rss_mb()
+        self.tracer.records.append({
+            "name": self.name,
+            "start_us": self._start_ns // 1000,
+            "wall_s": round(wall, 6),
+            "cpu_s": round(cpu, 6),
+            "max_rss_mb": None if max_rss is None else round(max_rss, 1),
+            "rss_peak_delta_mb": None if max_rss is None else round(max_rss - self._max_rss, 1),
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "pid": os.getpid(),
+            "failed": exc_type is not None,
+        })
+        return False
+
+
+class _NullSpan:
+    """
+    Shared no-op span of a disabled tracer; attribute writes are ignored.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Collects one record per stage.
+
+    Parameters:
+        enabled (bool): When False, stage() returns a shared no-op span and nothing is recorded.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.records = []
+
+    def stage(self, name, rows_in=None):
+        """
+        Context manager timing one named stage.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return Span(self, name, rows_in)
+
+    def extend(self, records):
+        """
+        Add records collected elsewhere (e.g. returned by a worker process).
+        """
+        if self.enabled:
+            self.records.extend(records)
+
+    def write_json(self, path):
+        """
+        Write the records as {"stages": [...]} JSON.
+        """
+        with open(path, "w") as file:
+            json.dump({"stages": self.records}, file, indent=2)
+
+    def write_chrome_trace(self, path):
+        """
+        Write the records in Chrome trace-event format (complete "X" events, one track per process).
+        """
+        events = [
+            {
+                "name": record["name"],
+                "ph": "X",
+                "ts": record["start_us"],
+                "dur": int(record["wall_s"] * 1e6),
+                "pid": record["pid"],
+                "tid": record["pid"],
+                "args": {
+                    key: record[key]
+                    for key in ("cpu_s", "rss_peak_delta_mb", "rows_in", "rows_out")
+                    if record[key] is not None
+                },
+            }
+            for record in self.records
+        ]
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+# Default for every traced function: records nothing
+NULL_TRACER = Tracer(enabled=False)
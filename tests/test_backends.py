@@ -0,0 +1,46 @@
+"""
+Parity of the execution backends: Polars and DuckDB build the same aggregate cube as pandas.
+"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+from cs_analysis.backends import get_backend  # noqa: E402
+from generate_data import generate  # noqa: E402
+
+
+# (date_range, countries) combinations every backend must agree on
+FILTERS = [
+    (None, None),
+    (("2023-03-15", "2023-09-01"), None),
+    (None, ("NO", "DK")),
+    (("2024-01-01", None), ("SE", "FI", "XX")),
+]
+
+
+@pytest.fixture(scope="module")
+def inputs(tmp_path_factory):
+    # Several row groups, so filters skip some of them
+    return generate(str(tmp_path_factory.mktemp("data")), 20_000, seed=0, n_partners=50, chunk_rows=5_000)
+
+
+@pytest.fixture(scope="module")
+def expected(inputs):
+    return {filters: get_backend("pandas").cube(*inputs, *filters) for filters in FILTERS}
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+@pytest.mark.parametrize("name", ["polars", "duckdb"])
+def test_cube_matches_pandas(inputs, expected, name, filters):
+    pytest.importorskip(name)
+    cube = get_backend(name).cube(*inputs, *filters)
+    reference = expected[filters]
+
+    assert cube.grouping_sets == reference.grouping_sets
+    for fact, table in reference.tables.items():
+        pd.testing.assert_frame_equal(cube.tables[fact], table)
+    assert cube.metrics().to_dict() == reference.metrics().to_dict()
@@ -0,0 +1,59 @@
+"""
+Parity of the vectorised base-36 decoder with int(value, 36), one row at a time.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from cs_analysis.base36 import decode_base36_column
+
+
+def reference(value):
+    # What the original script stored: int(value, 36), or missing when that fails
+    try:
+        result = int(value, 36)
+    except (TypeError, ValueError):
+        return None
+    return result if -(2 ** 63) <= result < 2 ** 63 else None
+
+
+def random_values(rows, seed):
+    rng = np.random.default_rng(seed)
+    alphabet = np.array(list("0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"))
+    lengths = rng.integers(1, 15, size=rows)
+    values = ["".join(rng.choice(alphabet, size=length)) for length in lengths]
+    # Signs, surrounding whitespace and leading zeros on some of them
+    for row in rng.choice(rows, size=rows // 5, replace=False):
+        values[row] = rng.choice(["", "-", "+"]) + "0" * rng.integers(0, 12) + values[row]
+    for row in rng.choice(rows, size=rows // 5, replace=False):
+        values[row] = rng.choice([" ", "\t", "  "]) + values[row] + rng.choice(["", " ", "\n"])
+    return values
+
+
+PADDED = ["0000000000001", "000000000000000000000001", " 0001 ", "-00000000000000zz", "+0", "0" * 30]
+INVALID = ["", " ", "-", "+-1", "1 2", "#invalid", "1.5", "z!", "zzzzzzzzzzzzzz", "-" + "z" * 13, "1" * 40]
+# int() also accepts these, although the buffer arithmetic does not
+UNUSUAL = ["1_0", "z_z_z", "١٢", "\xa0ab ", "_1", "1__0"]
+MIXED = [None, np.nan, pd.NA, 5, 0, True, 3.0, b"zz", bytearray(b"10"), b"\xff1", ("a",), "ab"]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1_000_000])
+def test_matches_int_on_random_values(chunk_size):
+    values = random_values(5_000, seed=chunk_size)
+    decoded = decode_base36_column(pd.Series(values), chunk_size=chunk_size)
+    assert decoded.dtype == "Int64"
+    assert [None if pd.isna(value) else value for value in decoded] == [reference(value) for value in values]
+
+
+@pytest.mark.parametrize("values", [PADDED, INVALID, UNUSUAL, MIXED], ids=["padded", "invalid", "unusual", "mixed"])
+def test_matches_int_on_edge_cases(values):
+    decoded = decode_base36_column(pd.Series(values, dtype=object))
+    assert [None if pd.isna(value) else value for value in decoded] == [reference(value) for value in values]
+
+
+@pytest.mark.parametrize("dtype", ["str", "string[pyarrow]", "string[python]"])
+def test_string_dtypes(dtype):
+    values = PADDED + INVALID + UNUSUAL + [None]
+    decoded = decode_base36_column(pd.Series(values, dtype=dtype, index=range(10, 10 + len(values)), name="x"))
+    assert [None if pd.isna(value) else value for value in decoded] == [reference(value) for value in values]
+    assert decoded.name == "x" and decoded.index[0] == 10
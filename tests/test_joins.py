@@ -0,0 +1,91 @@
+"""
+Parity of the integer-keyed join with pd.merge on the same (non-null) keys.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from cs_analysis.joins import OrderIndex, join_orders, normalise_order_ids
+
+
+def make_frames(seed, n_orders=300, n_errands=1_000, sorted_orders=False):
+    rng = np.random.default_rng(seed)
+    # Repeated order ids on both sides, missing keys and ids without a match on either side
+    order_ids = pd.array(rng.integers(0, 250, size=n_orders), dtype="Int64")
+    if sorted_orders:
+        order_ids = pd.array(np.sort(rng.integers(0, 250, size=n_orders)), dtype="Int64")
+    order_ids[rng.random(n_orders) < 0.05] = pd.NA
+    errand_ids = pd.array(rng.integers(-20, 300, size=n_errands), dtype="Int64")
+    errand_ids[rng.random(n_errands) < 0.05] = pd.NA
+
+    orders = pd.DataFrame({
+        "Order_id": order_ids,
+        "Partner": rng.choice(["P1", "P2", "P3"], size=n_orders),
+        "Brand": rng.choice(["Brand A", "Brand B"], size=n_orders),
+    })
+    errands = pd.DataFrame({
+        "Order_id": errand_ids,
+        "Errand_category": rng.choice(["Refund", "Change", "Other"], size=n_errands),
+        "Brand": rng.choice(["Brand A", "Brand B"], size=n_errands),
+    })
+    return orders, errands
+
+
+def expected_merge(errands, orders):
+    # Null keys never match (the script compared stringified ids, and no order id was "None")
+    return pd.merge(
+        errands[errands["Order_id"].notna()], orders[orders["Order_id"].notna()], on="Order_id", how="inner"
+    ).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("sorted_orders", [False, True])
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_merged_matches_pd_merge(seed, sorted_orders):
+    orders, errands = make_frames(seed, sorted_orders=sorted_orders)
+    join = join_orders(errands, orders)
+    expected = expected_merge(errands, orders)
+
+    assert list(join.merged.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(join.merged, expected)
+
+
+def test_row_mappings_and_counts():
+    orders, errands = make_frames(3)
+    join = join_orders(errands, orders)
+    expected = expected_merge(errands, orders)
+
+    assert (errands["Order_id"].to_numpy()[join.errand_rows] == join.merged["Order_id"].to_numpy()).all()
+    assert (orders["Order_id"].to_numpy()[join.order_rows] == join.merged["Order_id"].to_numpy()).all()
+
+    # Every orders row counts the errands with its id, so repeated ids count on each row
+    per_id = errands["Order_id"].value_counts()
+    expected_counts = orders["Order_id"].map(per_id).fillna(0).astype(np.int64).to_numpy()
+    np.testing.assert_array_equal(join.contacts_per_order, expected_counts)
+    assert join.contacts_per_order.sum() == len(expected)
+
+    matched_ids = orders["Order_id"].isin(errands["Order_id"].dropna()) & orders["Order_id"].notna()
+    pd.testing.assert_frame_equal(join.unmatched_orders(orders), orders[~matched_ids.to_numpy()])
+    known = errands["Order_id"].isin(orders["Order_id"].dropna()) & errands["Order_id"].notna()
+    pd.testing.assert_frame_equal(join.matched_errands(errands), errands[known.to_numpy()].reset_index(drop=True))
+
+
+def test_order_index_membership():
+    orders, errands = make_frames(4)
+    index = OrderIndex(orders["Order_id"])
+    expected = (errands["Order_id"].isin(orders["Order_id"].dropna()) & errands["Order_id"].notna()).to_numpy()
+    np.testing.assert_array_equal(index.contains(errands["Order_id"]), expected)
+
+
+def test_empty_sides():
+    orders, errands = make_frames(5)
+    for left, right in [(errands.iloc[:0], orders), (errands, orders.iloc[:0])]:
+        join = join_orders(left, right)
+        assert len(join.merged) == 0
+        assert len(join.contacts_per_order) == len(right)
+
+
+def test_normalise_order_ids():
+    values = pd.Series([" 12 ", "7", "x", None, "3.0", "3.5", ""], dtype=object)
+    assert normalise_order_ids(values).tolist() == [12, 7, pd.NA, pd.NA, 3, pd.NA, pd.NA]
+    assert normalise_order_ids(pd.Series([1.0, 2.5, np.nan])).tolist() == [1, pd.NA, pd.NA]
+    assert normalise_order_ids(pd.Series([4, 5], dtype=np.int64)).dtype == "Int64"
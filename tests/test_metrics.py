@@ -0,0 +1,76 @@
+"""
+Key metrics from the contacts-per-order histogram against the original script's formulas.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from cs_analysis.joins import join_orders
+from cs_analysis.metrics import compute_metrics
+
+
+def script_metrics(orders_df, errands_df, counted_ids):
+    """
+    The key metrics block of the original script; p1/p2 count the ids in counted_ids.
+    """
+    merged_df = pd.merge(errands_df, orders_df, on="Order_id", how="inner")
+    order_counts = counted_ids.value_counts()
+    num_unique_orders = len(order_counts[order_counts == 1])
+    num_twice_orders = len(order_counts[order_counts == 2])
+    return {
+        "total_orders": len(orders_df),
+        "total_contacts": len(merged_df),
+        "percentage_with_contacts": len(merged_df) / len(orders_df) * 100,
+        "percentage_no_contacts": (len(orders_df) - len(merged_df)) / len(orders_df) * 100,
+        "percentage_unique_contact": num_unique_orders / len(merged_df) * 100,
+        "percentage_two_contacts": num_twice_orders / len(merged_df) * 100,
+        "percentage_more_than_two_contacts": (len(merged_df) - num_unique_orders) / len(merged_df) * 100,
+    }, merged_df.groupby("Order_id").size().value_counts().sort_index()
+
+
+def make_frames(seed, unmatched_share):
+    rng = np.random.default_rng(seed)
+    order_ids = rng.permutation(5_000)[:2_000]
+    orders = pd.DataFrame({"Order_id": pd.array(order_ids, dtype="Int64")})
+
+    # A skewed number of errands per contacted order, so 1, 2 and more contacts all occur
+    contacted = rng.choice(order_ids, size=900, replace=False)
+    errand_ids = np.repeat(contacted, rng.geometric(0.45, size=len(contacted)))
+    # Errands of orders that are not loaded (another date range, another file)
+    unmatched = rng.choice(np.arange(5_000, 6_000), size=int(len(errand_ids) * unmatched_share))
+    errand_ids = rng.permutation(np.concatenate([errand_ids, unmatched]))
+    errands = pd.DataFrame({"Order_id": pd.array(errand_ids, dtype="Int64")})
+    return orders, errands
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_matches_script_when_every_errand_has_its_order(seed):
+    orders, errands = make_frames(seed, unmatched_share=0)
+    expected, distribution = script_metrics(orders, errands, errands["Order_id"])
+
+    result = compute_metrics(join_orders(errands, orders).contacts_per_order)
+    assert result.to_dict()["metrics"] == pytest.approx(expected)
+    pd.testing.assert_series_equal(result.distribution, distribution, check_names=False, check_index_type=False)
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_one_and_two_contacts_count_matched_errands_only(seed):
+    orders, errands = make_frames(seed, unmatched_share=0.2)
+    merged_ids = pd.merge(errands, orders, on="Order_id", how="inner")["Order_id"]
+    expected, distribution = script_metrics(orders, errands, merged_ids)
+
+    result = compute_metrics(join_orders(errands, orders).contacts_per_order)
+    assert result.to_dict()["metrics"] == pytest.approx(expected)
+    pd.testing.assert_series_equal(result.distribution, distribution, check_names=False, check_index_type=False)
+
+    # The script counted every errand id, so errands of orders that were not loaded inflated p1 and p2
+    inflated, _ = script_metrics(orders, errands, errands["Order_id"])
+    assert inflated["percentage_unique_contact"] > result.metrics.percentage_unique_contact
+
+
+def test_empty_inputs():
+    result = compute_metrics(np.zeros(0, dtype=np.int64))
+    assert result.metrics.total_orders == 0
+    assert result.metrics.percentage_with_contacts == 0
+    assert result.metrics.percentage_unique_contact == 0
+    assert len(result.distribution) == 0
@@ -0,0 +1,119 @@
+"""
+Timestamp parsing against pd.to_datetime(errors="coerce") and the integer calendar keys against pandas.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from cs_analysis import timestamps
+from cs_analysis.timestamps import add_calendar_keys, calendar_keys, parse_timestamps, timestamp_format
+
+# Day-first strings make pandas warn that dayfirst was not passed; both sides read them the same way
+pytestmark = pytest.mark.filterwarnings("ignore:Parsing dates in:UserWarning")
+
+
+def random_timestamps(fmt, rows, seed, repeated=False):
+    rng = np.random.default_rng(seed)
+    seconds = rng.integers(1_546_300_800, 1_735_689_600, size=rows)  # 2019 through 2024
+    if repeated:
+        seconds = seconds // 86_400 * 86_400
+    return pd.Series(pd.to_datetime(seconds, unit="s").strftime(fmt), dtype=object)
+
+
+@pytest.mark.parametrize("value, fmt", [
+    ("2023-01-31 10:15:00", "%Y-%m-%d %H:%M:%S"),
+    ("2023-01-31", "%Y-%m-%d"),
+    ("2023-01-31T10:15:00.123", "%Y-%m-%dT%H:%M:%S.%f"),
+    ("31/01/2023", "%d/%m/%Y"),
+    ("01/31/2023 10:15", "%m/%d/%Y %H:%M"),
+    ("not a date", None),
+])
+def test_format_detection(value, fmt):
+    assert timestamp_format(value) == fmt
+
+
+@pytest.mark.parametrize("fmt", ["%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d/%m/%Y %H:%M", "%m/%d/%Y"])
+@pytest.mark.parametrize("repeated", [False, True], ids=["distinct", "repeated"])
+def test_matches_to_datetime(fmt, repeated):
+    values = random_timestamps(fmt, 2_000, seed=len(fmt), repeated=repeated)
+    # Missing, empty and malformed values, but not in first place (that one decides the format)
+    values.iloc[[5, 50, 500]] = [None, "", "garbage"]
+    values.iloc[7] = "2023-02-30" if fmt.startswith("%Y") else "30/30/2023"
+
+    expected = pd.to_datetime(values, errors="coerce")
+    pd.testing.assert_series_equal(parse_timestamps(values), expected)
+
+
+def test_repeated_values_parsed_once_each(monkeypatch):
+    values = random_timestamps("%Y-%m-%d", 20_000, seed=0, repeated=True)
+    parsed = []
+    to_datetime = pd.to_datetime
+
+    def counting(arg, *args, **kwargs):
+        parsed.append(len(arg))
+        return to_datetime(arg, *args, **kwargs)
+
+    monkeypatch.setattr(timestamps.pd, "to_datetime", counting)
+    result = parse_timestamps(values)
+    monkeypatch.undo()
+    assert parsed == [values.nunique()]
+    pd.testing.assert_series_equal(result, pd.to_datetime(values, errors="coerce"))
+
+
+def test_format_detected_per_call():
+    # Same shape, read day-first in one call and month-first in the next, like pd.to_datetime
+    day_first = pd.Series(["31/01/2023", "01/02/2023"])
+    month_first = pd.Series(["01/31/2023", "02/01/2023"])
+    for values in (day_first, month_first, day_first):
+        pd.testing.assert_series_equal(parse_timestamps(values), pd.to_datetime(values, errors="coerce"))
+
+
+def test_datetimes_and_missing_values():
+    datetimes = pd.Series(pd.to_datetime(["2023-01-01", None]))
+    assert parse_timestamps(datetimes) is datetimes
+    empty = pd.Series([None, None], dtype=object)
+    pd.testing.assert_series_equal(parse_timestamps(empty), pd.to_datetime(empty, errors="coerce"))
+
+
+def expected_keys(created):
+    iso = created.dt.isocalendar()
+    return {
+        "month": (created.dt.year * 100 + created.dt.month).astype("Int32"),
+        "week": (iso["year"].astype("Int64") * 100 + iso["week"].astype("Int64")).astype("Int32"),
+        "day": (created.dt.year * 10_000 + created.dt.month * 100 + created.dt.day).astype("Int32"),
+    }
+
+
+@pytest.mark.parametrize("start, end", [
+    ("2019-12-20", "2021-01-12"),  # 2020 has an ISO week 53; 2019-12-30 is in week 1 of 2020
+    ("2026-12-24", "2027-01-08"),  # 2027-01-01 to 01-03 are in week 53 of 2026
+    ("1969-12-25", "1970-01-08"),  # around day 0 of datetime64
+    ("2099-12-26", "2100-03-02"),  # 2100 is not a leap year
+])
+def test_calendar_keys_across_year_boundaries(start, end):
+    created = pd.Series(pd.date_range(start, end, freq="7h"))
+    keys = calendar_keys(created)
+    for name, expected in expected_keys(created).items():
+        pd.testing.assert_series_equal(keys[name], expected, check_names=False)
+
+
+def test_calendar_keys_missing_and_time_zones():
+    created = pd.Series(pd.to_datetime(["2020-12-31 23:30", None, "2021-01-04 00:15"]))
+    keys = calendar_keys(created)
+    assert keys["month"].tolist() == [202012, pd.NA, 202101]
+    assert keys["week"].tolist() == [202053, pd.NA, 202101]
+    assert keys["day"].tolist() == [20201231, pd.NA, 20210104]
+
+    # Time-zone aware values use their local wall time
+    aware = created.dt.tz_localize("Europe/Stockholm")
+    for name, key in calendar_keys(aware).items():
+        pd.testing.assert_series_equal(key, keys[name])
+
+
+def test_add_calendar_keys():
+    frame = pd.DataFrame({"Order_created_at": ["2022-01-02 10:00:00", "bad", None, "2023-01-01 00:00:00"]})
+    frame = add_calendar_keys(frame)
+    assert frame["month"].tolist() == [202201, pd.NA, pd.NA, 202301]
+    assert frame["week"].tolist() == [202152, pd.NA, pd.NA, 202252]
+    assert frame["day"].tolist() == [20220102, pd.NA, pd.NA, 20230101]
+    assert pd.api.types.is_datetime64_any_dtype(frame["Order_created_at"])